@@ -3,6 +3,7 @@ import logging
 from .shell import ShellCommandAction
 from .file_edit import FileEditAction
 from .directory import DirectoryAction
+from .patch import PatchAction
 
 logger = logging.getLogger("ai_project_helper.actions")
 
@@ -25,6 +26,8 @@ ACTION_TYPE_ALIAS = {
     "str_replace_editor": "file_edit",
     "append_file": "file_edit",
     "file": "file_edit",
+    "apply_patch": "patch",
+    "apply_diff": "patch",
     # ...其他action别名
 }
 
@@ -32,6 +35,7 @@ ACTION_REGISTRY = {
     "shell_command": ShellCommandAction,
     "file_edit": FileEditAction,
     "directory": DirectoryAction,
+    "patch": PatchAction,
     # ...后续直接注册
 }
 
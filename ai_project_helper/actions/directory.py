@@ -40,3 +40,5 @@ class DirectoryAction(BaseAction):
         except Exception as e:
             logger.exception("目录操作失败")
             yield ("", f"目录操作失败: {e}", 1)
+        finally:
+            self.invalidate_paths(workdir)
@@ -1,11 +1,21 @@
 import os
-import shutil
+import json
 import logging
 import html  # 添加导入
 from .base import BaseAction
+from .file_ops import atomic_output, stream_replace, file_edit_settings, get_backup_store
 
 logger = logging.getLogger("ai_project_helper.actions.file_edit")
 
+
+def _edit_prefix(index, total):
+    return f"编辑 {index}/{total}: "
+
+
+class _NoMatch(Exception):
+    """未找到要替换的内容：放弃临时文件，原文件不变"""
+
+
 class FileEditAction(BaseAction):
     def _unescape_content(self, content):
         """处理HTML反转义"""
@@ -57,17 +67,17 @@ class FileEditAction(BaseAction):
                 if not os.path.exists(abs_path):
                     yield ("", f"错误: 文件不存在: {abs_path}", 1)
                     return
-                backup_path = abs_path + ".bak"
-                shutil.copy2(abs_path, backup_path)
-                with open(abs_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                if old_str not in content:
-                    yield (f"警告: 要替换的内容未找到: {old_str} (跳过替换)\n", "", 2)
+                if not old_str:
+                    yield ("", "错误: old_str 不能为空", 1)
                     return
-                content = content.replace(old_str, new_str or "")
-                with open(abs_path, "w", encoding="utf-8") as f:
-                    f.write(content)
-                yield (f"字符串替换成功: {abs_path}\n", "", 0)
+                yield from self._str_replace(abs_path, old_str, new_str or "", config.get("file_edit"))
+
+            elif command == "multi_replace":
+                if not os.path.exists(abs_path):
+                    yield ("", f"错误: 文件不存在: {abs_path}", 1)
+                    return
+                edits = self._parse_edits(self.parameters.get("edits"))
+                yield from self._multi_replace(abs_path, edits, config.get("file_edit"))
 
             elif command == "append":
                 if not os.path.exists(abs_path):
@@ -89,4 +99,78 @@ class FileEditAction(BaseAction):
 
         except Exception as e:
             logger.exception("文件编辑操作失败")
-            yield ("", f"文件编辑操作失败: {e}", 1)
\ No newline at end of file
+            yield ("", f"文件编辑操作失败: {e}", 1)
+        finally:
+            self.invalidate_paths(workdir)
+
+    def _str_replace(self, abs_path, old_str, new_str, file_edit_config):
+        """
+        分块读取原文件、边替换边写入同目录的临时文件，完成后 os.replace 原子替换：
+        任何时刻中断，原文件要么保持原样，要么已是完整的新内容。未找到匹配时不修改文件
+        """
+        settings = file_edit_settings(file_edit_config)
+        # 符号链接替换其指向的文件，而不是把链接本身替换为普通文件
+        target = os.path.realpath(abs_path)
+        try:
+            with open(target, "r", encoding="utf-8") as src, atomic_output(target, settings["fsync"]) as dst:
+                count = stream_replace(src, dst, old_str, new_str, int(settings["chunk_chars"]))
+                if count == 0:
+                    raise _NoMatch()
+                # 原子替换前备份旧内容
+                if settings["backup"] == "store":
+                    get_backup_store(settings).backup(target)
+        except _NoMatch:
+            yield (f"警告: 要替换的内容未找到: {old_str} (跳过替换)\n", "", 2)
+            return
+        yield (f"字符串替换成功: {abs_path}（{count} 处）\n", "", 0)
+
+    def _parse_edits(self, edits):
+        """edits 为 [{"old_str": ..., "new_str": ...}, ...]，LLM 输出时为 JSON 字符串"""
+        if isinstance(edits, str):
+            edits = json.loads(edits)
+        if not isinstance(edits, list) or not edits:
+            raise ValueError("multi_replace 需要非空的 edits 列表")
+        return [
+            (edit.get("old_str") or "", self._unescape_content(edit.get("new_str")))
+            for edit in edits
+        ]
+
+    def _multi_replace(self, abs_path, edits, file_edit_config):
+        """
+        按顺序应用多个替换（后一个替换作用于前一个的结果），每个替换产出一条结果：
+        文件只读取一次、备份一次、原子写入一次；未命中的替换以警告上报，全部未命中时不修改文件。
+        超过 multi_replace_max_bytes 的文件逐个流式替换，避免整体读入内存
+        """
+        settings = file_edit_settings(file_edit_config)
+        target = os.path.realpath(abs_path)
+        total = len(edits)
+        if os.path.getsize(target) > int(settings["multi_replace_max_bytes"]):
+            for index, (old_str, new_str) in enumerate(edits, 1):
+                if not old_str:
+                    yield ("", f"{_edit_prefix(index, total)}错误: old_str 不能为空", 1)
+                    continue
+                for out, err, exit_code in self._str_replace(abs_path, old_str, new_str, file_edit_config):
+                    yield (out and _edit_prefix(index, total) + out, err, exit_code)
+            return
+
+        with open(target, "r", encoding="utf-8") as f:
+            content = f.read()
+        results = []
+        for index, (old_str, new_str) in enumerate(edits, 1):
+            prefix = _edit_prefix(index, total)
+            if not old_str:
+                results.append(("", f"{prefix}错误: old_str 不能为空", 1))
+                continue
+            count = content.count(old_str)
+            if count == 0:
+                results.append((f"{prefix}警告: 要替换的内容未找到: {old_str} (跳过替换)\n", "", 2))
+                continue
+            content = content.replace(old_str, new_str)
+            results.append((f"{prefix}字符串替换成功: {abs_path}（{count} 处）\n", "", 0))
+
+        if any(exit_code == 0 for _, _, exit_code in results):
+            with atomic_output(target, settings["fsync"]) as dst:
+                dst.write(content)
+                if settings["backup"] == "store":
+                    get_backup_store(settings).backup(target)
+        yield from results
@@ -0,0 +1,206 @@
+# 文件编辑的底层操作：原子写入（临时文件 + os.replace）、分块流式替换、有界备份存储
+import os
+import stat
+import time
+import shutil
+import fcntl
+import tempfile
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger("ai_project_helper.actions.file_ops")
+
+DEFAULT_FILE_EDIT_CONFIG = {
+    "chunk_chars": 1 << 20,             # 流式替换每次读取的字符数
+    "multi_replace_max_bytes": 64 << 20, # multi_replace 整体读入内存的文件大小上限，更大的文件逐个流式替换
+    "patch_max_fuzz": 2,                # patch 动作定位 hunk 时最多去掉的首尾上下文行数
+    "fsync": False,                     # 替换前把临时文件刷到磁盘（防断电，较慢）
+    "backup": "store",                  # store=修改前备份到备份目录；none=不备份
+    "backup_dir": "file_edit_backups",  # 备份目录（不在项目目录中生成 .bak 文件）
+    "backup_max_files": 200,            # 备份数量上限，超出后删除最旧的
+    "backup_max_bytes": 512 << 20,      # 备份总大小上限
+}
+
+FICLONE = 0x40049409  # Linux ioctl：在支持写时复制的文件系统（btrfs/xfs 等）上克隆文件
+
+
+def _current_umask():
+    """读取进程的 umask：优先读 /proc（不改动进程状态），否则临时设置再恢复（仅在导入时调用一次）"""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError):
+        pass
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+
+# 新建文件的权限位，与 open() 创建文件时相同（mkstemp 创建的临时文件为 0600）
+NEW_FILE_MODE = 0o666 & ~_current_umask()
+
+
+def file_edit_settings(config):
+    cfg = dict(DEFAULT_FILE_EDIT_CONFIG)
+    cfg.update(config or {})
+    return cfg
+
+
+@contextmanager
+def atomic_output(path, fsync=False):
+    """
+    在目标文件所在目录创建临时文件并以文本方式打开，with 块正常结束后 os.replace 到目标路径；
+    块内抛出异常时删除临时文件，原文件保持不变。已存在的目标文件的权限位会被保留，新建的文件使用 0o666 & ~umask
+    """
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            yield f
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        else:
+            os.chmod(tmp_path, NEW_FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _has_border(pattern):
+    """pattern 是否存在既是真前缀又是真后缀的子串（KMP 前缀函数）；无边界的模式其出现位置互不重叠"""
+    prefix = [0] * len(pattern)
+    k = 0
+    for i in range(1, len(pattern)):
+        while k and pattern[i] != pattern[k]:
+            k = prefix[k - 1]
+        if pattern[i] == pattern[k]:
+            k += 1
+        prefix[i] = k
+    return bool(pattern) and prefix[-1] > 0
+
+
+def stream_replace(src, dst, old, new, chunk_chars):
+    """
+    从 src 分块读取、替换后写入 dst，返回替换次数，结果与 str.replace 完全一致。
+    每块末尾保留 len(old)-1 个字符与下一块拼接，跨块边界的匹配不会漏掉
+    """
+    count = 0
+    carry = ""
+    keep = len(old) - 1
+    overlapping = _has_border(old)
+    while True:
+        chunk = src.read(chunk_chars)
+        eof = not chunk
+        buf = carry + chunk
+        # 起点 >= limit 的匹配可能延伸到下一块，留到下一轮处理
+        limit = len(buf) if eof else max(0, len(buf) - keep)
+
+        if not overlapping:
+            # 出现位置互不重叠：以起点 < limit 的最后一个匹配的结尾（或 limit）为界，整段交给 str.replace
+            last = buf.rfind(old)
+            while last >= limit:
+                last = buf.rfind(old, 0, last)
+            cut = max(limit, last + len(old)) if last != -1 else limit
+            segment = buf[:cut]
+            matches = segment.count(old)
+            dst.write(segment.replace(old, new) if matches else segment)
+            count += matches
+            carry = buf[cut:]
+        else:
+            # 可能重叠的模式（如 "aa"）按 str.replace 的从左到右语义逐个查找
+            pieces = []
+            pos = 0
+            while True:
+                i = buf.find(old, pos)
+                if i == -1 or i >= limit:
+                    break
+                pieces.append(buf[pos:i])
+                pieces.append(new)
+                count += 1
+                pos = i + len(old)
+            safe_end = max(pos, limit)
+            pieces.append(buf[pos:safe_end])
+            dst.write("".join(pieces))
+            carry = buf[safe_end:]
+        if eof:
+            return count
+
+
+def clone_or_copy(src, dst):
+    """优先写时复制克隆，文件系统不支持时复制内容"""
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return "reflink"
+    except OSError:
+        shutil.copyfile(src, dst)
+        return "copy"
+
+
+class BackupStore:
+    """
+    修改前的文件备份，按数量与总大小有界，超出时删除最旧的备份。
+    文件随后会被原子替换（新 inode），因此同一文件系统上以硬链接保存旧 inode 即可，不复制内容；
+    跨文件系统时依次尝试 reflink 与复制
+    """
+
+    def __init__(self, directory, max_files=200, max_bytes=512 << 20):
+        self.directory = directory
+        self.max_files = int(max_files)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def backup(self, path):
+        """备份 path 的当前内容，返回备份文件路径"""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self._seq += 1
+            name = f"{time.time_ns()}-{self._seq}-{os.path.basename(path)}"
+        backup_path = os.path.join(self.directory, name)
+        try:
+            os.link(path, backup_path)
+            method = "hardlink"
+        except OSError:
+            method = clone_or_copy(path, backup_path)
+        logger.debug(f"[备份] {path} → {backup_path} ({method})")
+        self._prune()
+        return backup_path
+
+    def _prune(self):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                stamp = entry.name.split("-", 1)[0]
+                # 文件名以纳秒时间戳开头，按时间戳排序即为备份时间顺序
+                if entry.is_file() and stamp.isdigit():
+                    entries.append((int(stamp), entry.path, entry.stat().st_size))
+            entries.sort()
+            total = sum(size for _, _, size in entries)
+            while entries and (len(entries) > self.max_files or total > self.max_bytes):
+                _, path, size = entries.pop(0)
+                os.unlink(path)
+                total -= size
+
+
+_backup_stores = {}
+_backup_stores_lock = threading.Lock()
+
+
+def get_backup_store(settings):
+    """按备份目录共享 BackupStore；settings 为 file_edit_settings 的结果"""
+    directory = os.path.abspath(settings["backup_dir"])
+    with _backup_stores_lock:
+        store = _backup_stores.get(directory)
+        if store is None:
+            store = BackupStore(directory, settings["backup_max_files"], settings["backup_max_bytes"])
+            _backup_stores[directory] = store
+        return store
@@ -0,0 +1,314 @@
+import os
+import re
+import html
+import logging
+from .base import BaseAction
+from .file_ops import atomic_output, file_edit_settings, get_backup_store
+
+logger = logging.getLogger("ai_project_helper.actions.patch")
+
+HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+NO_NEWLINE_MARKER = "\\ No newline at end of file"
+
+
+class Hunk:
+    """
+    一个 hunk：lines 为 (标记, 内容) 列表，标记为 " "（上下文）、"-"（删除）、"+"（新增）；
+    old_start 为头部声明的原文件起始行（从 1 开始，未声明时为 None），只作为查找位置的提示
+    """
+
+    def __init__(self, header, old_start):
+        self.header = header
+        self.old_start = old_start
+        self.lines = []
+        self.no_newline = False  # 新内容最后一行后是否有 "\ No newline at end of file"
+
+    def old_lines(self, lead=0, trail=0):
+        body = self.lines[lead:len(self.lines) - trail]
+        return [text for mark, text in body if mark != "+"]
+
+    def context_bounds(self):
+        """首尾连续上下文行的数量，fuzz 只能从这两端去掉上下文"""
+        lead = 0
+        while lead < len(self.lines) and self.lines[lead][0] == " ":
+            lead += 1
+        trail = 0
+        while trail < len(self.lines) - lead and self.lines[-1 - trail][0] == " ":
+            trail += 1
+        return lead, trail
+
+
+def parse_unified_diff(diff):
+    """
+    解析单个文件的 unified diff，返回 Hunk 列表。对 LLM 生成的补丁放宽要求：
+    hunk 的内容以实际行为准，@@ 头中的行数只用于区分文件头——声明的行数用完之前，
+    以 "--- "、"+++ " 开头的行是删除/新增的内容（如删除 "-- old"、新增 "++ new"），不是文件头；
+    @@ 后缺少行号、整个补丁缺少 @@ 头、空行或缺少前导空格的行都按上下文处理
+    """
+    hunks = []
+    hunk = None
+    remaining = 0  # 当前 hunk 声明的行数中尚未出现的行数（原文件与新文件行数之和）
+    lines = diff.splitlines()
+    for i, line in enumerate(lines):
+        if line.startswith("@@"):
+            match = HUNK_HEADER_RE.match(line)
+            hunk = Hunk(line, int(match.group(1)) if match else None)
+            hunks.append(hunk)
+            remaining = 0
+            if match:
+                remaining = sum(int(match.group(g)) if match.group(g) is not None else 1 for g in (2, 4))
+            continue
+        if remaining <= 0 and line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            hunk = None
+            continue
+        if hunk is None:
+            if line.startswith(("+++ ", "diff ", "index ", "new file mode", "deleted file mode")):
+                continue
+            hunk = Hunk("@@", None)
+            hunks.append(hunk)
+        if line.startswith("\\"):
+            if line.startswith(NO_NEWLINE_MARKER[:2]) and hunk.lines and hunk.lines[-1][0] == "+":
+                hunk.no_newline = True
+            continue
+        mark = line[:1]
+        if mark in (" ", "-", "+"):
+            hunk.lines.append((mark, line[1:]))
+        else:
+            hunk.lines.append((" ", line))
+        # 上下文行同时计入原文件与新文件
+        remaining -= 2 if mark not in ("-", "+") else 1
+    return [h for h in hunks if any(mark != " " for mark, _ in h.lines)]
+
+
+def split_lines(content):
+    """
+    把文件内容拆为 (不含换行符的行, 各行的换行符)；只按 \n、\r\n、\r 拆分（不同于 str.splitlines，
+    \x0c 等字符不视为换行）。常见的纯 \n 文件直接用 str.split，不逐行处理
+    """
+    if "\r" not in content:
+        lines = content.split("\n")
+        endings = ["\n"] * len(lines)
+        if lines[-1] == "":
+            lines.pop()
+            endings.pop()
+        else:
+            endings[-1] = ""
+        return lines, endings
+    lines, endings = [], []
+    for line in re.split(r"(?<=\r\n)|(?<=\r)(?!\n)|(?<=\n)", content):
+        if not line:
+            continue
+        text = line.rstrip("\r\n")
+        lines.append(text)
+        endings.append(line[len(text):])
+    return lines, endings
+
+
+def _normalize_ws(line):
+    return " ".join(line.split())
+
+
+class _LineIndex:
+    """
+    原文件各行（按比较方式归一化后）及行 → 出现位置列表，用于快速定位 hunk 的候选起点。
+    位置表在第一次需要偏移查找时才建立，提示位置准确的补丁不必扫描整个文件
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+        self._positions = None
+
+    @property
+    def positions(self):
+        if self._positions is None:
+            self._positions = {}
+            for i, key in enumerate(self.keys):
+                self._positions.setdefault(key, []).append(i)
+        return self._positions
+
+
+def _find_block(index, block, lo, hi, expected):
+    """在 [lo, hi] 范围内查找与 block 完全一致的起点，多个匹配时取离 expected 最近的；找不到返回 None"""
+    best = None
+    keys = index.keys
+    if lo <= expected <= hi and index.keys[expected:expected + len(block)] == block:
+        return expected
+    for pos in index.positions.get(block[0], ()):
+        if pos < lo or pos > hi:
+            continue
+        if keys[pos:pos + len(block)] != block:
+            continue
+        if best is None or abs(pos - expected) < abs(best - expected):
+            best = pos
+        elif pos > expected:
+            break
+    return best
+
+
+def locate_hunks(hunks, lines, max_fuzz):
+    """
+    在原文件的行列表（不含换行符）中依次定位各 hunk，返回 [(hunk, 位置或 None, 去掉的首部上下文行数, 去掉的尾部上下文行数, 说明)]。
+    与 GNU patch 相同的策略：先在提示位置附近精确匹配（允许偏移），失败后忽略行内空白差异，
+    再逐级去掉首尾各最多 max_fuzz 行上下文（fuzz）。各 hunk 按顺序、互不重叠
+    """
+    indexes = {}
+
+    def get_index(ignore_ws):
+        if ignore_ws not in indexes:
+            indexes[ignore_ws] = _LineIndex([_normalize_ws(l) for l in lines] if ignore_ws else lines)
+        return indexes[ignore_ws]
+
+    results = []
+    lo = 0
+    offset = 0
+    for hunk in hunks:
+        lead_ctx, trail_ctx = hunk.context_bounds()
+        hint = (hunk.old_start - 1 + offset) if hunk.old_start is not None else None
+        found = None
+        tried = set()
+        for fuzz in range(max_fuzz + 1):
+            lead, trail = min(fuzz, lead_ctx), min(fuzz, trail_ctx)
+            if (lead, trail) in tried:
+                break  # 已没有可去掉的上下文
+            tried.add((lead, trail))
+            block = hunk.old_lines(lead, trail)
+            if not block:
+                # 纯新增且没有上下文："-N,0" 表示插入到第 N 行之后，未给出位置时追加到末尾
+                pos = len(lines) if hint is None else hint + 1
+                found = (min(max(pos, lo), len(lines)), lead, trail, "")
+                break
+            for ignore_ws in (False, True):
+                index = get_index(ignore_ws)
+                key = [_normalize_ws(l) for l in block] if ignore_ws else block
+                expected = (hint + lead) if hint is not None else lo
+                pos = _find_block(index, key, lo, len(lines) - len(block), expected)
+                if pos is None:
+                    continue
+                notes = []
+                if hint is not None and pos != hint + lead:
+                    notes.append(f"偏移 {pos - hint - lead:+d} 行")
+                if ignore_ws:
+                    notes.append("忽略空白差异")
+                if fuzz:
+                    notes.append(f"fuzz {fuzz}")
+                found = (pos, lead, trail, "，".join(notes))
+                break
+            if found:
+                break
+        if found is None:
+            results.append((hunk, None, 0, 0, "未找到匹配的上下文"))
+            continue
+        pos, lead, trail, note = found
+        results.append((hunk, pos, lead, trail, note))
+        if hint is not None and hunk.old_lines():
+            offset = pos - lead - (hunk.old_start - 1)
+        lo = pos + len(hunk.old_lines(lead, trail))
+    return results
+
+
+def apply_located(lines, endings, located, eol, unescape):
+    """
+    按定位结果生成新内容：上下文行保留原文件中的行（含原换行符），新增行使用文件的换行符；
+    返回新文本。调用方保证 located 中所有位置均已找到
+    """
+    out = []
+    unterminated = []  # 可能缺少换行符的片段下标：原文件末行与带 "\ No newline" 标记的新增行
+    cursor = 0
+
+    def copy(start, stop):
+        out.extend(map(str.__add__, lines[start:stop], endings[start:stop]))
+        if stop == len(lines) and start < stop and not endings[-1]:
+            unterminated.append(len(out) - 1)
+
+    for hunk, pos, lead, trail, _ in located:
+        copy(cursor, pos)
+        src = pos
+        body = hunk.lines[lead:len(hunk.lines) - trail]
+        for k, (mark, text) in enumerate(body):
+            if mark == " ":
+                copy(src, src + 1)
+                src += 1
+            elif mark == "-":
+                src += 1
+            elif k == len(body) - 1 and trail == 0 and hunk.no_newline:
+                out.append(unescape(text))
+                unterminated.append(len(out) - 1)
+            else:
+                out.append(unescape(text) + eol)
+        cursor = src
+    copy(cursor, len(lines))
+    # 缺少换行符的行之后又有内容时补上换行符
+    for i in unterminated:
+        if i != len(out) - 1:
+            out[i] += eol
+    return "".join(out)
+
+
+class PatchAction(BaseAction):
+    def execute_stream(self):
+        path = self.parameters.get("path")
+        config = self.parameters.get("_config", {})
+        workdir = config.get("working_dir", os.getcwd())
+        diff = self.parameters.get("diff") or ""
+        settings = file_edit_settings(config.get("file_edit"))
+
+        try:
+            abs_path = self.safe_abs_path(path, workdir)
+        except PermissionError as e:
+            yield ("", str(e), 1)
+            return
+
+        try:
+            fuzz = int(self.parameters.get("fuzz", settings["patch_max_fuzz"]))
+            hunks = parse_unified_diff(diff)
+            if not hunks:
+                yield ("", "错误: 补丁中没有可应用的 hunk", 1)
+                return
+            yield from self._apply(abs_path, hunks, fuzz, settings)
+        except Exception as e:
+            logger.exception("补丁应用失败")
+            yield ("", f"补丁应用失败: {e}", 1)
+        finally:
+            self.invalidate_paths(workdir)
+
+    def _apply(self, abs_path, hunks, max_fuzz, settings):
+        """
+        所有 hunk 都定位成功才写入（临时文件 + os.replace），任一 hunk 失败时文件保持不变；
+        每个 hunk 产出一条结果，最后产出汇总
+        """
+        target = os.path.realpath(abs_path)
+        exists = os.path.exists(target)
+        if exists:
+            with open(target, "r", encoding="utf-8", newline="") as f:
+                lines, endings = split_lines(f.read())  # newline="" 时保留原换行符
+        elif all(not h.old_lines() for h in hunks):
+            # 新建文件的补丁（--- /dev/null）：只有新增行
+            lines, endings = [], []
+        else:
+            yield ("", f"错误: 文件不存在: {abs_path}", 1)
+            return
+
+        eol = endings[0] if endings and endings[0] else "\n"
+        located = locate_hunks(hunks, lines, max_fuzz)
+        total = len(located)
+        failed = 0
+        for i, (hunk, pos, _, _, note) in enumerate(located, 1):
+            prefix = f"hunk {i}/{total} {hunk.header}: "
+            if pos is None:
+                failed += 1
+                yield ("", f"{prefix}失败: {note}\n", 1)
+            else:
+                yield (f"{prefix}已应用于第 {pos + 1} 行" + (f"（{note}）" if note else "") + "\n", "", 0)
+
+        if failed:
+            yield ("", f"补丁未应用: {failed}/{total} 个 hunk 失败，文件未修改: {abs_path}", 1)
+            return
+
+        content = apply_located(lines, endings, located, eol, html.unescape)
+        if not exists:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+        with atomic_output(target, settings["fsync"]) as dst:
+            dst.write(content)
+            if exists and settings["backup"] == "store":
+                get_backup_store(settings).backup(target)
+        yield (f"补丁应用成功: {abs_path}（{total} 个 hunk）\n", "", 0)
@@ -0,0 +1,181 @@
+# 子进程输出的事件驱动读取：非阻塞管道 + selector，按大小/时间窗口合并输出块
+import os
+import time
+import codecs
+import signal
+import logging
+import selectors
+import threading
+
+logger = logging.getLogger("ai_project_helper.actions.process_stream")
+
+DEFAULT_CHUNK_BYTES = 8192       # 缓冲达到该字节数立即输出
+DEFAULT_FLUSH_INTERVAL = 0.05    # 缓冲中最早的数据最多等待的秒数
+READ_SIZE = 65536
+# 不支持 pidfd 时，检测"主进程已退出但管道仍被后台子进程占用"的兜底间隔
+EXIT_CHECK_INTERVAL = 1.0
+# 不支持 pidfd 且管道都已关闭时，等待进程退出的轮询间隔
+EXIT_POLL_INTERVAL = 0.05
+DEFAULT_KILL_GRACE = 5.0         # SIGTERM 后等待进程组退出的秒数，超时则 SIGKILL
+
+
+def _open_pidfd(proc):
+    pidfd_open = getattr(os, "pidfd_open", None)
+    if pidfd_open is None:
+        return None
+    try:
+        return pidfd_open(proc.pid)
+    except OSError:
+        return None
+
+
+class _PipeBuffer:
+    """单个管道的增量 UTF-8 解码与待发送缓冲"""
+
+    def __init__(self):
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.parts = []
+        self.size = 0
+
+    def feed(self, data, final=False):
+        text = self.decoder.decode(data, final)
+        if text:
+            self.parts.append(text)
+        self.size += len(data)
+
+    def take(self):
+        text = "".join(self.parts)
+        self.parts = []
+        self.size = 0
+        return text
+
+
+def stream_process_output(proc, chunk_bytes=DEFAULT_CHUNK_BYTES, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                          deadline=None, idle_timeout=None):
+    """
+    读取 proc.stdout / proc.stderr（须为二进制管道），产出 (out, err) 文本块。
+    没有输出时阻塞在 select 上而不是轮询；多字节字符跨读取边界时不会被截断。
+    主进程退出后即结束（即使后台子进程仍持有管道），不会因此挂起；管道先于进程关闭时继续等待进程退出。
+    deadline（time.monotonic 时刻）已到或连续 idle_timeout 秒无输出时（包括管道关闭后进程仍未退出），
+    先产出已缓冲的输出再抛出 TimeoutError，由调用方终止进程。
+    """
+    selector = selectors.DefaultSelector()
+    buffers = {}
+    for name, pipe in (("out", proc.stdout), ("err", proc.stderr)):
+        if pipe is None:
+            continue
+        fd = pipe.fileno()
+        os.set_blocking(fd, False)
+        selector.register(fd, selectors.EVENT_READ, name)
+        buffers[name] = _PipeBuffer()
+
+    pidfd = _open_pidfd(proc)
+    if pidfd is not None:
+        selector.register(pidfd, selectors.EVENT_READ, "exit")
+
+    def flush():
+        return buffers["out"].take() if "out" in buffers else "", \
+            buffers["err"].take() if "err" in buffers else ""
+
+    def read_available(fd, name, final=False):
+        # 读取管道当前可读的全部数据；返回 False 表示已到 EOF
+        while True:
+            try:
+                data = os.read(fd, READ_SIZE)
+            except BlockingIOError:
+                return True
+            if not data:
+                buffers[name].feed(b"", final=True)
+                return False
+            buffers[name].feed(data)
+            if not final:
+                return True
+
+    pending_since = None
+    last_output = time.monotonic()
+    exited = False
+    try:
+        while True:
+            # 管道都已关闭（如命令把输出重定向到文件）后继续等待进程退出，时限照常生效
+            pipes_open = any(key.data in buffers for key in selector.get_map().values())
+            if not pipes_open and (exited or proc.poll() is not None):
+                break
+            # 等待到最近的一个时间点：缓冲发送、总时限、无输出时限
+            wake_at = [t for t in (
+                pending_since + flush_interval if pending_since is not None else None,
+                deadline,
+                last_output + idle_timeout if idle_timeout else None,
+            ) if t is not None]
+            timeout = max(0.0, min(wake_at) - time.monotonic()) if wake_at else None
+            if pidfd is None:
+                interval = EXIT_CHECK_INTERVAL if pipes_open else EXIT_POLL_INTERVAL
+                timeout = interval if timeout is None else min(timeout, interval)
+
+            for key, _ in selector.select(timeout):
+                if key.data == "exit":
+                    exited = True
+                    continue
+                if not read_available(key.fd, key.data):
+                    selector.unregister(key.fd)
+                last_output = time.monotonic()
+                if pending_since is None and any(b.size for b in buffers.values()):
+                    pending_since = last_output
+
+            if exited or (pidfd is None and proc.poll() is not None):
+                # 主进程已退出：取走管道中剩余数据后结束
+                for key in list(selector.get_map().values()):
+                    if key.data in buffers:
+                        read_available(key.fd, key.data, final=True)
+                break
+
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                reason = "执行超时"
+            elif idle_timeout and now - last_output >= idle_timeout:
+                reason = f"连续 {idle_timeout} 秒无输出"
+            else:
+                reason = None
+            if reason is not None:
+                out, err = flush()
+                if out or err:
+                    yield out, err
+                raise TimeoutError(reason)
+
+            buffered = sum(b.size for b in buffers.values())
+            if buffered and (buffered >= chunk_bytes
+                             or time.monotonic() - pending_since >= flush_interval):
+                out, err = flush()
+                pending_since = None
+                if out or err:  # 只缓冲了半个多字节字符时不发送空块
+                    yield out, err
+
+        out, err = flush()
+        if out or err:
+            yield out, err
+    finally:
+        selector.close()
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+def terminate_process_group(proc, grace=DEFAULT_KILL_GRACE):
+    """
+    终止以 start_new_session=True 启动的进程及其全部子孙进程：
+    先向进程组发送 SIGTERM，grace 秒后进程组仍存在则 SIGKILL。不阻塞调用方
+    """
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    logger.info(f"已向进程组 {proc.pid} 发送 SIGTERM")
+
+    def force_kill():
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            return
+        logger.warning(f"进程组 {proc.pid} 在 {grace} 秒内未退出，已发送 SIGKILL")
+
+    timer = threading.Timer(grace, force_kill)
+    timer.daemon = True
+    timer.start()
@@ -0,0 +1,95 @@
+# 工作目录路径沙箱：把动作中的路径解析为工作目录内的绝对路径，并阻止访问工作目录之外
+import os
+import re
+import threading
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger("ai_project_helper.actions.sandbox")
+
+# 命令中的绝对路径：/a/b/c（前面不是单词字符）
+ABSPATH_IN_COMMAND_RE = re.compile(r'(?<![\w])(/\w[\w\-/\.]*)')
+
+DEFAULT_CACHE_SIZE = 4096   # 每个工作目录缓存的路径解析结果数
+MAX_SANDBOXES = 64          # 保留的工作目录沙箱数，超出后全部重建
+
+
+def is_within(root, path):
+    """path 是否为 root 本身或位于其下（按路径组成部分比较，/work/proj10 不属于 /work/proj1）"""
+    return os.path.commonpath([root, path]) == root
+
+
+class PathSandbox:
+    """
+    一个工作目录的路径沙箱，工作目录的绝对路径与真实路径只计算一次。
+    - resolve：相对路径拼接到工作目录；绝对路径若位于工作目录的上级目录下，改写为相对该上级目录、位于工作目录下的路径；
+      结果按路径组成部分判断是否在工作目录内，并对真实路径（解析符号链接后）再判断一次，防止通过链接逃逸；
+    - remap_command：把 shell 命令中工作目录之外的绝对路径改写到工作目录下。
+    解析结果按 LRU 缓存；shell 命令、文件编辑、补丁、目录操作与快照回滚都可能改变路径（含符号链接），执行后调用 invalidate 清空缓存
+    """
+
+    def __init__(self, workdir, cache_size=DEFAULT_CACHE_SIZE):
+        self.workdir = os.path.abspath(workdir)
+        self.real_workdir = os.path.realpath(self.workdir)
+        # 绝对路径改写的基准：工作目录的上级目录（如 /aiWorkDir/<project> 的 /aiWorkDir）
+        self.base_dir = os.path.dirname(self.workdir)
+        self._resolve_cached = lru_cache(maxsize=cache_size)(self._resolve)
+        self._remap_cached = lru_cache(maxsize=cache_size)(self._remap_path)
+
+    def resolve(self, path):
+        """返回 path 在工作目录内的绝对路径；位于工作目录之外时抛出 PermissionError"""
+        return self._resolve_cached(path)
+
+    def _resolve(self, path):
+        if os.path.isabs(path):
+            candidate = os.path.normpath(path)
+            if not is_within(self.workdir, candidate) and is_within(self.base_dir, candidate):
+                candidate = os.path.join(self.workdir, os.path.relpath(candidate, self.base_dir))
+                logger.debug(f"[路径重写] {path} → {candidate}")
+        else:
+            candidate = os.path.normpath(os.path.join(self.workdir, path))
+
+        if not is_within(self.workdir, candidate) or not is_within(self.real_workdir, os.path.realpath(candidate)):
+            raise PermissionError(
+                f"安全警告：不允许访问工作目录之外的路径: {candidate}\n"
+                f"工作目录: {self.workdir}"
+            )
+        logger.debug(f"[路径解析] {path} → {candidate}")
+        return candidate
+
+    def remap_command(self, cmd):
+        """将命令字符串中的绝对路径替换为以工作目录为根的路径，已位于工作目录内的路径保持不变"""
+        return ABSPATH_IN_COMMAND_RE.sub(lambda m: self._remap_cached(m.group(0)), cmd)
+
+    def _remap_path(self, abspath):
+        if is_within(self.workdir, abspath):
+            return abspath
+        return os.path.join(self.workdir, abspath.lstrip("/"))
+
+    def invalidate(self):
+        """清空解析缓存（工作目录中的符号链接可能已变化）"""
+        self._resolve_cached.cache_clear()
+
+
+_sandboxes = {}  # 工作目录（调用方传入的写法及其绝对路径）-> PathSandbox
+_sandboxes_lock = threading.Lock()
+
+
+def get_path_sandbox(workdir):
+    """
+    按工作目录共享 PathSandbox，file_edit、directory、patch、shell 与动作调度器使用同一个实例。
+    同一写法的工作目录直接查表（每个动作都会调用，不做路径规范化、不加锁）；不同写法指向同一目录时共享实例
+    """
+    sandbox = _sandboxes.get(workdir)
+    if sandbox is not None:
+        return sandbox
+    key = os.path.abspath(workdir)
+    with _sandboxes_lock:
+        sandbox = _sandboxes.get(key)
+        if sandbox is None:
+            if len(_sandboxes) >= MAX_SANDBOXES:
+                _sandboxes.clear()
+            sandbox = PathSandbox(key)
+            _sandboxes[key] = sandbox
+        _sandboxes[workdir] = sandbox
+        return sandbox
@@ -1,31 +1,42 @@
 import os
+import time
 import subprocess
 import logging
-import select
-import re
 from .base import BaseAction
+from .process_stream import (
+    stream_process_output, terminate_process_group,
+    DEFAULT_CHUNK_BYTES, DEFAULT_FLUSH_INTERVAL, DEFAULT_KILL_GRACE,
+)
+from ai_project_helper.actions.sandbox import get_path_sandbox
+from ai_project_helper.core.cancellation import OperationCancelled, ExecutionTimeout
 
 logger = logging.getLogger("ai_project_helper.actions.shell")
 
 def remap_abspath_to_workdir(cmd, workdir):
     """
     将命令字符串中的绝对路径替换为以工作目录为根的路径。
-    仅替换以 / 开头的路径，并确保路径不以工作目录开头
+    仅替换以 / 开头的路径，已位于工作目录内的路径保持不变
     """
-    workdir = os.path.abspath(workdir)
-    
-    def _replace(match):
-        abspath = match.group(0)
-        # 如果路径已经以工作目录开头，则不需要重写
-        if abspath.startswith(workdir):
-            return abspath
-        # 否则重写为工作目录下的路径
-        rel_path = abspath.lstrip("/")
-        safe_path = os.path.join(workdir, rel_path)
-        return safe_path
-    
-    # 匹配 /a/b/c 等路径，但排除已包含工作目录的路径
-    return re.sub(r'(?<![\w])(/\w[\w\-/\.]*)', _replace, cmd)
+    return get_path_sandbox(workdir).remap_command(cmd)
+
+# 资源限制配置项 → (ulimit 参数, 换算倍数)
+RLIMIT_OPTIONS = {
+    "rlimit_cpu_seconds": ("-t", 1),
+    "rlimit_address_space_mb": ("-v", 1024),   # ulimit -v 以 KB 为单位
+    "rlimit_open_files": ("-n", 1),
+}
+
+def apply_rlimits(cmd, shell_config):
+    """
+    在命令前加 ulimit，限制对 shell 及其全部子进程生效。
+    不使用 preexec_fn：服务端是多线程的，fork 后执行 Python 代码并不安全
+    """
+    limits = [
+        f"ulimit {flag} {int(shell_config[key] * scale)} || exit 126\n"
+        for key, (flag, scale) in RLIMIT_OPTIONS.items()
+        if shell_config.get(key)
+    ]
+    return "".join(limits) + cmd
 
 class ShellCommandAction(BaseAction):
     def execute_stream(self):
@@ -40,55 +51,70 @@ class ShellCommandAction(BaseAction):
         command = remap_abspath_to_workdir(command, working_dir)
         logger.info(f"Executing command: {command} (cwd={working_dir})")
         
+        shell_config = config.get("shell", {})
+        chunk_bytes = shell_config.get("chunk_bytes", DEFAULT_CHUNK_BYTES)
+        flush_interval = shell_config.get("flush_interval_ms", DEFAULT_FLUSH_INTERVAL * 1000) / 1000.0
+        kill_grace = shell_config.get("kill_grace_seconds", DEFAULT_KILL_GRACE)
+        cancel_token = config.get("cancel_token")
+        # 时限 <= 0 表示不限制
+        action_timeout = shell_config.get("action_timeout_seconds") or 0
+        idle_timeout = shell_config.get("idle_timeout_seconds") or 0
+        deadline = time.monotonic() + action_timeout if action_timeout > 0 else None
+        idle_timeout = idle_timeout if idle_timeout > 0 else None
+
+        proc = None
+        cancel_handle = None
         try:
-            # 使用Popen执行命令
+            # 二进制管道，由 stream_process_output 做非阻塞读取与增量解码
             proc = subprocess.Popen(
-                command, 
+                apply_rlimits(command, shell_config),
                 shell=True,
                 cwd=working_dir,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,  # 行缓冲
-                universal_newlines=True
+                bufsize=0,
+                start_new_session=True,  # 独立进程组，便于整体终止
             )
-            
-            # 使用select处理实时输出
-            while True:
-                # 检查进程是否结束
-                if proc.poll() is not None:
-                    break
-                    
-                # 非阻塞读取输出
-                reads = [proc.stdout.fileno(), proc.stderr.fileno()]
-                ret = select.select(reads, [], [], 0.1)[0]
-                
-                for fd in ret:
-                    if fd == proc.stdout.fileno():
-                        line = proc.stdout.readline()
-                        if line:
-                            yield (line, "", None)
-                    if fd == proc.stderr.fileno():
-                        line = proc.stderr.readline()
-                        if line:
-                            yield ("", line, None)
-            
-            # 获取退出码
-            return_code = proc.poll()
-            
-            # 读取剩余输出
-            for line in proc.stdout:
-                yield (line, "", return_code)
-            for line in proc.stderr:
-                yield ("", line, return_code)
-            
+            # 请求取消时终止整个进程组，输出流随管道关闭而结束
+            if cancel_token is not None:
+                cancel_handle = cancel_token.add_callback(
+                    lambda: terminate_process_group(proc, kill_grace)
+                )
+
+            # 按大小/时间窗口合并后的输出块
+            try:
+                for out, err in stream_process_output(
+                    proc, chunk_bytes, flush_interval, deadline=deadline, idle_timeout=idle_timeout
+                ):
+                    yield (out, err, None)
+            except TimeoutError as e:
+                # 进程组在 finally 中终止
+                raise ExecutionTimeout(f"命令已终止: {e}")
+
+            return_code = proc.wait()
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
             # 根据退出码生成最终结果
             if return_code == 0:
                 yield (f"Command completed successfully (exit code: {return_code})\n", "", return_code)
             else:
                 raise RuntimeError(f"Command failed with exit code: {return_code}")
-                
+
+        except OperationCancelled:
+            raise
         except Exception as e:
             logger.exception("Command execution error")
             yield ("", f"Command execution failed: {str(e)}", 1)
- 
\ No newline at end of file
+        finally:
+            if cancel_token is not None:
+                cancel_token.remove_callback(cancel_handle)
+            if proc is not None:
+                if proc.poll() is None:
+                    # 超时或调用方提前停止迭代：不留下仍在运行的进程组；SIGKILL 兜底，等待时间有上限
+                    terminate_process_group(proc, kill_grace)
+                    proc.wait()
+                proc.stdout.close()
+                proc.stderr.close()
+                # 命令可能创建或改动了符号链接，之前的路径解析结果不再可信
+                get_path_sandbox(working_dir).invalidate()
@@ -0,0 +1,43 @@
+# 增量协议（RunPlanDelta/GetPlanThenRunDelta）的客户端解码：还原为 ActionFeedback，沿用原有的打印与统计逻辑
+from ai_project_helper.proto import helper_pb2
+
+
+def decode_feedback_events(events):
+    """FeedbackEvent 流 → ActionFeedback 流"""
+    started = {}  # action_id -> ActionStarted
+    for event in events:
+        kind = event.WhichOneof("event")
+        if kind == "feedback":
+            yield event.feedback
+        elif kind == "started":
+            header = event.started
+            started[header.action_id] = header
+            yield _to_feedback(header, "running", header.step_description)
+        elif kind == "chunk":
+            header = started[event.chunk.action_id]
+            yield _to_feedback(
+                header, "running", header.step_description,
+                output=event.chunk.output, error=event.chunk.error
+            )
+        elif kind == "finished":
+            finished = event.finished
+            header = started.pop(finished.action_id)
+            yield _to_feedback(
+                header, finished.status, finished.step_description,
+                output=finished.output, error=finished.error, exit_code=finished.exit_code
+            )
+
+
+def _to_feedback(header, status, description, output=b"", error=b"", exit_code=0):
+    return helper_pb2.ActionFeedback(
+        action_index=header.action_index,
+        action_type=header.action_type,
+        step_description=description,
+        status=status,
+        output=output.decode("utf-8", errors="replace"),
+        error=error.decode("utf-8", errors="replace"),
+        command=header.command,
+        step_index=header.step_index,
+        total_steps=header.total_steps,
+        exit_code=exit_code,
+    )
@@ -0,0 +1,117 @@
+# 执行日志的流式写入：边接收反馈边追加到文件，内存占用与总输出量无关
+import os
+import gzip
+import time
+import threading
+from datetime import datetime
+
+DEFAULT_BUFFER_BYTES = 64 * 1024   # 缓冲达到该大小即写入文件
+DEFAULT_FLUSH_INTERVAL = 2.0       # 距上次落盘超过该秒数即写入文件
+
+
+class ExecutionLogWriter:
+    """
+    执行日志写入器，写入 directory/{prefix}-{时间戳}.txt：
+    - 首次写入时才创建文件（没有内容时不产生日志文件）；
+    - 缓冲写入，按大小或时间间隔落盘：有数据待写时由后台定时器在 flush_interval 内落盘，
+      长时间没有新反馈（如等待无输出的命令）时也不会滞留，客户端异常退出时最多丢失一个缓冲周期的日志；
+    - compress=True 时写 gzip（.txt.gz），每次落盘做一次同步刷新，已写部分可直接解压；
+    - max_bytes > 0 时按未压缩大小滚动，后续文件依次为 .part2、.part3 ...
+    """
+
+    def __init__(self, directory, prefix, compress=False, max_bytes=0,
+                 buffer_bytes=DEFAULT_BUFFER_BYTES, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.directory = directory
+        self.prefix = prefix
+        self.compress = compress
+        self.max_bytes = max_bytes
+        self.buffer_bytes = buffer_bytes
+        self.flush_interval = flush_interval
+        self.paths = []
+        self._file = None
+        self._file_bytes = 0
+        self._buffer = []
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._base_name = None
+        self._lock = threading.Lock()  # 定时器线程与写入线程共用
+        self._timer = None
+
+    def _open_next(self):
+        if self._base_name is None:
+            os.makedirs(self.directory, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            self._base_name = f"{self.prefix}-{timestamp}"
+        part = len(self.paths) + 1
+        name = self._base_name if part == 1 else f"{self._base_name}.part{part}"
+        path = os.path.join(self.directory, name + (".txt.gz" if self.compress else ".txt"))
+        self._file = gzip.open(path, "wb") if self.compress else open(path, "wb")
+        self._file_bytes = 0
+        self.paths.append(path)
+
+    def write(self, text):
+        if not text:
+            return
+        data = text.encode("utf-8")
+        with self._lock:
+            self._buffer.append(data)
+            self._buffered += len(data)
+            if (self._buffered >= self.buffer_bytes
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+            elif self._timer is None:
+                # 之后没有新的写入时，由定时器在时间间隔到达时落盘
+                delay = max(0.0, self._last_flush + self.flush_interval - time.monotonic())
+                self._timer = threading.Timer(delay, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_on_timer(self):
+        with self._lock:
+            self._timer = None
+            if self._buffer:
+                self._flush_locked()
+
+    def flush(self):
+        """把缓冲写入文件并刷新到磁盘"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        data = b"".join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+
+        # 滚动按日志条目边界进行：单个缓冲不会被拆到两个文件中
+        if self._file is not None and self.max_bytes and self._file_bytes >= self.max_bytes:
+            self._file.close()
+            self._file = None
+        if self._file is None:
+            self._open_next()
+        self._file.write(data)
+        self._file_bytes += len(data)
+        if self.compress:
+            self._file.flush(zlib_mode=gzip.zlib.Z_SYNC_FLUSH)
+        else:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._flush_locked()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            for path in self.paths:
+                print(f"✅ 内容已保存至: {path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -38,6 +38,18 @@ def main():
                              help="gRPC服务器地址 (默认: localhost:50051)")
     parent_parser.add_argument("--N", dest="project", required=True, help="项目ID")
     parent_parser.add_argument("--F", dest="file_path", required=True, help="文件路径")
+    parent_parser.add_argument("--delta", action="store_true",
+                             help="使用增量反馈协议（动作信息只发送一次，之后只传输出增量），仅B/AB步骤")
+    parent_parser.add_argument("--plan-timeout", type=int, default=0,
+                             help="整个计划的执行时限(秒)，0为服务端默认，负数为不限制，仅B/AB步骤")
+    parent_parser.add_argument("--action-timeout", type=int, default=0,
+                             help="单个命令的执行时限(秒)，0为服务端默认，负数为不限制，仅B/AB步骤")
+    parent_parser.add_argument("--idle-timeout", type=int, default=0,
+                             help="命令连续无输出的时限(秒)，0为服务端默认，负数为不限制，仅B/AB步骤")
+    parent_parser.add_argument("--log-gzip", action="store_true",
+                             help="执行日志以 gzip 压缩写入，仅B/AB步骤")
+    parent_parser.add_argument("--log-max-mb", type=float, default=0,
+                             help="单个执行日志文件的大小上限(MB)，超过后滚动到新文件，0为不限制，仅B/AB步骤")
     
     # A: get-plan 命令
     get_plan_parser = subparsers.add_parser("A", parents=[parent_parser], 
@@ -51,6 +63,12 @@ def main():
     # B: execute-plan 命令
     execute_plan_parser = subparsers.add_parser("B", parents=[parent_parser], 
                                               help="执行现有计划")
+    execute_plan_parser.add_argument("--no-cache", action="store_true",
+                                   help="跳过服务端的步骤翻译缓存，重新请求LLM")
+    execute_plan_parser.add_argument("--resume", action="store_true",
+                                   help="依据服务端检查点，从第一个未完成的步骤续跑")
+    execute_plan_parser.add_argument("--batch-window-ms", type=int, default=0,
+                                   help="服务端合并输出反馈的窗口(毫秒)，0为服务端默认，负数为不合并")
     
     # AB: get-and-execute 命令
     get_execute_parser = subparsers.add_parser("AB", parents=[parent_parser], 
@@ -60,6 +78,10 @@ def main():
     get_execute_parser.add_argument("--llm-url", 
                                   default="http://43.132.224.225:8000/v1/chat/completions", 
                                   help="LLM API URL")
+    get_execute_parser.add_argument("--no-cache", action="store_true",
+                                  help="跳过服务端的步骤翻译缓存，重新请求LLM")
+    get_execute_parser.add_argument("--batch-window-ms", type=int, default=0,
+                                  help="服务端合并输出反馈的窗口(毫秒)，0为服务端默认，负数为不合并")
     
     args = parser.parse_args()
     
@@ -70,7 +92,10 @@ def main():
     # 创建上下文
     context = {
         "grpc_channel": args.grpc,
-        "logger": logger
+        "logger": logger,
+        "delta": args.delta,
+        "log_gzip": args.log_gzip,
+        "log_max_bytes": int(args.log_max_mb * 1024 * 1024)
     }
     
     # 根据命令执行相应操作
@@ -88,7 +113,13 @@ def main():
         elif args.command == "B":
             request = helper_pb2.PlanExecuteRequest(
                 plan_text=args.file_path,
-                project_id=args.project
+                project_id=args.project,
+                no_cache=args.no_cache,
+                resume=args.resume,
+                batch_window_ms=args.batch_window_ms,
+                plan_timeout_seconds=args.plan_timeout,
+                action_timeout_seconds=args.action_timeout,
+                idle_timeout_seconds=args.idle_timeout
             )
             execute_plan.run_execute_plan(request, context)
             
@@ -98,7 +129,12 @@ def main():
                 requirement=requirement_text,
                 model=args.model,
                 llm_url=args.llm_url,
-                project_id=args.project
+                project_id=args.project,
+                no_cache=args.no_cache,
+                batch_window_ms=args.batch_window_ms,
+                plan_timeout_seconds=args.plan_timeout,
+                action_timeout_seconds=args.action_timeout,
+                idle_timeout_seconds=args.idle_timeout
             )
             get_plan_then_execute.run_get_plan_then_execute(request, context)
     
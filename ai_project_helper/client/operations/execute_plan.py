@@ -4,8 +4,9 @@ import grpc
 import os
 from datetime import datetime
 from ai_project_helper.proto import helper_pb2, helper_pb2_grpc
+from ai_project_helper.client.delta_feedback import decode_feedback_events
 from ai_project_helper.client.utils import (
-    save_execution_log,
+    open_execution_log,
     print_feedback,
     init_statistics,
     truncate_long_text,
@@ -17,7 +18,6 @@ def run_execute_plan(request, context):
     logger = context["logger"]
     statistics = init_statistics()
     start_time = datetime.now()
-    execution_log = ""
     
     # 读取计划文件
     if not os.path.exists(request.plan_text):
@@ -30,28 +30,43 @@ def run_execute_plan(request, context):
     # 创建执行请求
     execute_request = helper_pb2.PlanExecuteRequest(
         plan_text=plan_text,
-        project_id=request.project_id
+        project_id=request.project_id,
+        no_cache=request.no_cache,
+        resume=request.resume,
+        batch_window_ms=request.batch_window_ms,
+        plan_timeout_seconds=request.plan_timeout_seconds,
+        action_timeout_seconds=request.action_timeout_seconds,
+        idle_timeout_seconds=request.idle_timeout_seconds
     )
     
-    with grpc.insecure_channel(context["grpc_channel"]) as channel:
+    log_options = {
+        "compress": context.get("log_gzip", False),
+        "max_bytes": context.get("log_max_bytes", 0),
+    }
+    with grpc.insecure_channel(context["grpc_channel"]) as channel, \
+            open_execution_log(request.project_id, **log_options) as execution_log:
         stub = helper_pb2_grpc.AIProjectHelperStub(channel)
         
         logger.info(f"🚀 开始执行计划: {request.plan_text}")
         
         try:
-            for feedback in stub.RunPlan(execute_request):
+            if context.get("delta"):
+                feedbacks = decode_feedback_events(stub.RunPlanDelta(execute_request))
+            else:
+                feedbacks = stub.RunPlan(execute_request)
+            for feedback in feedbacks:
                 # 收集完整日志
                 log_entry = f"Step [{feedback.step_index}/{feedback.total_steps}] - {feedback.step_description}\n"
                 if feedback.output:
                     log_entry += f"输出: {feedback.output}\n"
                 if feedback.error:
                     log_entry += f"错误: {feedback.error}\n"
-                execution_log += log_entry + "-" * 60 + "\n"
+                execution_log.write(log_entry + "-" * 60 + "\n")
                 
                 print_feedback(feedback)
                 
                 # 只统计执行动作的最终状态
-                if feedback.action_index >= 0 and feedback.status.lower() in ["success", "warning", "failed"]:
+                if feedback.action_index >= 0 and feedback.status.lower() in ["success", "warning", "failed", "timeout"]:
                     statistics["total_actions"] += 1
                     statistics["action_types"][feedback.action_type] += 1
                     
@@ -68,7 +83,7 @@ def run_execute_plan(request, context):
                             "description": feedback.step_description,
                             "message": feedback.error or feedback.output
                         })
-                    elif feedback.status.lower() == "failed":
+                    elif feedback.status.lower() in ("failed", "timeout"):
                         statistics["failed_actions"] += 1
                         statistics["errors"].append({
                             "step": feedback.step_index,
@@ -89,9 +104,6 @@ def run_execute_plan(request, context):
             })
             statistics["failed_actions"] += 1
     
-    # 保存执行日志
-    save_execution_log(request.project_id, execution_log)
-    
     duration = (datetime.now() - start_time).total_seconds()
     print_summary(statistics, duration)
     return statistics
\ No newline at end of file
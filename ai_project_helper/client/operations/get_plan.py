@@ -24,7 +24,7 @@ def run_get_plan(request, context):
                 print_feedback(feedback)
                 
                 # 统计计划部分
-                if feedback.action_index < 0:
+                if feedback.action_type == "llm_plan_part" and feedback.status == "success":
                     statistics["plan_parts"] += 1
                 
                 # 保存完整计划
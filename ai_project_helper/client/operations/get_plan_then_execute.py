@@ -2,10 +2,11 @@ import grpc
 import os
 from datetime import datetime
 from ai_project_helper.proto import helper_pb2, helper_pb2_grpc
+from ai_project_helper.client.delta_feedback import decode_feedback_events
 
 from ai_project_helper.client.utils import (
     save_plan,  
-    save_execution_log,
+    open_execution_log,
     print_feedback,
     init_statistics,
     truncate_long_text,
@@ -18,27 +19,35 @@ def run_get_plan_then_execute(request, context):
     statistics = init_statistics()
     start_time = datetime.now()
     complete_plan = ""
-    execution_log = ""
     
-    with grpc.insecure_channel(context["grpc_channel"]) as channel:
+    log_options = {
+        "compress": context.get("log_gzip", False),
+        "max_bytes": context.get("log_max_bytes", 0),
+    }
+    with grpc.insecure_channel(context["grpc_channel"]) as channel, \
+            open_execution_log(request.project_id, **log_options) as execution_log:
         stub = helper_pb2_grpc.AIProjectHelperStub(channel)
         
         logger.info(f"📝 请求生成并执行计划: {request.requirement}")
         
         try:
-            for feedback in stub.GetPlanThenRun(request):
+            if context.get("delta"):
+                feedbacks = decode_feedback_events(stub.GetPlanThenRunDelta(request))
+            else:
+                feedbacks = stub.GetPlanThenRun(request)
+            for feedback in feedbacks:
                 # 收集完整日志
                 log_entry = f"Step [{feedback.step_index}/{feedback.total_steps}] - {feedback.step_description}\n"
                 if feedback.output:
                     log_entry += f"输出: {feedback.output}\n"
                 if feedback.error:
                     log_entry += f"错误: {feedback.error}\n"
-                execution_log += log_entry + "-" * 60 + "\n"
+                execution_log.write(log_entry + "-" * 60 + "\n")
                 
                 print_feedback(feedback)
                 
                 # 统计计划部分
-                if feedback.action_index < 0:
+                if feedback.action_type == "llm_plan_part" and feedback.status == "success":
                     statistics["plan_parts"] += 1
                 
                 # 保存完整计划
@@ -47,7 +56,7 @@ def run_get_plan_then_execute(request, context):
                     save_plan(request.project_id, complete_plan)  # 使用导入的函数
                 
                 # 只统计执行动作的最终状态
-                if feedback.action_index >= 0 and feedback.status.lower() in ["success", "warning", "failed"]:
+                if feedback.action_index >= 0 and feedback.status.lower() in ["success", "warning", "failed", "timeout"]:
                     statistics["total_actions"] += 1
                     statistics["action_types"][feedback.action_type] += 1
                     
@@ -64,7 +73,7 @@ def run_get_plan_then_execute(request, context):
                             "description": feedback.step_description,
                             "message": feedback.error or feedback.output
                         })
-                    elif feedback.status.lower() == "failed":
+                    elif feedback.status.lower() in ("failed", "timeout"):
                         statistics["failed_actions"] += 1
                         statistics["errors"].append({
                             "step": feedback.step_index,
@@ -85,9 +94,6 @@ def run_get_plan_then_execute(request, context):
             })
             statistics["failed_actions"] += 1
     
-    # 保存执行日志
-    save_execution_log(request.project_id, execution_log)
-    
     duration = (datetime.now() - start_time).total_seconds()
     print_summary(statistics, duration)
     return statistics
\ No newline at end of file
@@ -4,6 +4,7 @@ import ast
 import logging
 from datetime import datetime
 from collections import defaultdict
+from ai_project_helper.client.log_writer import ExecutionLogWriter
 
 def setup_logging():
     """配置日志系统"""
@@ -31,11 +32,11 @@ def save_plan(project_id, plan_content):
     """保存计划到 received-plans 目录"""
     return save_content("received-plans", f"{project_id}-plan", plan_content)
 
-def save_execution_log(project_id, log_content):
-    """保存执行日志到 plan-exe-logs 目录，仅当有内容时才保存"""
-    if not log_content.strip():  # 检查日志内容是否为空
-        return None
-    return save_content("plan-exe-logs", f"{project_id}-execution", log_content)
+def open_execution_log(project_id, compress=False, max_bytes=0):
+    """创建写入 plan-exe-logs 目录的流式执行日志，仅当有内容时才产生文件"""
+    return ExecutionLogWriter(
+        "plan-exe-logs", f"{project_id}-execution", compress=compress, max_bytes=max_bytes
+    )
 
 def truncate_long_text(text, max_length=200):
     """截断长文本用于显示"""
@@ -70,8 +71,18 @@ def print_feedback(feedback):
         "running": "🔄",
         "success": "✅",
         "warning": "⚠️",
-        "failed": "❌"
+        "failed": "❌",
+        "skipped": "⏭️",
+        "queued": "⏳",
+        "timeout": "⏱️",
+        "rolled_back": "↩️",
+        "cancelled": "⏹️"
     }
+    # 计划生成中的增量文本（服务端开启 stream_tokens 时）直接连续输出
+    if feedback.action_type == "llm_plan_part" and feedback.status.lower() == "running":
+        print(feedback.output, end="", flush=True)
+        return
+
     icon = status_icons.get(feedback.status.lower(), "❓")
     
     # 状态标签
@@ -79,13 +90,22 @@ def print_feedback(feedback):
         "running": "运行中",
         "success": "成功",
         "warning": "警告",
-        "failed": "失败"
+        "failed": "失败",
+        "skipped": "跳过",
+        "queued": "排队中",
+        "timeout": "超时",
+        "rolled_back": "已回滚",
+        "cancelled": "已取消"
     }.get(feedback.status.lower(), feedback.status.upper())
     
     # 区分计划步骤和执行步骤
     #step_type = "📝 计划" if feedback.action_index < 0 else f"🔧 步骤 {feedback.step_index}/{feedback.total_steps}"
         # 使用反馈中的步骤信息，而不是从描述中解析
-    step_type = f"🔧 步骤 {feedback.step_index}/{feedback.total_steps}"
+    # 边生成边执行时总步骤数未知（为 0），显示为 ?
+    if feedback.action_type == "llm_plan_part":
+        step_type = f"📝 计划 {feedback.part_index}/{feedback.total_parts}"
+    else:
+        step_type = f"🔧 步骤 {feedback.step_index}/{feedback.total_steps or '?'}"
     
     print(f"{icon} [{status_label}] {step_type} - {feedback.step_description}")
     
@@ -0,0 +1,126 @@
+# core/action_cache.py
+# 步骤 → actions 翻译结果的磁盘缓存，按 (model, 渲染后的消息列表) 内容寻址
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import logging
+
+logger = logging.getLogger("ai_project_helper.action_cache")
+
+DEFAULT_CACHE_CONFIG = {
+    "enabled": True,
+    "dir": "llm_action_cache",
+    "max_entries": 5000,         # 超出后按最近使用时间淘汰（LRU）
+    "ttl_seconds": 7 * 24 * 3600,
+}
+
+
+class ActionCache:
+    """
+    每个缓存条目是 <dir>/<sha256>.json，文件 mtime 记录最近一次命中时间。
+    内存中维护 key → mtime 索引，淘汰时无需重新扫描目录。
+    """
+
+    def __init__(self, cache_dir, max_entries=5000, ttl_seconds=7 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = {}
+        for entry in os.scandir(cache_dir):
+            if entry.is_file() and entry.name.endswith(".json"):
+                self._index[entry.name[:-len(".json")]] = entry.stat().st_mtime
+
+    @staticmethod
+    def make_key(model, messages):
+        """messages 为发送给 LLM 的消息列表，按顺序对每条消息的 role 与 content 求哈希"""
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        for message in messages:
+            digest.update(b"\0")
+            digest.update(message["role"].encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(message["content"].encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """命中时返回 actions 列表（新对象，可随意修改），未命中或已过期返回 None"""
+        with self._lock:
+            if key not in self._index:
+                return None
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self._discard(key)
+                return None
+            # 旧版本写入的空动作列表视为未命中
+            if not entry.get("actions") or (
+                    self.ttl_seconds and time.time() - entry.get("created", 0) > self.ttl_seconds):
+                self._discard(key)
+                return None
+            now = time.time()
+            os.utime(path, (now, now))
+            self._index[key] = now
+            return entry["actions"]
+
+    def put(self, key, actions):
+        entry = {"created": time.time(), "actions": actions}
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(entry, f, ensure_ascii=False)
+                os.replace(tmp_path, self._path(key))
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._index[key] = time.time()
+            self._evict()
+
+    def _discard(self, key):
+        self._index.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        overflow = len(self._index) - self.max_entries
+        if overflow <= 0:
+            return
+        for key, _ in sorted(self._index.items(), key=lambda item: item[1])[:overflow]:
+            self._discard(key)
+        logger.info(f"动作缓存淘汰 {overflow} 条最久未使用的条目")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_action_cache(config):
+    """获取进程级共享的 ActionCache；config['action_cache']['enabled'] 为 false 时返回 None"""
+    global _cache
+    cache_config = dict(DEFAULT_CACHE_CONFIG)
+    cache_config.update(config.get("action_cache") or {})
+    if not cache_config["enabled"]:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ActionCache(
+                cache_config["dir"],
+                max_entries=cache_config["max_entries"],
+                ttl_seconds=cache_config["ttl_seconds"],
+            )
+            logger.info(f"动作缓存目录: {os.path.abspath(cache_config['dir'])}")
+        return _cache
@@ -1,34 +1,120 @@
-# 功能（工具）调用解析
-import re
+# 功能（工具）调用解析：单遍扫描，按下标定位标签，参数值只复制一次
 from ai_project_helper.core.action_schema import ACTION_SCHEMAS
 from ai_project_helper.actions import ACTION_TYPE_ALIAS
 
 
-FN_REGEX_PATTERN = r'<function=([^>]+)>(.*?)</function>'
-FN_PARAM_REGEX_PATTERN = r'<parameter=([^>]+)>(.*?)</parameter>'
-
-def parse_actions(llm_output: str):
-    actions = []
-    for match in re.finditer(FN_REGEX_PATTERN, llm_output, re.DOTALL):
-        fn_name = match.group(1).strip()
-        param_body = match.group(2)  # 必须加在这里
-        # 标准化 function name
-        canonical_name = ACTION_TYPE_ALIAS.get(fn_name, fn_name)
-        schema = ACTION_SCHEMAS.get(canonical_name)
-        if not schema:
-            raise ValueError(f"Unknown function: {fn_name}")
-        params = {}
-        for p in re.finditer(FN_PARAM_REGEX_PATTERN, param_body, re.DOTALL):
-            pname = p.group(1).strip()
-            pval = p.group(2).strip()
-            params[pname] = pval
-        required = set(schema["parameters"].get("required", []))
-        missing = required - set(params)
-        if missing:
-            raise ValueError(f"Missing required parameters for {fn_name}: {missing}")
-        actions.append({
-            "action_type": canonical_name,
-            "parameters": params,
-            "step_description": f"{canonical_name}({', '.join(f'{k}={repr(v)}' for k, v in params.items())})"
-        })
-    return actions
+FN_OPEN_TAG = "<function="
+FN_CLOSE_TAG = "</function>"
+PARAM_OPEN_TAG = "<parameter="
+PARAM_CLOSE_TAG = "</parameter>"
+
+# 描述中超过该长度的大段内容只显示行数/字符数
+DESCRIPTION_VALUE_LIMIT = 100
+
+
+def _strip_bounds(text, start, end):
+    """返回 text[start:end].strip() 的下标范围，不产生中间字符串"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _iter_tags(text, open_tag, close_tag, start, end):
+    """
+    在 text[start:end] 中逐个查找 <open_tag名称>内容</close_tag>，产出 (名称起止, 内容起止) 下标。
+    语义与 r'<tag=([^>]+)>(.*?)</tag>' 的 finditer 相同：名称不含 '>' 且非空，内容取到最近的结束标签
+    """
+    pos = start
+    while True:
+        tag_start = text.find(open_tag, pos, end)
+        if tag_start == -1:
+            return
+        name_start = tag_start + len(open_tag)
+        name_end = text.find(">", name_start, end)
+        if name_end == -1:
+            return
+        if name_end == name_start:
+            pos = tag_start + 1
+            continue
+        body_start = name_end + 1
+        body_end = text.find(close_tag, body_start, end)
+        if body_end == -1:
+            return
+        yield name_start, name_end, body_start, body_end
+        pos = body_end + len(close_tag)
+
+
+def _build_action(text, name_start, name_end, body_start, body_end):
+    fn_name = text[name_start:name_end].strip()
+    # 标准化 function name
+    canonical_name = ACTION_TYPE_ALIAS.get(fn_name, fn_name)
+    schema = ACTION_SCHEMAS.get(canonical_name)
+    if not schema:
+        raise ValueError(f"Unknown function: {fn_name}")
+    params = {}
+    for p_name_start, p_name_end, value_start, value_end in _iter_tags(
+        text, PARAM_OPEN_TAG, PARAM_CLOSE_TAG, body_start, body_end
+    ):
+        # 参数值只在这里从原文切出一次
+        value_start, value_end = _strip_bounds(text, value_start, value_end)
+        params[text[p_name_start:p_name_end].strip()] = text[value_start:value_end]
+    required = set(schema["parameters"].get("required", []))
+    missing = required - set(params)
+    if missing:
+        raise ValueError(f"Missing required parameters for {fn_name}: {missing}")
+    return {
+        "action_type": canonical_name,
+        "parameters": params,
+    }
+
+def parse_actions(llm_output: str, start=0, end=None):
+    """单遍扫描 llm_output[start:end]，按出现顺序返回 actions；描述在执行时由 describe_action 生成"""
+    if end is None:
+        end = len(llm_output)
+    return [
+        _build_action(llm_output, *bounds)
+        for bounds in _iter_tags(llm_output, FN_OPEN_TAG, FN_CLOSE_TAG, start, end)
+    ]
+
+def describe_action(action_dict):
+    """生成可读的动作描述；大段内容（如 file_text）只显示行数或字符数，内部参数（_ 开头）不显示"""
+    if action_dict.get("step_description"):
+        return action_dict["step_description"]
+    parts = []
+    for key, value in action_dict.get("parameters", {}).items():
+        if key.startswith("_"):
+            continue
+        if isinstance(value, str) and len(value) > DESCRIPTION_VALUE_LIMIT:
+            if key in ("file_text", "diff"):
+                value = f"<{len(value.splitlines())}行内容>"
+            else:
+                value = f"<{len(value)}字符内容>"
+        parts.append(f"{key}={value!r}")
+    return f"{action_dict.get('action_type', 'unknown_action')}({', '.join(parts)})"
+
+
+class StreamingActionParser:
+    """
+    增量解析器：逐段喂入 LLM 流式输出，每当一个 <function=...>...</function>
+    块的结束标签到达时立即返回该 action，语义与 parse_actions 一致
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._scan_from = 0  # 下一次查找结束标签的起点，避免重复扫描
+
+    def feed(self, chunk: str):
+        self._buffer += chunk
+        actions = []
+        while True:
+            end = self._buffer.find(FN_CLOSE_TAG, self._scan_from)
+            if end == -1:
+                # 结束标签可能被切分在两段之间，保留尾部重叠
+                self._scan_from = max(0, len(self._buffer) - len(FN_CLOSE_TAG) + 1)
+                return actions
+            block_end = end + len(FN_CLOSE_TAG)
+            actions.extend(parse_actions(self._buffer, 0, block_end))
+            self._buffer = self._buffer[block_end:]
+            self._scan_from = 0
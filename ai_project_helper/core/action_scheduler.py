@@ -0,0 +1,119 @@
+# core/action_scheduler.py
+# 步骤内动作的依赖感知并发执行：按路径构建依赖关系，无冲突的文件/目录动作并发运行
+
+import os
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from ai_project_helper.actions.sandbox import get_path_sandbox, is_within
+from ai_project_helper.core.edit_fusion import iter_action_units
+
+logger = logging.getLogger("ai_project_helper.action_scheduler")
+
+# 仅操作单一路径、可安全并发的动作类型；其余类型（shell_command 等）视为屏障
+PARALLEL_ACTION_TYPES = ("file_edit", "directory", "patch")
+
+# 动作正常完成的退出码：file_edit 以 2 报告警告（create 时文件已存在、str_replace 未找到匹配）
+OK_EXIT_CODES = (0, 2)
+
+
+def action_path(action_dict, sandbox):
+    """返回动作操作的绝对路径（sandbox 为工作目录的 PathSandbox）；无法确定（需按屏障处理）时返回 None"""
+    if action_dict.get("action_type") not in PARALLEL_ACTION_TYPES:
+        return None
+    path = action_dict.get("parameters", {}).get("path")
+    if not path:
+        return None
+    try:
+        return sandbox.resolve(path)
+    except PermissionError:
+        return None
+
+
+def paths_conflict(a, b):
+    """同一路径或存在祖先/子孙关系（如先建目录再写其中的文件）即视为冲突"""
+    return is_within(a, b) or is_within(b, a)
+
+
+def unit_succeeded(feedbacks):
+    """一个调度单元的反馈是否表示全部动作正常完成：没有 failed/timeout，结束反馈的退出码为 0 或 2"""
+    for fb in feedbacks:
+        status = fb.get("status")
+        if status in ("failed", "timeout"):
+            return False
+        if status == "success" and fb.get("exit_code", 0) not in OK_EXIT_CODES:
+            return False
+    return True
+
+
+def execute_actions_parallel(agent, actions, max_workers=4, run_context=None):
+    """
+    与 Agent.execute_actions 产出相同的反馈流：
+    - 可并发的动作提交到线程池，仅等待与其路径冲突的先前动作；所依赖的动作未正常完成时
+      （失败、超时、非零退出码或自身被跳过）不执行，以 skipped 状态反馈；
+    - shell_command 等屏障动作会等待之前所有动作完成后单独执行；
+    - 反馈按 action_index 顺序整体输出，遇到 failed 即停止并取消未开始的动作。
+    """
+    sandbox = get_path_sandbox(agent.config.get("working_dir") or os.getcwd())
+    executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="action")
+    pending = deque()   # (idx, future) 按提交顺序等待输出
+    in_flight = []      # (path, future) 用于冲突检测
+    failed = False
+
+    def run_collected(indices, action_dicts, deps):
+        # 返回 (是否正常完成, 反馈列表)
+        wait(deps)
+        if not all(not dep.cancelled() and dep.exception() is None and dep.result()[0] for dep in deps):
+            feedbacks = []
+            for idx, action_dict in zip(indices, action_dicts):
+                skipped = dict(action_dict, skipped="所依赖的同路径动作未成功完成，未执行")
+                feedbacks.extend(agent.run_action(idx, skipped, run_context))
+            return False, feedbacks
+        feedbacks = list(agent.run_unit(indices, action_dicts, run_context))
+        return unit_succeeded(feedbacks), feedbacks
+
+    def drain(block):
+        # 按顺序输出已完成动作的反馈；block=True 时等待全部完成
+        nonlocal failed
+        while pending and not failed and (block or pending[0][1].done()):
+            _, future = pending.popleft()
+            for fb in future.result()[1]:
+                yield fb
+                if fb.get("status") == "failed":
+                    failed = True
+
+    try:
+        fuse = agent.config.get("agent", {}).get("fuse_edits", True)
+        for indices, action_dicts in iter_action_units(actions, fuse):
+            if run_context is not None:
+                run_context.cancel_token.raise_if_cancelled()
+            idx = indices[0]
+            # 合并的 str_replace 作用于同一路径，作为一个动作调度
+            path = action_path(action_dicts[0], sandbox)
+            if path is None:
+                # 屏障：先输出之前所有动作的结果，再同步执行本动作
+                yield from drain(block=True)
+                if failed:
+                    return
+                in_flight.clear()
+                for fb in agent.run_unit(indices, action_dicts, run_context):
+                    yield fb
+                    if fb.get("status") == "failed":
+                        failed = True
+                if failed:
+                    return
+                continue
+
+            deps = [future for other, future in in_flight if paths_conflict(path, other)]
+            future = executor.submit(run_collected, indices, action_dicts, deps)
+            in_flight.append((path, future))
+            pending.append((idx, future))
+            yield from drain(block=False)
+            if failed:
+                return
+
+        yield from drain(block=True)
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
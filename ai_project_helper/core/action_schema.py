@@ -1,3 +1,6 @@
+# 修改 ACTION_SCHEMAS 后递增，使缓存的系统提示词前缀（core/prompt.py）失效
+SCHEMA_VERSION = 3
+
 ACTION_SCHEMAS = {
     "shell_command": {
         "name": "shell_command",
@@ -26,13 +29,14 @@ ACTION_SCHEMAS = {
                 "command": {
                     "type": "string",
                     "description": "Operation type for file editing",
-                    "enum": ["create", "update", "str_replace", "append", "delete"]
+                    "enum": ["create", "update", "str_replace", "multi_replace", "append", "delete"]
                 },
                 "path": {"type": "string", "description": "File path"},
                 "file_text": {"type": "string", "description": "File content (for create and update)"},
                 "old_str": {"type": "string", "description": "String to replace"},
                 "new_str": {"type": "string", "description": "Replacement string"},
-                "append_text": {"type": "string", "description": "Text to append"}
+                "append_text": {"type": "string", "description": "Text to append"},
+                "edits": {"type": "string", "description": "JSON array of {\"old_str\": ..., \"new_str\": ...} applied in order (for multi_replace)"}
             },
             "required": ["command", "path"]
         }
@@ -52,5 +56,18 @@ ACTION_SCHEMAS = {
             },
             "required": ["command", "path"]
         }
+    },
+    "patch": {
+        "name": "patch",
+        "description": "Apply a unified diff to an existing file. Preferred over file_edit update for small changes: send only the changed lines with a few lines of context.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "path": {"type": "string", "description": "File path"},
+                "diff": {"type": "string", "description": "Unified diff hunks for this file (@@ -start,count +start,count @@ followed by ' ', '-', '+' lines)"},
+                "fuzz": {"type": "string", "description": "Maximum number of context lines that may be ignored at each end of a hunk (optional)"}
+            },
+            "required": ["path", "diff"]
+        }
     }
 }
\ No newline at end of file
@@ -2,8 +2,13 @@ import os
 import copy
 import logging
 from core.llm import LLMClient
-from core.action_parser import parse_actions
+from core.action_parser import parse_actions, describe_action, StreamingActionParser
 from actions import get_action_class
+from ai_project_helper.core.action_cache import ActionCache, get_action_cache
+from ai_project_helper.core.run_context import RunContext
+from ai_project_helper.core.cancellation import OperationCancelled, ExecutionTimeout
+from ai_project_helper.core.action_scheduler import execute_actions_parallel
+from ai_project_helper.core.edit_fusion import iter_action_units, fuse_str_replaces
 from pprint import pformat
 
 
@@ -19,102 +24,238 @@ class Agent:
         if working_dir:
             os.makedirs(working_dir, exist_ok=True)
             logger.info(f"Agent工作目录设置为: {working_dir}")
+        self.action_cache = get_action_cache(config)
 
-    def parse_plan(self, plan_text: str):
+    def _cache_key(self, plan_text):
+        """返回翻译缓存键；缓存关闭时返回 None"""
+        if self.action_cache is None:
+            return None
+        return ActionCache.make_key(self.model, self.llm.build_messages(plan_text))
+
+    def parse_plan(self, plan_text: str, run_context=None):
+        run_context = run_context or RunContext()
+        cache_key = self._cache_key(plan_text)
+        # 绕过缓存的请求不读取旧结果，但仍会用新的翻译结果刷新缓存
+        if cache_key and run_context.use_cache:
+            cached = self.action_cache.get(cache_key)
+            if cached is not None:
+                logger.info("LLM model: %s, 命中动作缓存 %s", self.model, cache_key[:12])
+                return cached
+
+        run_context.cancel_token.raise_if_cancelled()
         raw = self.llm.plan_to_actions(plan_text)
-        logger.info("LLM model: %s, raw response:\n%s", self.model, raw)
+        logger.info("LLM model: %s, raw response: %d 字符", self.model, len(raw))
+        logger.debug("LLM model: %s, raw response:\n%s", self.model, raw)
         actions = parse_actions(raw)
         action_types = [act.get("action_type") for act in actions]
         logger.info("LLM model: %s, action_types: %s", self.model, action_types)
+        # 没有解析出动作（LLM 只回复了文字或标签格式错误）时不缓存，下次重新调用 LLM
+        if cache_key and actions:
+            self.action_cache.put(cache_key, actions)
         return actions
     
-    def execute_actions(self, actions, step_index=1, step_count=1):
-        for idx, action_dict in enumerate(actions):
-            parameters = dict(action_dict["parameters"])  # ✅ 使用已清洗参数
-            parameters["_config"] = {"working_dir": self.config.get("working_dir")}
+    def execute_actions(self, actions, step_index=1, step_count=1, run_context=None):
+        run_context = run_context or RunContext()
+        agent_config = self.config.get("agent", {})
+        if agent_config.get("parallel_actions"):
+            # 无冲突的 file_edit/directory/patch 动作并发执行，shell_command 作为屏障
+            yield from execute_actions_parallel(
+                self, actions, agent_config.get("action_workers", 4), run_context
+            )
+            return
 
-            action_type = action_dict["action_type"]
-            base_description = action_dict.get("step_description", "")
-            command = parameters.get("command", "")
+        # 同一文件上连续的 str_replace 合并执行
+        for indices, action_dicts in iter_action_units(actions, agent_config.get("fuse_edits", True)):
+            run_context.cancel_token.raise_if_cancelled()
+            failed = False
+            for fb in self.run_unit(indices, action_dicts, run_context):
+                yield fb
+                failed = fb.get("status") == "failed"
+            if failed:
+                break
 
-            ActionCls = get_action_class(action_type)
-            action = ActionCls(action_type, parameters, base_description)
+    def run_unit(self, indices, action_dicts, run_context=None):
+        """执行 iter_action_units 产出的一个单元：单个动作或合并的 str_replace"""
+        if len(action_dicts) == 1:
+            yield from self.run_action(indices[0], action_dicts[0], run_context)
+        else:
+            yield from self.run_fused_edits(indices, action_dicts, run_context)
 
-            def format_description(status):
-                # 简化描述格式，只保留动作信息
-                return f"Action[{idx+1}] - [{status}] {action_type}: {base_description}"
+    def run_fused_edits(self, indices, action_dicts, run_context=None):
+        """
+        同一文件上的多个 str_replace 以一次 multi_replace 执行（读一次、备份一次、原子写一次），
+        反馈仍按原动作逐个产出（running → 输出 → success），动作下标与状态序列与逐个执行时一致
+        """
+        fused = fuse_str_replaces(action_dicts)
+        parameters = dict(fused["parameters"])
+        parameters["_config"] = self.action_runtime_config(run_context)
+        descriptions = [describe_action(action_dict) for action_dict in action_dicts]
 
-            logger.info(f"🚀 执行 {format_description('running')}")
+        def feedback(k, status, output="", error="", exit_code=None):
+            fb = {
+                "action_index": indices[k],
+                "action_type": "file_edit",
+                "step_description": f"Action[{indices[k]+1}] - [{status}] file_edit: {descriptions[k]}",
+                "status": status,
+                "output": output,
+                "error": error,
+                "command": "str_replace",
+            }
+            if exit_code is not None:
+                fb["exit_code"] = exit_code
+            return fb
+
+        logger.info(f"🚀 合并执行 {len(indices)} 个 str_replace: {parameters['path']}")
+        action = get_action_class("file_edit")("file_edit", parameters, describe_action(fused))
+        try:
+            results = list(action.execute_stream())
+        except Exception as e:
+            logger.exception("❌ Action 执行失败")
+            yield feedback(0, "running")
+            yield feedback(0, "failed", error=str(e), exit_code=1)
+            return
+
+        # 整体出错（如文件不存在）时只有一条结果，对每个编辑都上报该结果
+        if len(results) != len(indices):
+            results = results[-1:] * len(indices)
+        for k, (out, err, exit_code) in enumerate(results):
+            yield feedback(k, "running")
+            yield feedback(k, "running", out or "", err or "", exit_code)
+            yield feedback(k, "success", exit_code=exit_code)
+
+    def action_runtime_config(self, run_context=None):
+        """传给动作的运行时配置（_config）：工作目录、shell 输出参数、文件编辑参数与取消信号"""
+        shell_config = dict(self.config.get("shell", {}))
+        if run_context is not None:
+            # 请求中指定的时限覆盖配置文件
+            for key in ("action_timeout_seconds", "idle_timeout_seconds"):
+                value = getattr(run_context, key)
+                if value is not None:
+                    shell_config[key] = value
+        return {
+            "working_dir": self.config.get("working_dir"),
+            "shell": shell_config,
+            "file_edit": self.config.get("file_edit", {}),
+            "cancel_token": run_context.cancel_token if run_context is not None else None,
+        }
+
+    def run_action(self, idx, action_dict, run_context=None):
+        """执行单个动作并流式产出反馈（running → 输出 → success/failed）；请求取消时抛出 OperationCancelled"""
+        parameters = dict(action_dict["parameters"])  # ✅ 使用已清洗参数
+        parameters["_config"] = self.action_runtime_config(run_context)
+
+        action_type = action_dict["action_type"]
+        base_description = describe_action(action_dict)
+        command = parameters.get("command", "")
+
+        ActionCls = get_action_class(action_type)
+        action = ActionCls(action_type, parameters, base_description)
 
+        def format_description(status):
+            # 简化描述格式，只保留动作信息
+            return f"Action[{idx+1}] - [{status}] {action_type}: {base_description}"
+
+        # 断点续跑：上次已成功完成的动作不再执行
+        if action_dict.get("skipped"):
+            logger.info(f"⏭️ 跳过 {format_description('skipped')}")
             yield {
                 "action_index": idx,
                 "action_type": action_type,
-                "step_description": format_description("running"),
-                "status": "running",
-                "output": "",
+                "step_description": format_description("skipped"),
+                "status": "skipped",
+                "output": f"{action_dict['skipped']}\n",
                 "error": "",
                 "command": command,
+                "exit_code": 0
             }
-                
-            # 操作完成后发送成功状态        
-            try:
-                output_gen = action.execute_stream()
-                exit_code = 0  # 默认退出码
-                
-                for result in output_gen:
-                    # 处理不同类型的返回值
-                    if isinstance(result, tuple):
-                        if len(result) == 2:  # 兼容旧版本
-                            out, err = result
-                            exit_code = 0
-                        elif len(result) == 3:
-                            out, err, exit_code = result
-                        else:
-                            out, err, exit_code = "", "Invalid result format", 1
-                    else:  # 处理可能的其他格式
-                        out = result.get("out", "")
-                        err = result.get("err", "")
-                        exit_code = result.get("exit_code", 0)
-                    # 过滤大文本输出
-                    out = out or ""
-                    if "file_text" in out and len(out) > 80:
-                        out = "<file_text content filtered>"
-                    yield {
-                        "action_index": idx,
-                        "action_type": action_type,
-                        "step_description": format_description("running"),
-                        "status": "running",
-                        "output": out or "",
-                        "error": err or "",
-                        "command": command,
-                        "exit_code": exit_code
-                    }
-                
-                # 操作完成后发送成功状态
+            return
+
+        logger.info(f"🚀 执行 {format_description('running')}")
+
+        yield {
+            "action_index": idx,
+            "action_type": action_type,
+            "step_description": format_description("running"),
+            "status": "running",
+            "output": "",
+            "error": "",
+            "command": command,
+        }
+            
+        # 操作完成后发送成功状态        
+        try:
+            output_gen = action.execute_stream()
+            exit_code = 0  # 默认退出码
+            
+            for result in output_gen:
+                # 处理不同类型的返回值
+                if isinstance(result, tuple):
+                    if len(result) == 2:  # 兼容旧版本
+                        out, err = result
+                        exit_code = 0
+                    elif len(result) == 3:
+                        out, err, exit_code = result
+                    else:
+                        out, err, exit_code = "", "Invalid result format", 1
+                else:  # 处理可能的其他格式
+                    out = result.get("out", "")
+                    err = result.get("err", "")
+                    exit_code = result.get("exit_code", 0)
+                # 过滤大文本输出
+                out = out or ""
+                if "file_text" in out and len(out) > 80:
+                    out = "<file_text content filtered>"
                 yield {
                     "action_index": idx,
                     "action_type": action_type,
-                    "step_description": format_description("success"),
-                    "status": "success",
-                    "output": "",
-                    "error": "",
+                    "step_description": format_description("running"),
+                    "status": "running",
+                    "output": out or "",
+                    "error": err or "",
                     "command": command,
                     "exit_code": exit_code
                 }
+            
+            # 操作完成后发送成功状态
+            yield {
+                "action_index": idx,
+                "action_type": action_type,
+                "step_description": format_description("success"),
+                "status": "success",
+                "output": "",
+                "error": "",
+                "command": command,
+                "exit_code": exit_code
+            }
 
-            except Exception as e:
-                logger.exception("❌ Action 执行失败")
-                yield {
-                    "action_index": idx,
-                    "action_type": action_type,
-                    "step_description": format_description("failed"),
-                    "status": "failed",
-                    "output": "",
-                    "error": str(e),
-                    "command": command,
-                    "exit_code": 1  # 非零表示错误
-                }
-                break
+        except ExecutionTimeout as e:
+            # 超时的动作已被终止，以独立的 timeout 状态反馈；计划整体超时时由后续检查点停止执行
+            logger.warning(f"⏱️ 超时 {format_description('timeout')}: {e}")
+            yield {
+                "action_index": idx,
+                "action_type": action_type,
+                "step_description": format_description("timeout"),
+                "status": "timeout",
+                "output": "",
+                "error": str(e),
+                "command": command,
+                "exit_code": 124
+            }
+        except OperationCancelled:
+            logger.info(f"⏹️ 已取消 {format_description('cancelled')}")
+            raise
+        except Exception as e:
+            logger.exception("❌ Action 执行失败")
+            yield {
+                "action_index": idx,
+                "action_type": action_type,
+                "step_description": format_description("failed"),
+                "status": "failed",
+                "output": "",
+                "error": str(e),
+                "command": command,
+                "exit_code": 1  # 非零表示错误
+            }
     
         
     def execute_action(self, action_dict):
@@ -122,7 +263,7 @@ class Agent:
         单步执行一个 action，方便 server.py 逐步流式反馈
         """
         action_type = action_dict["action_type"]
-        step_description = action_dict["step_description"]
+        step_description = describe_action(action_dict)
         # 深拷贝，避免污染原始参数
         parameters = copy.deepcopy(action_dict.get("parameters", {}))
         command = parameters.get("command", "")
@@ -130,7 +271,7 @@ class Agent:
         logger.info(f"Executing action_type: {action_type}, step: {step_description}")
 
         ActionCls = get_action_class(action_type)
-        parameters["_config"] = {"working_dir": self.config["working_dir"]}
+        parameters["_config"] = self.action_runtime_config()
         action = ActionCls(action_type, parameters, step_description)
         try:
             for out, err in action.execute_stream():
@@ -169,16 +310,65 @@ class Agent:
         # 用统一执行接口
         yield from self.execute_actions([action_dict])
 
-    def run_step_text(self, step_text: str, step_index: int, step_count: int):
+    def prepare_step(self, step_text: str, step_index: int, step_count: int, run_context=None):
+        """
+        将步骤文本翻译为已完成路径清洗的 actions（不执行），可在后台线程中预取
+        """
         try:
-            actions = self.parse_plan(step_text)
+            actions = self.parse_plan(step_text, run_context)
             for action in actions:
                 self.normalize_action_paths(action)
 
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Step {step_index}/{step_count} 解析失败: {e}")
+        return actions
+
+    def stream_step(self, step_text: str, step_index: int, step_count: int, run_context=None):
+        """
+        流式翻译步骤：LLM 每生成完一个 <function> 块就立即产出清洗后的 action，
+        execute_actions 可在模型继续生成其余内容时先执行第一个动作
+        """
+        run_context = run_context or RunContext()
+        cache_key = self._cache_key(step_text)
+        cached = self.action_cache.get(cache_key) if cache_key and run_context.use_cache else None
+        if cached is not None:
+            logger.info("LLM model: %s, 命中动作缓存 %s", self.model, cache_key[:12])
+            for action in cached:
+                self.normalize_action_paths(action)
+            yield from cached
+            return
+
+        run_context.cancel_token.raise_if_cancelled()
+        parser = StreamingActionParser()
+        parsed = []
+        try:
+            for chunk in self.llm.stream_plan_to_actions(step_text):
+                # 取消后立即关闭流式响应，不再消耗后续 token
+                run_context.cancel_token.raise_if_cancelled()
+                for action in parser.feed(chunk):
+                    parsed.append(copy.deepcopy(action))
+                    self.normalize_action_paths(action)
+                    yield action
+        except OperationCancelled:
+            raise
         except Exception as e:
             raise RuntimeError(f"Step {step_index}/{step_count} 解析失败: {e}")
+        logger.info("LLM model: %s, action_types(stream): %s", self.model,
+                    [act["action_type"] for act in parsed])
+        if cache_key and parsed:
+            self.action_cache.put(cache_key, parsed)
+
+    def run_step_text(self, step_text: str, step_index: int, step_count: int, run_context=None):
+        if self.config.get("llm", {}).get("stream"):
+            actions = self.stream_step(step_text, step_index, step_count, run_context)
+        else:
+            actions = self.prepare_step(step_text, step_index, step_count, run_context)
+        yield from self.run_prepared_step(actions, step_index, step_count, run_context)
 
-        for fb in self.execute_actions(actions):
+    def run_prepared_step(self, actions, step_index: int, step_count: int, run_context=None):
+        for fb in self.execute_actions(actions, run_context=run_context):
             # 添加步骤索引信息
             fb["step_index"] = step_index
             fb["total_steps"] = step_count
@@ -203,7 +393,7 @@ class Agent:
                         # 对于相对路径，直接使用而不做额外处理
                         new_params[key] = value
 
-                    logger.info(f"[路径清洗] {key}: {value} → {new_params[key]}")
+                    logger.debug(f"[路径清洗] {key}: {value} → {new_params[key]}")
                 except Exception as e:
                     logger.warning(f"[路径清洗失败] {key}: {value} → {e}")
                     new_params[key] = value
@@ -216,25 +406,8 @@ class Agent:
         # ✅ 更新回 action_dict
         action_dict["parameters"] = new_params
 
-        # ✅ 简化描述 - 避免过长的文件内容显示
-        action_type = action_dict.get("action_type", "unknown_action")
-        
-        # 创建简化的参数描述
-        simplified_params = {}
-        for key, value in new_params.items():
-            if key == "file_text" and value and len(value) > 100:
-                simplified_params[key] = f"<{len(value.splitlines())}行内容>"
-            elif key == "append_text" and value and len(value) > 100:
-                simplified_params[key] = f"<{len(value)}字符内容>"
-            else:
-                simplified_params[key] = value
-        
-        # 使用简化参数创建描述
-        pretty_desc = f"{action_type}({', '.join(f'{k}={repr(v)}' for k, v in simplified_params.items())})"
-        action_dict["step_description"] = pretty_desc
-
-        logger.info(f"[路径清洗后] 参数已更新: {new_params}")
-        logger.info(f"[路径清洗后] 描述已更新: {pretty_desc}")
+        # 描述在执行时由 describe_action 生成（大段内容只显示行数），这里不再拼接参数全文
+        logger.debug(f"[路径清洗后] 参数已更新: {sorted(new_params)}")
         
 
 
@@ -0,0 +1,78 @@
+# core/cancellation.py
+# 协作式取消：RPC 结束（客户端断开、超过截止时间）时通知执行链路停止 LLM 调用并终止子进程
+
+import threading
+import logging
+
+logger = logging.getLogger("ai_project_helper.cancellation")
+
+
+class OperationCancelled(RuntimeError):
+    """执行因请求取消而中止"""
+
+
+class ExecutionTimeout(OperationCancelled):
+    """
+    超过时限：单个动作超时由动作抛出，反馈状态为 timeout 后继续下一个动作；
+    整个计划超时通过 CancelToken 取消，之后的检查点都会抛出该异常
+    """
+
+
+class CancelToken:
+    """
+    一次执行的取消信号，随 RunContext 传递到步骤翻译、动作调度和各个动作。
+    - 各检查点调用 raise_if_cancelled() 在安全位置退出；
+    - 正在阻塞的操作（如子进程）通过 add_callback 注册取消时的处理，回调在调用 cancel 的线程中执行，不应阻塞。
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self._next_handle = 0
+        self.reason = None
+        self._error = OperationCancelled
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="请求已取消", error=OperationCancelled):
+        """error 为之后 raise_if_cancelled 抛出的异常类型（计划超时为 ExecutionTimeout）"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._error = error
+            self._event.set()
+            callbacks, self._callbacks = list(self._callbacks.values()), {}
+        logger.info(f"执行已取消: {reason}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("取消回调执行失败")
+
+    def add_callback(self, callback):
+        """注册取消回调并返回句柄；已取消时立即执行回调并返回 None"""
+        with self._lock:
+            if not self._event.is_set():
+                handle = self._next_handle
+                self._next_handle += 1
+                self._callbacks[handle] = callback
+                return handle
+        callback()
+        return None
+
+    def remove_callback(self, handle):
+        if handle is None:
+            return
+        with self._lock:
+            self._callbacks.pop(handle, None)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise self._error(self.reason)
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
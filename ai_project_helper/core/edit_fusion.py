@@ -0,0 +1,50 @@
+# core/edit_fusion.py
+# 合并同一文件上连续的 str_replace 动作为一次 multi_replace：文件只读写一次，反馈仍按原动作逐个上报
+
+
+def fusable_path(action_dict):
+    """可合并的动作（未被检查点跳过的 file_edit str_replace）返回其 path，否则返回 None"""
+    if action_dict.get("action_type") != "file_edit" or action_dict.get("skipped"):
+        return None
+    parameters = action_dict.get("parameters", {})
+    if parameters.get("command") != "str_replace":
+        return None
+    return parameters.get("path") or None
+
+
+def iter_action_units(actions, fuse=True):
+    """
+    按顺序产出执行单元 (下标列表, 动作列表)。fuse 时 path 相同的连续 str_replace 归为一个单元；
+    可合并的动作要等到下一个动作到达（或 actions 结束）才能确定分组，其余动作立即产出
+    """
+    indices, group = [], []
+    for idx, action_dict in enumerate(actions):
+        path = fusable_path(action_dict) if fuse else None
+        if group and path is not None and path == fusable_path(group[0]):
+            indices.append(idx)
+            group.append(action_dict)
+            continue
+        if group:
+            yield indices, group
+        indices, group = [idx], [action_dict]
+        if path is None:
+            yield indices, group
+            indices, group = [], []
+    if group:
+        yield indices, group
+
+
+def fuse_str_replaces(action_dicts):
+    """把同一文件上的多个 str_replace 合并为一个 multi_replace 动作"""
+    first = action_dicts[0]["parameters"]
+    return {
+        "action_type": "file_edit",
+        "parameters": {
+            "command": "multi_replace",
+            "path": first["path"],
+            "edits": [
+                {"old_str": a["parameters"].get("old_str"), "new_str": a["parameters"].get("new_str")}
+                for a in action_dicts
+            ],
+        },
+    }
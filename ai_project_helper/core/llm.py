@@ -1,7 +1,8 @@
 # core/llm.py
 
-import requests
-from ai_project_helper.core.prompt import build_prompt
+import json
+from ai_project_helper.core.prompt import build_messages
+from ai_project_helper.core.llm_transport import get_transport
 import logging
 
 logger = logging.getLogger("ai_project_helper.llm")
@@ -12,41 +13,72 @@ class LLMClient:
         self.api_key = config['llm']['api_key']
         self.model = config['llm']['model']
         self.config = config
+        self.transport = get_transport(config)
 
-    def build_prompt(self, plan_text):
-        return build_prompt(plan_text, working_dir=self.config.get("working_dir"))
+    def build_messages(self, plan_text):
+        """固定的系统消息（已缓存）+ 只含当前步骤的用户消息"""
+        return build_messages(plan_text, working_dir=self.config.get("working_dir"))
 
     def plan_to_actions(self, plan_text: str):
-        prompt = self.build_prompt(plan_text)
-        logger.info(f"LLMClient 提交的 PROMPT:\n{'='*24}\n{prompt}\n{'='*24}")
-        response = requests.post(
+        messages = self.build_messages(plan_text)
+        logger.info(f"LLMClient 提交的 PROMPT:\n{'='*24}\n{messages[-1]['content']}\n{'='*24}")
+        data = self.transport.post_json(
             self.api_url,
-            json={
+            {
                 "model": self.model,
-                "messages": [{"role": "system", "content": prompt}],
+                "messages": messages,
                 "max_tokens": 2048000,
                 "temperature": 0,
             },
-            headers={"Authorization": f"Bearer {self.api_key}"}
+            self.api_key
         )
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
+        return data["choices"][0]["message"]["content"]
+
+    def stream_plan_to_actions(self, plan_text: str):
+        """以 SSE 流式方式请求 LLM，逐段产出增量文本"""
+        messages = self.build_messages(plan_text)
+        logger.info(f"LLMClient 提交的 PROMPT(stream):\n{'='*24}\n{messages[-1]['content']}\n{'='*24}")
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": 2048000,
+            "temperature": 0,
+            "stream": True,
+        }
+        with self.transport.stream(self.api_url, payload, self.api_key) as response:
+            yield from iter_sse_content(response)
 
     def generate_bash_script(self, steps_text: str):
         prompt = f"""Generate a batch/bash script that converts each step of the following plan into executable commands. Return only the script content without any additional information or explanations.
 {steps_text}
 """
         logger.info(f"LLMClient CreateProject PROMPT:\n{'='*24}\n{prompt}\n{'='*24}")
-        response = requests.post(
+        data = self.transport.post_json(
             self.api_url,
-            json={
+            {
                 "model": self.model,
                 "messages": [{"role": "system", "content": prompt}],
                 "max_tokens": 2048000,
                 "temperature": 0,
             },
-            headers={"Authorization": f"Bearer {self.api_key}"}
+            self.api_key
         )
-        response.raise_for_status()
-        content = response.json()["choices"][0]["message"]["content"]
-        return content.strip()
\ No newline at end of file
+        content = data["choices"][0]["message"]["content"]
+        return content.strip()
+
+def iter_sse_content(response):
+    """解析 OpenAI 兼容的 SSE 响应，产出每个 delta 的 content 文本"""
+    for raw_line in response.iter_lines():
+        if not raw_line:
+            continue
+        line = raw_line.decode("utf-8") if isinstance(raw_line, bytes) else raw_line
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        chunk = json.loads(data)
+        for choice in chunk.get("choices", []):
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield content
@@ -0,0 +1,140 @@
+# core/llm_transport.py
+# 进程级共享的 LLM HTTP 传输层：所有 LLM 调用复用同一个 keep-alive 连接池
+
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+import logging
+
+logger = logging.getLogger("ai_project_helper.llm_transport")
+
+DEFAULT_TRANSPORT_CONFIG = {
+    "pool_connections": 8,      # 缓存的主机连接池数量
+    "pool_maxsize": 32,         # 每个主机连接池的最大连接数
+    "per_host_limit": 16,       # 每个主机同时进行中的请求上限
+    "connect_timeout": 10,      # 建立连接超时（秒）
+    "read_timeout": 600,        # 两次收到数据之间的最长等待（秒）
+}
+
+
+class LLMTransport:
+    """线程安全的 LLM 请求通道：有界连接池 + 每主机并发上限 + 超时 + 指标"""
+
+    def __init__(self, transport_config=None):
+        cfg = dict(DEFAULT_TRANSPORT_CONFIG)
+        cfg.update(transport_config or {})
+        self.config = cfg
+        self.timeout = (cfg["connect_timeout"], cfg["read_timeout"])
+        self.per_host_limit = int(cfg["per_host_limit"])
+
+        self._adapter = HTTPAdapter(
+            pool_connections=int(cfg["pool_connections"]),
+            pool_maxsize=int(cfg["pool_maxsize"]),
+            pool_block=True,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self._stats = {
+            "requests_total": 0,
+            "errors_total": 0,
+            "in_flight": 0,
+            "wait_seconds_total": 0.0,
+            "request_seconds_total": 0.0,
+        }
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_slots[host] = slot
+        return slot
+
+    def _add_stats(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    @contextmanager
+    def _request(self, url, payload, api_key, stream=False):
+        slot = self._host_slot(url)
+        wait_start = time.monotonic()
+        with slot:
+            started = time.monotonic()
+            self._add_stats(in_flight=1, requests_total=1, wait_seconds_total=started - wait_start)
+            response = None
+            try:
+                response = self.session.post(
+                    url,
+                    json=payload,
+                    headers={"Authorization": f"Bearer {api_key}"},
+                    timeout=self.timeout,
+                    stream=stream,
+                )
+                response.raise_for_status()
+                yield response
+            except Exception:
+                self._add_stats(errors_total=1)
+                raise
+            finally:
+                if response is not None:
+                    response.close()
+                self._add_stats(in_flight=-1, request_seconds_total=time.monotonic() - started)
+
+    def post_json(self, url, payload, api_key):
+        """发送一次非流式请求，返回解析后的 JSON"""
+        with self._request(url, payload, api_key) as response:
+            return response.json()
+
+    @contextmanager
+    def stream(self, url, payload, api_key):
+        """发送流式请求；在 with 块内占用主机并发名额，退出时归还连接"""
+        with self._request(url, payload, api_key, stream=True) as response:
+            yield response
+
+    def metrics(self):
+        """返回请求计数与各主机连接池状态的快照"""
+        with self._lock:
+            snapshot = dict(self._stats)
+        pools = {}
+        pool_manager = self._adapter.poolmanager
+        for key in list(pool_manager.pools.keys()):
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            pools[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                # 队列中的 None 是尚未建立连接的占位符
+                "idle": sum(1 for conn in list(pool.pool.queue) if conn is not None)
+                if pool.pool is not None else 0,
+            }
+        snapshot["pools"] = pools
+        return snapshot
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport(config=None):
+    """
+    获取进程级共享的 LLMTransport。
+    首次调用时按 config['llm']['transport'] 创建，之后的调用复用同一实例。
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            transport_config = ((config or {}).get("llm") or {}).get("transport")
+            _transport = LLMTransport(transport_config)
+            logger.info(f"LLM 传输层已初始化: {_transport.config}")
+        return _transport
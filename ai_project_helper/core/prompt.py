@@ -1,5 +1,6 @@
+from functools import lru_cache
 from ai_project_helper.config import load_config
-from ai_project_helper.core.action_schema import ACTION_SCHEMAS
+from ai_project_helper.core.action_schema import ACTION_SCHEMAS, SCHEMA_VERSION
 
 # 将ACTION_SCHEMAS中的命令工具生成为 工具prompt 
 def build_functions_description():
@@ -31,7 +32,8 @@ OUTPUT RULEs:
 4. Paired XML tags must be properly nested and closed—every opening <tag> must have a corresponding closing </tag>
 5. Values between tags must be replaced with actual content per task requirements.
 6. Single function per output – no combined operations.
-7. For all file_edit operations, "command" must always be provided. Valid values: create, update, str_replace, append, delete.
+7. For all file_edit operations, "command" must always be provided. Valid values: create, update, str_replace, multi_replace, append, delete.
+8. To change part of an existing file, use patch with a unified diff instead of rewriting the whole file with update.
 """
 
 # 输出的示例
@@ -63,21 +65,60 @@ if __name__ == '__main__':
 <parameter=old_str>return str(numbers)</parameter>
 <parameter=new_str>return '&lt;table&gt;' + ''.join([f'&lt;tr&gt;&lt;td&gt;{{i}}&lt;/td&gt;&lt;/tr&gt;' for i in numbers]) + '&lt;/table&gt;'</parameter>
 </function>
+
+<function=patch>
+<parameter=path>/aiWorkDir/app.py</parameter>
+<parameter=diff>
+@@ -4,4 +4,5 @@
+ def index():
+     numbers = list(range(1, 11))
+-    return str(numbers)
++    total = sum(numbers)
++    return str(total)
+ if __name__ == '__main__':
+</parameter>
+</function>
 ---- END DEMONSTRATION----
 """
 
 
 
-def build_prompt(user_task, working_dir=None):
-    if working_dir is None:
-        working_dir = load_config().get("working_dir")
+@lru_cache(maxsize=1)
+def _default_working_dir():
+    """未指定 working_dir 时只读取一次配置文件"""
+    return load_config().get("working_dir")
+
+@lru_cache(maxsize=32)
+def _render_system_prompt(schema_version, working_dir):
+    """
+    渲染与任务无关的系统提示词（函数说明、示例、输出要求），按 (schema 版本, working_dir) 缓存。
+    各步骤请求的系统消息完全相同，支持前缀缓存的 LLM 服务可复用其 KV 缓存
+    """
     return f"""
 You can call functions to complete DevOps tasks, with the parameter structure of each function as follows. the workdir is always at {working_dir}.
 Available Functions & Parameters:
 {build_functions_description()}
 {IN_CONTEXT_EXAMPLES}
-{OUTPUT_RULES}
--------------------New Task-------------------
+{OUTPUT_RULES}"""
+
+def build_system_prompt(working_dir=None):
+    if working_dir is None:
+        working_dir = _default_working_dir()
+    return _render_system_prompt(SCHEMA_VERSION, working_dir)
+
+def build_task_prompt(user_task):
+    return f"""-------------------New Task-------------------
 {user_task}
 ------------------- End -------------------
-"""
\ No newline at end of file
+"""
+
+def build_messages(user_task, working_dir=None):
+    """返回 [系统消息, 用户消息]：系统消息为缓存的固定前缀，用户消息只包含当前任务"""
+    return [
+        {"role": "system", "content": build_system_prompt(working_dir)},
+        {"role": "user", "content": build_task_prompt(user_task)},
+    ]
+
+def build_prompt(user_task, working_dir=None):
+    """系统提示词与任务拼接后的完整文本"""
+    return build_system_prompt(working_dir) + "\n" + build_task_prompt(user_task)
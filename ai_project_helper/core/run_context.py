@@ -0,0 +1,37 @@
+# core/run_context.py
+from ai_project_helper.core.cancellation import CancelToken
+
+
+class RunContext:
+    """
+    单次 RPC 的请求级执行选项，沿 execute_plan_text → Agent → Action 传递。
+    Agent 可被多个请求复用，因此请求相关的开关不应挂在 Agent 实例上。
+    """
+
+    def __init__(self, use_cache=True, resume=False, batch_window_ms=None, batch_max_chars=None,
+                 plan_timeout_seconds=None, action_timeout_seconds=None, idle_timeout_seconds=None):
+        self.use_cache = use_cache
+        self.resume = resume  # 依据检查点从第一个未完成的步骤续跑
+        # 输出反馈合并参数，None 表示使用配置文件中的默认值
+        self.batch_window_ms = batch_window_ms
+        self.batch_max_chars = batch_max_chars
+        # 执行时限（秒），None 表示使用配置文件中的默认值，<= 0 表示不限制
+        self.plan_timeout_seconds = plan_timeout_seconds
+        self.action_timeout_seconds = action_timeout_seconds
+        self.idle_timeout_seconds = idle_timeout_seconds
+        # RPC 结束时由服务端触发，执行链路据此停止 LLM 调用并终止子进程
+        self.cancel_token = CancelToken()
+
+    @classmethod
+    def from_request(cls, request):
+        """根据 gRPC 请求中的可选字段构造"""
+        return cls(
+            use_cache=not getattr(request, "no_cache", False),
+            resume=getattr(request, "resume", False),
+            # 0 为未设置；batch_window_ms 为负数表示关闭合并
+            batch_window_ms=getattr(request, "batch_window_ms", 0) or None,
+            batch_max_chars=getattr(request, "batch_max_chars", 0) or None,
+            plan_timeout_seconds=getattr(request, "plan_timeout_seconds", 0) or None,
+            action_timeout_seconds=getattr(request, "action_timeout_seconds", 0) or None,
+            idle_timeout_seconds=getattr(request, "idle_timeout_seconds", 0) or None,
+        )
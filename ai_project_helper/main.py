@@ -1,35 +1,57 @@
 import grpc
+import asyncio
 from concurrent import futures
 from ai_project_helper.server.service import AIProjectHelperServicer
+from ai_project_helper.server.aio_service import AsyncAIProjectHelperServicer
 from ai_project_helper.proto import helper_pb2_grpc
 from ai_project_helper.config import load_config
 from ai_project_helper.log_config import setup_logging, get_logger
 
-def serve():
-    setup_logging()
-    logger = get_logger("server.main")
-    config = load_config()
-    
-    # 修正的 keepalive 选项配置
-    options = [
-        ('grpc.keepalive_time_ms', 30000),          # 30秒发送一次keepalive
-        ('grpc.keepalive_timeout_ms', 120000),       # 120秒超时
-        ('grpc.keepalive_permit_without_calls', 1), # 允许无调用时发送keepalive
-        ('grpc.http2.max_pings_without_data', 0),   # 允许无数据时的ping
-    ]
-    
+# 修正的 keepalive 选项配置
+SERVER_OPTIONS = [
+    ('grpc.keepalive_time_ms', 30000),          # 30秒发送一次keepalive
+    ('grpc.keepalive_timeout_ms', 120000),       # 120秒超时
+    ('grpc.keepalive_permit_without_calls', 1), # 允许无调用时发送keepalive
+    ('grpc.http2.max_pings_without_data', 0),   # 允许无数据时的ping
+]
+LISTEN_ADDRESS = '[::]:50051'
+
+def serve_threaded(config, logger):
+    server_config = config.get("server", {})
     server = grpc.server(
-        futures.ThreadPoolExecutor(max_workers=10),
-        options=options  # 添加这行
+        futures.ThreadPoolExecutor(max_workers=server_config.get("max_workers", 10)),
+        options=SERVER_OPTIONS  # 添加这行
     )
-    
+
     helper_pb2_grpc.add_AIProjectHelperServicer_to_server(
         AIProjectHelperServicer(config), server
     )
-    server.add_insecure_port('[::]:50051')
+    server.add_insecure_port(LISTEN_ADDRESS)
     server.start()
-    logger.info("服务启动，端口 [::]:50051")
+    logger.info(f"服务启动(线程池模式)，端口 {LISTEN_ADDRESS}")
     server.wait_for_termination()
 
+async def serve_aio(config, logger):
+    server_config = config.get("server", {})
+    offload_workers = server_config.get("offload_workers", 256)
+    server = grpc.aio.server(options=SERVER_OPTIONS)
+    helper_pb2_grpc.add_AIProjectHelperServicer_to_server(
+        AsyncAIProjectHelperServicer(config, offload_workers=offload_workers), server
+    )
+    server.add_insecure_port(LISTEN_ADDRESS)
+    await server.start()
+    logger.info(f"服务启动(asyncio模式，阻塞操作线程池上限 {offload_workers})，端口 {LISTEN_ADDRESS}")
+    await server.wait_for_termination()
+
+def serve():
+    setup_logging()
+    logger = get_logger("server.main")
+    config = load_config()
+
+    if config.get("server", {}).get("mode", "thread") == "aio":
+        asyncio.run(serve_aio(config, logger))
+    else:
+        serve_threaded(config, logger)
+
 if __name__ == "__main__":
-    serve()
\ No newline at end of file
+    serve()
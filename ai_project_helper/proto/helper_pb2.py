@@ -1,182 +1,52 @@
-import grpc
-import warnings
-from ai_project_helper.proto import helper_pb2 as helper__pb2
-
-
-GRPC_GENERATED_VERSION = '1.73.0'
-GRPC_VERSION = grpc.__version__
-_version_not_supported = False
-
-try:
-    from grpc._utilities import first_version_is_lower
-    _version_not_supported = first_version_is_lower(GRPC_VERSION, GRPC_GENERATED_VERSION)
-except ImportError:
-    _version_not_supported = True
-
-if _version_not_supported:
-    raise RuntimeError(
-        f'The grpc package installed is at version {GRPC_VERSION},'
-        + f' but the generated code in helper_pb2_grpc.py depends on'
-        + f' grpcio>={GRPC_GENERATED_VERSION}.'
-        + f' Please upgrade your grpc module to grpcio>={GRPC_GENERATED_VERSION}'
-        + f' or downgrade your generated code using grpcio-tools<={GRPC_VERSION}.'
-    )
-
-
-class AIProjectHelperStub(object):
-    """Missing associated documentation comment in .proto file."""
-
-    def __init__(self, channel):
-        """Constructor.
-
-        Args:
-            channel: A grpc.Channel.
-        """
-        self.RunPlan = channel.unary_stream(
-                '/ai_project_helper.AIProjectHelper/RunPlan',
-                request_serializer=helper__pb2.PlanExecuteRequest.SerializeToString,
-                response_deserializer=helper__pb2.ActionFeedback.FromString,
-                _registered_method=True)
-        self.GetPlan = channel.unary_stream(
-                '/ai_project_helper.AIProjectHelper/GetPlan',
-                request_serializer=helper__pb2.PlanGetRequest.SerializeToString,
-                response_deserializer=helper__pb2.ActionFeedback.FromString,
-                _registered_method=True)
-        self.GetPlanThenRun = channel.unary_stream(
-                '/ai_project_helper.AIProjectHelper/GetPlanThenRun',
-                request_serializer=helper__pb2.PlanThenExecuteRequest.SerializeToString,
-                response_deserializer=helper__pb2.ActionFeedback.FromString,
-                _registered_method=True)
-
-
-class AIProjectHelperServicer(object):
-    """Missing associated documentation comment in .proto file."""
-
-    def RunPlan(self, request, context):
-        """Missing associated documentation comment in .proto file."""
-        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
-        context.set_details('Method not implemented!')
-        raise NotImplementedError('Method not implemented!')
-
-    def GetPlan(self, request, context):
-        """新增方法
-        """
-        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
-        context.set_details('Method not implemented!')
-        raise NotImplementedError('Method not implemented!')
-
-    def GetPlanThenRun(self, request, context):
-        """Missing associated documentation comment in .proto file."""
-        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
-        context.set_details('Method not implemented!')
-        raise NotImplementedError('Method not implemented!')
-
-
-def add_AIProjectHelperServicer_to_server(servicer, server):
-    rpc_method_handlers = {
-            'RunPlan': grpc.unary_stream_rpc_method_handler(
-                    servicer.RunPlan,
-                    request_deserializer=helper__pb2.PlanExecuteRequest.FromString,
-                    response_serializer=helper__pb2.ActionFeedback.SerializeToString,
-            ),
-            'GetPlan': grpc.unary_stream_rpc_method_handler(
-                    servicer.GetPlan,
-                    request_deserializer=helper__pb2.PlanGetRequest.FromString,
-                    response_serializer=helper__pb2.ActionFeedback.SerializeToString,
-            ),
-            'GetPlanThenRun': grpc.unary_stream_rpc_method_handler(
-                    servicer.GetPlanThenRun,
-                    request_deserializer=helper__pb2.PlanThenExecuteRequest.FromString,
-                    response_serializer=helper__pb2.ActionFeedback.SerializeToString,
-            ),
-    }
-    generic_handler = grpc.method_handlers_generic_handler(
-            'ai_project_helper.AIProjectHelper', rpc_method_handlers)
-    server.add_generic_rpc_handlers((generic_handler,))
-    server.add_registered_method_handlers('ai_project_helper.AIProjectHelper', rpc_method_handlers)
-
-
- # This class is part of an EXPERIMENTAL API.
-class AIProjectHelper(object):
-    """Missing associated documentation comment in .proto file."""
-
-    @staticmethod
-    def RunPlan(request,
-            target,
-            options=(),
-            channel_credentials=None,
-            call_credentials=None,
-            insecure=False,
-            compression=None,
-            wait_for_ready=None,
-            timeout=None,
-            metadata=None):
-        return grpc.experimental.unary_stream(
-            request,
-            target,
-            '/ai_project_helper.AIProjectHelper/RunPlan',
-            helper__pb2.PlanExecuteRequest.SerializeToString,
-            helper__pb2.ActionFeedback.FromString,
-            options,
-            channel_credentials,
-            insecure,
-            call_credentials,
-            compression,
-            wait_for_ready,
-            timeout,
-            metadata,
-            _registered_method=True)
-
-    @staticmethod
-    def GetPlan(request,
-            target,
-            options=(),
-            channel_credentials=None,
-            call_credentials=None,
-            insecure=False,
-            compression=None,
-            wait_for_ready=None,
-            timeout=None,
-            metadata=None):
-        return grpc.experimental.unary_stream(
-            request,
-            target,
-            '/ai_project_helper.AIProjectHelper/GetPlan',
-            helper__pb2.PlanGetRequest.SerializeToString,
-            helper__pb2.ActionFeedback.FromString,
-            options,
-            channel_credentials,
-            insecure,
-            call_credentials,
-            compression,
-            wait_for_ready,
-            timeout,
-            metadata,
-            _registered_method=True)
-
-    @staticmethod
-    def GetPlanThenRun(request,
-            target,
-            options=(),
-            channel_credentials=None,
-            call_credentials=None,
-            insecure=False,
-            compression=None,
-            wait_for_ready=None,
-            timeout=None,
-            metadata=None):
-        return grpc.experimental.unary_stream(
-            request,
-            target,
-            '/ai_project_helper.AIProjectHelper/GetPlanThenRun',
-            helper__pb2.PlanThenExecuteRequest.SerializeToString,
-            helper__pb2.ActionFeedback.FromString,
-            options,
-            channel_credentials,
-            insecure,
-            call_credentials,
-            compression,
-            wait_for_ready,
-            timeout,
-            metadata,
-            _registered_method=True)
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: helper.proto
+# Protobuf Python Version: 6.31.0
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    6,
+    31,
+    0,
+    '',
+    'helper.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0chelper.proto\x12\x11\x61i_project_helper\"Y\n\x0ePlanGetRequest\x12\x13\n\x0brequirement\x18\x01 \x01(\t\x12\r\n\x05model\x18\x02 \x01(\t\x12\x0f\n\x07llm_url\x18\x03 \x01(\t\x12\x12\n\nproject_id\x18\x04 \x01(\t\"\xeb\x01\n\x12PlanExecuteRequest\x12\x11\n\tplan_text\x18\x01 \x01(\t\x12\x12\n\nproject_id\x18\x02 \x01(\t\x12\x10\n\x08no_cache\x18\x03 \x01(\x08\x12\x0e\n\x06resume\x18\x04 \x01(\x08\x12\x17\n\x0f\x62\x61tch_window_ms\x18\x05 \x01(\x05\x12\x17\n\x0f\x62\x61tch_max_chars\x18\x06 \x01(\x05\x12\x1c\n\x14plan_timeout_seconds\x18\x07 \x01(\x05\x12\x1e\n\x16\x61\x63tion_timeout_seconds\x18\x08 \x01(\x05\x12\x1c\n\x14idle_timeout_seconds\x18\t \x01(\x05\"\x81\x02\n\x16PlanThenExecuteRequest\x12\x13\n\x0brequirement\x18\x01 \x01(\t\x12\r\n\x05model\x18\x02 \x01(\t\x12\x0f\n\x07llm_url\x18\x03 \x01(\t\x12\x12\n\nproject_id\x18\x04 \x01(\t\x12\x10\n\x08no_cache\x18\x05 \x01(\x08\x12\x17\n\x0f\x62\x61tch_window_ms\x18\x06 \x01(\x05\x12\x17\n\x0f\x62\x61tch_max_chars\x18\x07 \x01(\x05\x12\x1c\n\x14plan_timeout_seconds\x18\x08 \x01(\x05\x12\x1e\n\x16\x61\x63tion_timeout_seconds\x18\t \x01(\x05\x12\x1c\n\x14idle_timeout_seconds\x18\n \x01(\x05\"\x91\x02\n\x0e\x41\x63tionFeedback\x12\x14\n\x0c\x61\x63tion_index\x18\x01 \x01(\x05\x12\x13\n\x0b\x61\x63tion_type\x18\x02 \x01(\t\x12\x18\n\x10step_description\x18\x03 \x01(\t\x12\x0e\n\x06status\x18\x04 \x01(\t\x12\x0e\n\x06output\x18\x05 \x01(\t\x12\r\n\x05\x65rror\x18\x06 \x01(\t\x12\x0f\n\x07\x63ommand\x18\x07 \x01(\t\x12\x12\n\nstep_index\x18\x08 \x01(\x05\x12\x13\n\x0btotal_steps\x18\t \x01(\x05\x12\x11\n\texit_code\x18\n \x01(\x05\x12\x15\n\rcomplete_plan\x18\x0b \x01(\t\x12\x12\n\npart_index\x18\x0c \x01(\x05\x12\x13\n\x0btotal_parts\x18\r \x01(\x05\"\xa1\x01\n\rActionStarted\x12\x11\n\taction_id\x18\x01 \x01(\x05\x12\x12\n\nstep_index\x18\x02 \x01(\x05\x12\x13\n\x0btotal_steps\x18\x03 \x01(\x05\x12\x14\n\x0c\x61\x63tion_index\x18\x04 \x01(\x05\x12\x13\n\x0b\x61\x63tion_type\x18\x05 \x01(\t\x12\x18\n\x10step_description\x18\x06 \x01(\t\x12\x0f\n\x07\x63ommand\x18\x07 \x01(\t\"?\n\x0bOutputChunk\x12\x11\n\taction_id\x18\x01 \x01(\x05\x12\x0e\n\x06output\x18\x02 \x01(\x0c\x12\r\n\x05\x65rror\x18\x03 \x01(\x0c\"\x7f\n\x0e\x41\x63tionFinished\x12\x11\n\taction_id\x18\x01 \x01(\x05\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x11\n\texit_code\x18\x03 \x01(\x05\x12\x18\n\x10step_description\x18\x04 \x01(\t\x12\x0e\n\x06output\x18\x05 \x01(\x0c\x12\r\n\x05\x65rror\x18\x06 \x01(\x0c\"\xec\x01\n\rFeedbackEvent\x12\x33\n\x07started\x18\x01 \x01(\x0b\x32 .ai_project_helper.ActionStartedH\x00\x12/\n\x05\x63hunk\x18\x02 \x01(\x0b\x32\x1e.ai_project_helper.OutputChunkH\x00\x12\x35\n\x08\x66inished\x18\x03 \x01(\x0b\x32!.ai_project_helper.ActionFinishedH\x00\x12\x35\n\x08\x66\x65\x65\x64\x62\x61\x63k\x18\x04 \x01(\x0b\x32!.ai_project_helper.ActionFeedbackH\x00\x42\x07\n\x05\x65vent2\xde\x03\n\x0f\x41IProjectHelper\x12Q\n\x07GetPlan\x12!.ai_project_helper.PlanGetRequest\x1a!.ai_project_helper.ActionFeedback0\x01\x12U\n\x07RunPlan\x12%.ai_project_helper.PlanExecuteRequest\x1a!.ai_project_helper.ActionFeedback0\x01\x12`\n\x0eGetPlanThenRun\x12).ai_project_helper.PlanThenExecuteRequest\x1a!.ai_project_helper.ActionFeedback0\x01\x12Y\n\x0cRunPlanDelta\x12%.ai_project_helper.PlanExecuteRequest\x1a .ai_project_helper.FeedbackEvent0\x01\x12\x64\n\x13GetPlanThenRunDelta\x12).ai_project_helper.PlanThenExecuteRequest\x1a .ai_project_helper.FeedbackEvent0\x01\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'helper_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_PLANGETREQUEST']._serialized_start=35
+  _globals['_PLANGETREQUEST']._serialized_end=124
+  _globals['_PLANEXECUTEREQUEST']._serialized_start=127
+  _globals['_PLANEXECUTEREQUEST']._serialized_end=362
+  _globals['_PLANTHENEXECUTEREQUEST']._serialized_start=365
+  _globals['_PLANTHENEXECUTEREQUEST']._serialized_end=622
+  _globals['_ACTIONFEEDBACK']._serialized_start=625
+  _globals['_ACTIONFEEDBACK']._serialized_end=898
+  _globals['_ACTIONSTARTED']._serialized_start=901
+  _globals['_ACTIONSTARTED']._serialized_end=1062
+  _globals['_OUTPUTCHUNK']._serialized_start=1064
+  _globals['_OUTPUTCHUNK']._serialized_end=1127
+  _globals['_ACTIONFINISHED']._serialized_start=1129
+  _globals['_ACTIONFINISHED']._serialized_end=1256
+  _globals['_FEEDBACKEVENT']._serialized_start=1259
+  _globals['_FEEDBACKEVENT']._serialized_end=1495
+  _globals['_AIPROJECTHELPER']._serialized_start=1498
+  _globals['_AIPROJECTHELPER']._serialized_end=1976
+# @@protoc_insertion_point(module_scope)
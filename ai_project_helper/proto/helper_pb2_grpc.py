@@ -1,5 +1,8 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
 import grpc
 import warnings
+
 from ai_project_helper.proto import helper_pb2 as helper__pb2
 
 GRPC_GENERATED_VERSION = '1.73.0'
@@ -31,40 +34,62 @@ class AIProjectHelperStub(object):
         Args:
             channel: A grpc.Channel.
         """
-        self.RunPlan = channel.unary_stream(
-                '/ai_project_helper.AIProjectHelper/RunPlan',
-                request_serializer=helper__pb2.PlanExecuteRequest.SerializeToString,
-                response_deserializer=helper__pb2.ActionFeedback.FromString,
-                _registered_method=True)
         self.GetPlan = channel.unary_stream(
                 '/ai_project_helper.AIProjectHelper/GetPlan',
                 request_serializer=helper__pb2.PlanGetRequest.SerializeToString,
                 response_deserializer=helper__pb2.ActionFeedback.FromString,
                 _registered_method=True)
+        self.RunPlan = channel.unary_stream(
+                '/ai_project_helper.AIProjectHelper/RunPlan',
+                request_serializer=helper__pb2.PlanExecuteRequest.SerializeToString,
+                response_deserializer=helper__pb2.ActionFeedback.FromString,
+                _registered_method=True)
         self.GetPlanThenRun = channel.unary_stream(
                 '/ai_project_helper.AIProjectHelper/GetPlanThenRun',
                 request_serializer=helper__pb2.PlanThenExecuteRequest.SerializeToString,
                 response_deserializer=helper__pb2.ActionFeedback.FromString,
                 _registered_method=True)
+        self.RunPlanDelta = channel.unary_stream(
+                '/ai_project_helper.AIProjectHelper/RunPlanDelta',
+                request_serializer=helper__pb2.PlanExecuteRequest.SerializeToString,
+                response_deserializer=helper__pb2.FeedbackEvent.FromString,
+                _registered_method=True)
+        self.GetPlanThenRunDelta = channel.unary_stream(
+                '/ai_project_helper.AIProjectHelper/GetPlanThenRunDelta',
+                request_serializer=helper__pb2.PlanThenExecuteRequest.SerializeToString,
+                response_deserializer=helper__pb2.FeedbackEvent.FromString,
+                _registered_method=True)
 
 
 class AIProjectHelperServicer(object):
     """Missing associated documentation comment in .proto file."""
 
+    def GetPlan(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def RunPlan(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
-    def GetPlan(self, request, context):
-        """新增方法
+    def GetPlanThenRun(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def RunPlanDelta(self, request, context):
+        """增量协议：动作元数据只在 ActionStarted 中发送一次，之后只发送输出增量
         """
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
-    def GetPlanThenRun(self, request, context):
+    def GetPlanThenRunDelta(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
@@ -73,21 +98,31 @@ class AIProjectHelperServicer(object):
 
 def add_AIProjectHelperServicer_to_server(servicer, server):
     rpc_method_handlers = {
-            'RunPlan': grpc.unary_stream_rpc_method_handler(
-                    servicer.RunPlan,
-                    request_deserializer=helper__pb2.PlanExecuteRequest.FromString,
-                    response_serializer=helper__pb2.ActionFeedback.SerializeToString,
-            ),
             'GetPlan': grpc.unary_stream_rpc_method_handler(
                     servicer.GetPlan,
                     request_deserializer=helper__pb2.PlanGetRequest.FromString,
                     response_serializer=helper__pb2.ActionFeedback.SerializeToString,
             ),
+            'RunPlan': grpc.unary_stream_rpc_method_handler(
+                    servicer.RunPlan,
+                    request_deserializer=helper__pb2.PlanExecuteRequest.FromString,
+                    response_serializer=helper__pb2.ActionFeedback.SerializeToString,
+            ),
             'GetPlanThenRun': grpc.unary_stream_rpc_method_handler(
                     servicer.GetPlanThenRun,
                     request_deserializer=helper__pb2.PlanThenExecuteRequest.FromString,
                     response_serializer=helper__pb2.ActionFeedback.SerializeToString,
             ),
+            'RunPlanDelta': grpc.unary_stream_rpc_method_handler(
+                    servicer.RunPlanDelta,
+                    request_deserializer=helper__pb2.PlanExecuteRequest.FromString,
+                    response_serializer=helper__pb2.FeedbackEvent.SerializeToString,
+            ),
+            'GetPlanThenRunDelta': grpc.unary_stream_rpc_method_handler(
+                    servicer.GetPlanThenRunDelta,
+                    request_deserializer=helper__pb2.PlanThenExecuteRequest.FromString,
+                    response_serializer=helper__pb2.FeedbackEvent.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'ai_project_helper.AIProjectHelper', rpc_method_handlers)
@@ -100,7 +135,7 @@ class AIProjectHelper(object):
     """Missing associated documentation comment in .proto file."""
 
     @staticmethod
-    def RunPlan(request,
+    def GetPlan(request,
             target,
             options=(),
             channel_credentials=None,
@@ -113,8 +148,8 @@ class AIProjectHelper(object):
         return grpc.experimental.unary_stream(
             request,
             target,
-            '/ai_project_helper.AIProjectHelper/RunPlan',
-            helper__pb2.PlanExecuteRequest.SerializeToString,
+            '/ai_project_helper.AIProjectHelper/GetPlan',
+            helper__pb2.PlanGetRequest.SerializeToString,
             helper__pb2.ActionFeedback.FromString,
             options,
             channel_credentials,
@@ -127,7 +162,7 @@ class AIProjectHelper(object):
             _registered_method=True)
 
     @staticmethod
-    def GetPlan(request,
+    def RunPlan(request,
             target,
             options=(),
             channel_credentials=None,
@@ -140,8 +175,8 @@ class AIProjectHelper(object):
         return grpc.experimental.unary_stream(
             request,
             target,
-            '/ai_project_helper.AIProjectHelper/GetPlan',
-            helper__pb2.PlanGetRequest.SerializeToString,
+            '/ai_project_helper.AIProjectHelper/RunPlan',
+            helper__pb2.PlanExecuteRequest.SerializeToString,
             helper__pb2.ActionFeedback.FromString,
             options,
             channel_credentials,
@@ -179,3 +214,57 @@ class AIProjectHelper(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def RunPlanDelta(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/ai_project_helper.AIProjectHelper/RunPlanDelta',
+            helper__pb2.PlanExecuteRequest.SerializeToString,
+            helper__pb2.FeedbackEvent.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetPlanThenRunDelta(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/ai_project_helper.AIProjectHelper/GetPlanThenRunDelta',
+            helper__pb2.PlanThenExecuteRequest.SerializeToString,
+            helper__pb2.FeedbackEvent.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,82 @@
+# 按项目复用 Agent，并保证同一项目目录同一时间只有一个运行中的计划
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from ai_project_helper.core.agent import Agent
+from ai_project_helper.core.cancellation import OperationCancelled
+from ai_project_helper.log_config import get_logger
+
+logger = get_logger("server.agent_pool")
+
+
+class AgentPool:
+    """
+    项目ID → Agent 的注册表。
+    - 运行结束后 Agent 回到空闲表，下次同一项目的请求直接复用（LLM 客户端、缓存等随之复用）；
+    - 空闲 Agent 超过 max_idle 时按最近使用时间淘汰；
+    - 每个项目目录一把运行锁，后到的请求排队等待前一个运行结束。
+    """
+
+    def __init__(self, config, base_working_dir, max_idle=32):
+        self.config = config
+        self.base_working_dir = base_working_dir
+        self.max_idle = max(0, int(max_idle))
+        self._lock = threading.Lock()
+        self._idle = OrderedDict()   # project_dir -> Agent，按最近使用排序
+        self._run_locks = {}         # project_dir -> threading.Lock
+        self._waiters = {}           # project_dir -> 持有或等待运行锁的请求数
+
+    def get_project_dir(self, project_id):
+        project_dir = os.path.join(self.base_working_dir, project_id)
+        os.makedirs(project_dir, exist_ok=True)
+        logger.info(f"使用项目目录: {project_dir}")
+        return project_dir
+
+    def is_busy(self, project_id):
+        """该项目当前是否已有运行中的计划（新请求需要排队）"""
+        project_dir = os.path.join(self.base_working_dir, project_id)
+        with self._lock:
+            return self._waiters.get(project_dir, 0) > 0
+
+    def _create_agent(self, project_dir):
+        config = self.config.copy()
+        config['working_dir'] = project_dir
+        return Agent(config)
+
+    @contextmanager
+    def lease(self, project_id, is_active=None, cancel_token=None):
+        """
+        独占地取得项目的 Agent。
+        is_active 为可选的回调（如 context.is_active），cancel_token 为请求的 CancelToken；
+        排队期间请求被取消（RPC 已结束或令牌已取消）时抛出 OperationCancelled
+        """
+        project_dir = self.get_project_dir(project_id)
+        with self._lock:
+            run_lock = self._run_locks.setdefault(project_dir, threading.Lock())
+            self._waiters[project_dir] = self._waiters.get(project_dir, 0) + 1
+        try:
+            while not run_lock.acquire(timeout=1.0):
+                if (is_active is not None and not is_active()) or (cancel_token is not None and cancel_token.cancelled):
+                    raise OperationCancelled(f"项目 {project_id} 排队期间请求已取消")
+            agent = None
+            try:
+                with self._lock:
+                    agent = self._idle.pop(project_dir, None)
+                if agent is None:
+                    agent = self._create_agent(project_dir)
+                yield agent
+            finally:
+                with self._lock:
+                    if agent is not None:
+                        self._idle[project_dir] = agent
+                    while len(self._idle) > self.max_idle:
+                        evicted_dir, _ = self._idle.popitem(last=False)
+                        logger.info(f"淘汰空闲 Agent: {evicted_dir}")
+                run_lock.release()
+        finally:
+            with self._lock:
+                self._waiters[project_dir] -= 1
+                if not self._waiters[project_dir]:
+                    del self._waiters[project_dir]
+                    del self._run_locks[project_dir]
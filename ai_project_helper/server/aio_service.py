@@ -0,0 +1,151 @@
+# asyncio 版 gRPC 服务：RPC 收发在事件循环中进行，阻塞的执行链路（LLM/子进程/文件操作）在有界线程池中运行
+import asyncio
+import threading
+from concurrent import futures
+from ai_project_helper.proto import helper_pb2_grpc
+from ai_project_helper.server.service import AIProjectHelperServicer
+from ai_project_helper.log_config import get_logger
+
+logger = get_logger("server.aio_service")
+
+_END = object()
+STREAM_QUEUE_SIZE = 64  # 每个流在事件循环侧缓冲的反馈条数
+
+
+class BridgedContext:
+    """
+    提供给同步执行链路的 context 代理。
+    工作线程中只记录状态码/详情与回调，RPC 结束后在事件循环线程中统一应用到真实 context。
+    """
+
+    def __init__(self, context):
+        self._context = context
+        self._lock = threading.Lock()
+        self._active = True
+        self._callbacks = []
+        self._code = None
+        self._details = None
+
+    def set_code(self, code):
+        self._code = code
+
+    def set_details(self, details):
+        self._details = details
+
+    def is_active(self):
+        return self._active
+
+    def time_remaining(self):
+        return self._context.time_remaining()
+
+    def add_callback(self, callback):
+        with self._lock:
+            if self._active:
+                self._callbacks.append(callback)
+                return True
+        return False
+
+    def finish(self):
+        """RPC 结束（完成、取消或客户端断开）：标记失效、触发回调并回写状态码"""
+        with self._lock:
+            self._active = False
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("RPC 结束回调执行失败")
+        if self._code is not None:
+            self._context.set_code(self._code)
+        if self._details is not None:
+            self._context.set_details(self._details)
+
+
+class _Raised:
+    """工作线程中生成器抛出的异常，转交事件循环重新抛出"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class AsyncAIProjectHelperServicer(helper_pb2_grpc.AIProjectHelperServicer):
+    """
+    复用同步版 AIProjectHelperServicer 的全部业务逻辑。
+    事件循环只负责 RPC 的收发；每个流式 RPC 的同步执行链路（LLM 请求、子进程输出、文件读写）
+    整体提交到有界线程池，在一个工作线程中迭代，反馈经有界队列交给事件循环发送（队列满时工作线程等待，形成背压）。
+    因此进行中的流各占一个工作线程，上限为 offload_workers；超出上限的 RPC 在线程池中排队，
+    不占用事件循环，也不影响其他 RPC 的收发与取消
+    """
+
+    def __init__(self, config, offload_workers=256):
+        self.servicer = AIProjectHelperServicer(config)
+        self.executor = futures.ThreadPoolExecutor(
+            max_workers=offload_workers, thread_name_prefix="rpc-offload"
+        )
+
+    async def _bridge(self, method, request, context):
+        loop = asyncio.get_running_loop()
+        bridged = BridgedContext(context)
+        feedback = asyncio.Queue()
+        # 背压：工作线程最多领先事件循环 STREAM_QUEUE_SIZE 条反馈
+        credits = threading.Semaphore(STREAM_QUEUE_SIZE)
+        stopped = threading.Event()
+
+        def put(item):
+            # 工作线程中调用；返回 False 表示 RPC 已结束，不必继续执行
+            credits.acquire()
+            if stopped.is_set():
+                return False
+            try:
+                loop.call_soon_threadsafe(feedback.put_nowait, item)
+            except RuntimeError:
+                return False  # 事件循环已关闭（服务停止）
+            return True
+
+        def pump():
+            gen = method(request, bridged)
+            try:
+                for item in gen:
+                    if not put(item):
+                        break
+            except BaseException as e:
+                put(_Raised(e))
+            finally:
+                gen.close()
+                put(_END)
+
+        loop.run_in_executor(self.executor, pump)
+        try:
+            while True:
+                item = await feedback.get()
+                credits.release()
+                if item is _END:
+                    break
+                if isinstance(item, _Raised):
+                    raise item.error
+                yield item
+        finally:
+            # RPC 结束（完成、取消或客户端断开）：唤醒等待发送的工作线程使其停止，并触发取消回调
+            stopped.set()
+            credits.release(STREAM_QUEUE_SIZE + 2)
+            bridged.finish()
+
+    async def GetPlan(self, request, context):
+        async for fb in self._bridge(self.servicer.GetPlan, request, context):
+            yield fb
+
+    async def GetPlanThenRun(self, request, context):
+        async for fb in self._bridge(self.servicer.GetPlanThenRun, request, context):
+            yield fb
+
+    async def RunPlan(self, request, context):
+        async for fb in self._bridge(self.servicer.RunPlan, request, context):
+            yield fb
+
+    async def RunPlanDelta(self, request, context):
+        async for event in self._bridge(self.servicer.RunPlanDelta, request, context):
+            yield event
+
+    async def GetPlanThenRunDelta(self, request, context):
+        async for event in self._bridge(self.servicer.GetPlanThenRunDelta, request, context):
+            yield event
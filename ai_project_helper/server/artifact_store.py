@@ -0,0 +1,261 @@
+# 计划生成记录（请求、大纲、各部分、完整计划）的异步持久化：
+# 内容寻址去重存储 + 后台写入线程 + 保留策略，请求线程只负责把待写内容放入有界队列
+
+import os
+import json
+import gzip
+import time
+import queue
+import atexit
+import hashlib
+import tempfile
+import threading
+from ai_project_helper.log_config import get_logger
+
+logger = get_logger("server.artifact_store")
+
+DEFAULT_ARTIFACT_CONFIG = {
+    "dir": "llm_coding_plans",      # 存储目录
+    "compress": False,              # 内容块以 gzip 存储
+    "queue_size": 256,              # 待写队列上限，队列满时丢弃该条记录（不阻塞请求线程）
+    "retention_days": 14,           # 保留最近多少天的记录（0=不按时间清理）
+    "max_runs": 500,                # 最多保留多少次计划生成的记录（0=不按数量清理）
+    "prune_interval_seconds": 3600, # 两次清理之间的最短间隔
+    "prune_legacy": False,          # 是否同时清理根目录下旧版本遗留的 .txt 记录（这些文件不是本存储创建的）
+}
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _atomic_write(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class ArtifactStore:
+    """
+    目录结构：
+    - objects/ab/abcd...[.gz]：按 sha256 寻址的内容块，相同内容只存一份；
+    - manifests/{project}-{时间戳}-{序号}.json：一次计划生成的清单，
+      {"project_id": ..., "created": ..., "entries": {"request-Part-2-of-4": [块哈希...], ...}}，
+      条目内容为各块按顺序拼接。请求中反复附带的需求与历史部分拆成独立的块，因此只存一次。
+    """
+
+    def __init__(self, root, compress=False):
+        self.root = root
+        self.compress = compress
+        self.objects_dir = os.path.join(root, "objects")
+        self.manifests_dir = os.path.join(root, "manifests")
+
+    def _object_path(self, digest, compressed):
+        return os.path.join(self.objects_dir, digest[:2], digest + (".gz" if compressed else ""))
+
+    def _find_object(self, digest):
+        for compressed in (False, True):
+            path = self._object_path(digest, compressed)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, text):
+        """存储内容块并返回其哈希；已存在时不重复写入"""
+        digest = content_hash(text)
+        if self._find_object(digest) is None:
+            data = text.encode("utf-8")
+            if self.compress:
+                data = gzip.compress(data)
+            _atomic_write(self._object_path(digest, self.compress), data)
+        return digest
+
+    def get(self, digest):
+        path = self._find_object(digest)
+        if path is None:
+            raise KeyError(f"内容块不存在: {digest}")
+        with open(path, "rb") as f:
+            data = f.read()
+        if path.endswith(".gz"):
+            data = gzip.decompress(data)
+        return data.decode("utf-8")
+
+    def _manifest_path(self, run_name):
+        return os.path.join(self.manifests_dir, f"{run_name}.json")
+
+    def load_manifest(self, run_name):
+        path = self._manifest_path(run_name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def record(self, run_name, project_id, entry_name, segments):
+        """存储各内容块，并把条目追加到该次计划生成的清单中"""
+        digests = [self.put(segment) for segment in segments]
+        manifest = self.load_manifest(run_name) or {
+            "project_id": project_id, "created": time.time(), "entries": {}
+        }
+        manifest["entries"][entry_name] = digests
+        _atomic_write(
+            self._manifest_path(run_name),
+            json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+        )
+
+    def read(self, run_name, entry_name):
+        """还原某条记录的完整文本"""
+        manifest = self.load_manifest(run_name)
+        if manifest is None or entry_name not in manifest["entries"]:
+            raise KeyError(f"记录不存在: {run_name}/{entry_name}")
+        return "".join(self.get(digest) for digest in manifest["entries"][entry_name])
+
+    def prune(self, retention_days=0, max_runs=0, prune_legacy=False):
+        """
+        删除过期或超出数量上限的清单，再删除不再被任何清单引用的内容块。
+        prune_legacy 为 True 时，根目录下旧版本遗留的 .txt 记录同样按保留天数清理（默认不动）。返回删除的清单数
+        """
+        now = time.time()
+        cutoff = now - retention_days * 86400 if retention_days else None
+        manifests = []
+        if os.path.isdir(self.manifests_dir):
+            for name in os.listdir(self.manifests_dir):
+                if name.endswith(".json"):
+                    path = os.path.join(self.manifests_dir, name)
+                    manifests.append((os.path.getmtime(path), path))
+        manifests.sort()
+
+        expired = [path for mtime, path in manifests if cutoff is not None and mtime < cutoff]
+        kept = [path for mtime, path in manifests if cutoff is None or mtime >= cutoff]
+        if max_runs and len(kept) > max_runs:
+            expired += kept[:len(kept) - max_runs]
+            kept = kept[len(kept) - max_runs:]
+        for path in expired:
+            os.unlink(path)
+
+        if prune_legacy and cutoff is not None and os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if name.endswith(".txt") and os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+
+        if expired:
+            self._sweep_objects(kept)
+        return len(expired)
+
+    def _sweep_objects(self, manifest_paths):
+        referenced = set()
+        for path in manifest_paths:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for digests in json.load(f)["entries"].values():
+                        referenced.update(digests)
+            except (OSError, ValueError, KeyError):
+                logger.warning(f"计划记录清单无法读取，跳过: {path}")
+        if not os.path.isdir(self.objects_dir):
+            return
+        removed = 0
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            for name in os.listdir(prefix_dir):
+                if name.endswith(".tmp"):
+                    continue
+                if name.split(".", 1)[0] not in referenced:
+                    os.unlink(os.path.join(prefix_dir, name))
+                    removed += 1
+        logger.info(f"计划记录清理：删除 {removed} 个未引用的内容块")
+
+
+class ArtifactWriter:
+    """后台写入线程：submit 只把记录放入有界队列，哈希、压缩、写盘和定期清理都在写入线程中完成"""
+
+    def __init__(self, artifact_config=None):
+        cfg = dict(DEFAULT_ARTIFACT_CONFIG)
+        cfg.update(artifact_config or {})
+        self.config = cfg
+        self.store = ArtifactStore(cfg["dir"], compress=bool(cfg["compress"]))
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=int(cfg["queue_size"]))
+        self._last_prune = None
+        self._run_seq = 0
+        self._seq_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="plan-artifacts", daemon=True)
+        self._thread.start()
+
+    def new_run_name(self, project_id, timestamp):
+        """同一秒内的多次计划生成以序号区分"""
+        with self._seq_lock:
+            self._run_seq += 1
+            return f"{project_id}-{timestamp}-{os.getpid()}-{self._run_seq}"
+
+    def submit(self, run_name, project_id, entry_name, segments):
+        try:
+            self._queue.put_nowait((run_name, project_id, entry_name, list(segments)))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"计划记录写入队列已满，丢弃记录 {run_name}/{entry_name}")
+
+    def flush(self):
+        """等待队列中已提交的记录全部写入"""
+        self._queue.join()
+
+    def close(self, timeout=5.0):
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _maybe_prune(self):
+        interval = self.config["prune_interval_seconds"]
+        now = time.monotonic()
+        if self._last_prune is not None and now - self._last_prune < interval:
+            return
+        self._last_prune = now
+        try:
+            removed = self.store.prune(
+                self.config["retention_days"], self.config["max_runs"], self.config["prune_legacy"]
+            )
+            if removed:
+                logger.info(f"计划记录清理：删除 {removed} 次过期的计划生成记录")
+        except OSError:
+            logger.exception("计划记录清理失败")
+
+    def _run(self):
+        self._maybe_prune()
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self.store.record(*job)
+                self._maybe_prune()
+            except Exception:
+                logger.exception(f"计划记录写入失败: {job[0]}/{job[2]}")
+            finally:
+                self._queue.task_done()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_artifact_writer(config=None):
+    """
+    获取进程级共享的 ArtifactWriter。
+    首次调用时按 config['plan_artifacts'] 创建，之后的调用复用同一实例；进程退出前写完队列中的记录。
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ArtifactWriter((config or {}).get("plan_artifacts"))
+            atexit.register(_writer.close)
+            logger.info(f"计划记录写入线程已启动: {_writer.config}")
+        return _writer
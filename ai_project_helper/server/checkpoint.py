@@ -0,0 +1,144 @@
+# 计划执行检查点日志：记录每个步骤的文本哈希及已完成的动作，供 RunPlan 断点续跑
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from ai_project_helper.log_config import get_logger
+
+logger = get_logger("server.checkpoint")
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def action_fingerprint(action_dict):
+    """动作指纹：动作类型 + 清洗后的参数，用于判断重新翻译出的动作是否与上次一致"""
+    payload = json.dumps(
+        [action_dict.get("action_type"), action_dict.get("parameters", {})],
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return text_hash(payload)
+
+
+def get_journal_path(state_dir, project_id):
+    return os.path.join(state_dir, "checkpoints", f"{project_id}.json")
+
+
+class ExecutionJournal:
+    """
+    每个项目一个 JSON 文件，结构：
+    {"plan_hash": ..., "steps": {"<step_index>": {"text_hash": ..., "actions": {"<action_index>": 指纹},
+                                                   "completed": [action_index...], "done": bool}}}
+    每次状态变化后原子写回磁盘，进程崩溃后仍可续跑。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {"plan_hash": "", "steps": {}}
+        self._tracked = {}  # step_index -> 本次执行中产出的动作指纹列表
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                logger.warning(f"检查点文件损坏，已忽略: {path}")
+
+    def _save(self):
+        self._data["updated"] = time.time()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def reset(self, plan_text):
+        """全新执行：清空旧检查点"""
+        with self._lock:
+            self._data = {"plan_hash": text_hash(plan_text), "steps": {}}
+            self._tracked = {}
+            self._save()
+
+    def set_plan(self, plan_text):
+        """计划边生成边执行时，生成完毕后补记计划哈希，保留已记录的步骤"""
+        with self._lock:
+            self._data["plan_hash"] = text_hash(plan_text)
+            self._save()
+
+    def _step(self, step_index, step_text):
+        """返回与当前步骤文本一致的记录；文本变化时重建该步骤的记录"""
+        key = str(step_index)
+        digest = text_hash(step_text)
+        entry = self._data["steps"].get(key)
+        if not entry or entry.get("text_hash") != digest:
+            entry = {"text_hash": digest, "actions": {}, "completed": [], "done": False}
+            self._data["steps"][key] = entry
+        return entry
+
+    def is_step_done(self, step_index, step_text):
+        with self._lock:
+            entry = self._data["steps"].get(str(step_index))
+            return bool(entry and entry.get("done") and entry.get("text_hash") == text_hash(step_text))
+
+    def track_step(self, step_index, step_text, actions):
+        """
+        包装步骤的 actions 迭代器：记录每个动作的指纹，
+        并将与上次执行一致且已完成的前缀动作标记为 skipped
+        """
+        with self._lock:
+            entry = self._step(step_index, step_text)
+            previous = dict(entry["actions"])
+            completed = set(entry["completed"])
+            fingerprints = self._tracked[step_index] = []
+        skipping = True
+        for idx, action in enumerate(actions):
+            fingerprint = action_fingerprint(action)
+            fingerprints.append(fingerprint)
+            skipping = skipping and idx in completed and previous.get(str(idx)) == fingerprint
+            if skipping:
+                action["skipped"] = "检查点中已完成"
+            else:
+                # 该动作将重新执行，清除旧的完成记录
+                with self._lock:
+                    entry["actions"].pop(str(idx), None)
+                    if idx in entry["completed"]:
+                        entry["completed"].remove(idx)
+            yield action
+
+    def observe(self, step_index, step_text, fb):
+        """根据一条反馈更新动作完成状态"""
+        status = fb.get("status")
+        if status not in ("success", "skipped"):
+            return
+        # 兼容现有约定：动作内部错误以 exit_code=1 上报但状态仍为 success
+        if status == "success" and fb.get("exit_code", 0) not in (0, 2):
+            return
+        idx = fb.get("action_index", 0)
+        with self._lock:
+            entry = self._step(step_index, step_text)
+            fingerprints = self._tracked.get(step_index, [])
+            if idx < len(fingerprints):
+                entry["actions"][str(idx)] = fingerprints[idx]
+            if idx not in entry["completed"]:
+                entry["completed"].append(idx)
+            self._save()
+
+    def reset_step(self, step_index, step_text):
+        """步骤回滚后清除其动作完成记录，续跑时整个步骤重新执行"""
+        with self._lock:
+            entry = self._step(step_index, step_text)
+            entry.update(actions={}, completed=[], done=False)
+            self._tracked.pop(step_index, None)
+            self._save()
+
+    def finish_step(self, step_index, step_text):
+        """步骤的所有动作都已完成时标记为 done，之后续跑将整体跳过该步骤"""
+        with self._lock:
+            entry = self._step(step_index, step_text)
+            total = len(self._tracked.pop(step_index, []))
+            entry["done"] = set(range(total)) <= set(entry["completed"])
+            self._save()
+            return entry["done"]
@@ -0,0 +1,75 @@
+# 增量反馈协议：把执行器的反馈流转换为 ActionStarted / OutputChunk / ActionFinished 事件
+from ai_project_helper.proto import helper_pb2
+from ai_project_helper.server.feedback_record import as_action_feedback
+
+
+class DeltaEncoder:
+    """
+    按 (step_index, action_index) 跟踪进行中的动作：
+    第一次出现时发送 ActionStarted，之后的 running 反馈只发送输出增量，结束状态发送 ActionFinished。
+    action_index < 0 的反馈（计划、排队、检查点等）包装为 feedback 事件。
+    输入为执行器产出的 FeedbackRecord（动作反馈在这里直接编码，不经过 ActionFeedback）或 ActionFeedback。
+    """
+
+    def __init__(self):
+        self._action_ids = {}
+        self._next_id = 0
+
+    def _start(self, fb):
+        action_id = self._next_id
+        self._next_id += 1
+        self._action_ids[(fb.step_index, fb.action_index)] = action_id
+        return action_id, helper_pb2.FeedbackEvent(started=helper_pb2.ActionStarted(
+            action_id=action_id,
+            step_index=fb.step_index,
+            total_steps=fb.total_steps,
+            action_index=fb.action_index,
+            action_type=fb.action_type,
+            step_description=fb.step_description,
+            command=fb.command,
+        ))
+
+    def encode(self, fb):
+        """返回该反馈对应的事件列表"""
+        if fb.action_index < 0:
+            return [helper_pb2.FeedbackEvent(feedback=as_action_feedback(fb))]
+
+        events = []
+        key = (fb.step_index, fb.action_index)
+        action_id = self._action_ids.get(key)
+        if action_id is None:
+            action_id, started = self._start(fb)
+            events.append(started)
+
+        if fb.status == "running":
+            if fb.output or fb.error:
+                events.append(helper_pb2.FeedbackEvent(chunk=helper_pb2.OutputChunk(
+                    action_id=action_id,
+                    output=fb.output.encode("utf-8"),
+                    error=fb.error.encode("utf-8"),
+                )))
+            return events
+
+        del self._action_ids[key]
+        events.append(helper_pb2.FeedbackEvent(finished=helper_pb2.ActionFinished(
+            action_id=action_id,
+            status=fb.status,
+            exit_code=fb.exit_code,
+            step_description=fb.step_description,
+            output=fb.output.encode("utf-8"),
+            error=fb.error.encode("utf-8"),
+        )))
+        return events
+
+
+def encode_feedback_stream(feedbacks):
+    """反馈流（FeedbackRecord / ActionFeedback）→ FeedbackEvent 流"""
+    encoder = DeltaEncoder()
+    try:
+        for fb in feedbacks:
+            yield from encoder.encode(fb)
+    finally:
+        # 提前结束（客户端断开）时及时关闭上游，释放项目 Agent
+        close = getattr(feedbacks, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,129 @@
+# 反馈合并：同一动作连续的输出反馈合并为一条 ActionFeedback，减少消息数量与重复的元数据
+import time
+import queue
+import threading
+from ai_project_helper.log_config import get_logger
+
+logger = get_logger("server.feedback_batcher")
+
+DEFAULT_WINDOW_MS = 100
+DEFAULT_MAX_CHARS = 16384
+
+_ITEM, _END, _ERROR = range(3)
+
+
+def get_batch_settings(config, run_context=None):
+    """
+    合并参数：请求中的设置优先，其次是配置文件的 feedback 段。
+    返回 (window_seconds, max_chars)，window_seconds 为 0 表示不合并
+    """
+    feedback_config = config.get("feedback", {})
+    window_ms = feedback_config.get("batch_window_ms", DEFAULT_WINDOW_MS)
+    max_chars = feedback_config.get("batch_max_chars", DEFAULT_MAX_CHARS)
+    if run_context is not None:
+        if run_context.batch_window_ms is not None:
+            window_ms = run_context.batch_window_ms
+        if run_context.batch_max_chars is not None:
+            max_chars = run_context.batch_max_chars
+    return max(0, window_ms) / 1000.0, max_chars
+
+
+def _is_output_chunk(fb):
+    return fb.status == "running"
+
+
+def _same_action(a, b):
+    return (a.step_index == b.step_index and a.action_index == b.action_index
+            and a.action_type == b.action_type and a.command == b.command
+            and a.part_index == b.part_index)
+
+
+def _pump(feedbacks, q, stop):
+    """后台线程：驱动上游生成器，把反馈放入有界队列"""
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for fb in feedbacks:
+            if not put((_ITEM, fb)):
+                return
+        put((_END, None))
+    except BaseException as e:
+        put((_ERROR, e))
+    finally:
+        close = getattr(feedbacks, "close", None)
+        if close is not None:
+            close()
+
+
+def batch_feedback(feedbacks, window, max_chars, queue_size=256):
+    """
+    合并同一动作连续的 running 输出块，满足以下任一条件时发送：
+    - 合并的输出/错误长度达到 max_chars；
+    - 第一块到达后经过 window 秒（上游没有新反馈时同样按时发送）；
+    - 状态变化或切换到其他动作（先发送已合并的部分，再原样发送新的反馈）。
+    window 为 0 时直接透传
+    """
+    if window <= 0:
+        yield from feedbacks
+        return
+
+    q = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    pump = threading.Thread(target=_pump, args=(feedbacks, q, stop), name="feedback-batcher", daemon=True)
+    pump.start()
+
+    pending = None
+    deadline = None
+    merged = 0
+    try:
+        while True:
+            timeout = None if pending is None else max(0.0, deadline - time.monotonic())
+            try:
+                kind, item = q.get(timeout=timeout)
+            except queue.Empty:
+                yield pending
+                pending = None
+                continue
+
+            if kind == _END:
+                break
+            if kind == _ERROR:
+                if pending is not None:
+                    yield pending
+                    pending = None
+                raise item
+
+            if pending is not None and _is_output_chunk(item) and _same_action(pending, item):
+                pending.output += item.output
+                pending.error += item.error
+                merged += 1
+                if len(pending.output) + len(pending.error) >= max_chars:
+                    yield pending
+                    pending = None
+                continue
+
+            if pending is not None:
+                yield pending
+                pending = None
+            if _is_output_chunk(item):
+                pending = item
+                deadline = time.monotonic() + window
+            else:
+                yield item
+
+        if pending is not None:
+            yield pending
+            pending = None
+    finally:
+        stop.set()
+        # 等上游停止后再返回，调用方随后会释放 Agent 等资源
+        pump.join()
+        if merged:
+            logger.debug(f"反馈合并：共合并 {merged} 条输出消息")
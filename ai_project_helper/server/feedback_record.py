@@ -0,0 +1,55 @@
+# 执行链路内部的反馈记录：字段与 ActionFeedback 相同的普通对象，只在旧接口输出时才构造 ActionFeedback
+from ai_project_helper.proto import helper_pb2
+
+FEEDBACK_FIELDS = (
+    "action_index", "action_type", "step_description", "status", "output", "error", "command",
+    "step_index", "total_steps", "exit_code", "complete_plan", "part_index", "total_parts",
+)
+
+
+class FeedbackRecord:
+    """
+    执行器产出的动作反馈。增量接口直接从它编码 ActionStarted/OutputChunk/ActionFinished，
+    每条输出不再先构造并序列化一条完整的 ActionFeedback；反馈合并按属性读写，与 ActionFeedback 通用
+    """
+
+    __slots__ = FEEDBACK_FIELDS
+
+    def __init__(self, action_index=0, action_type="", step_description="", status="", output="", error="",
+                 command="", step_index=0, total_steps=0, exit_code=0, complete_plan="", part_index=0,
+                 total_parts=0):
+        self.action_index = action_index
+        self.action_type = action_type
+        self.step_description = step_description
+        self.status = status
+        self.output = output
+        self.error = error
+        self.command = command
+        self.step_index = step_index
+        self.total_steps = total_steps
+        self.exit_code = exit_code
+        self.complete_plan = complete_plan
+        self.part_index = part_index
+        self.total_parts = total_parts
+
+    def to_proto(self):
+        return helper_pb2.ActionFeedback(**{name: getattr(self, name) for name in FEEDBACK_FIELDS})
+
+
+def as_action_feedback(fb):
+    """FeedbackRecord → ActionFeedback；已是 ActionFeedback（计划、排队等反馈）时原样返回"""
+    if isinstance(fb, FeedbackRecord):
+        return fb.to_proto()
+    return fb
+
+
+def action_feedback_stream(feedbacks):
+    """旧接口输出：FeedbackRecord 与 ActionFeedback 混合的流 → ActionFeedback 流"""
+    try:
+        for fb in feedbacks:
+            yield as_action_feedback(fb)
+    finally:
+        # 提前结束（客户端断开）时及时关闭上游，释放项目 Agent
+        close = getattr(feedbacks, "close", None)
+        if close is not None:
+            close()
@@ -1,48 +1,338 @@
-from ai_project_helper.server.utils import split_plan_into_steps
-from ai_project_helper.proto import helper_pb2
+from ai_project_helper.server.utils import split_plan_into_steps, build_step_graph, parse_step_header
+from ai_project_helper.server.llm_plan_geter import PLAN_PART
+from ai_project_helper.server.plan_stream import GeneratedPlan, plan_part_feedback, complete_plan_feedback
+from ai_project_helper.server.step_pipeline import StepPrefetcher
+from ai_project_helper.server.step_scheduler import StepGraphScheduler
+from ai_project_helper.core.run_context import RunContext
+from ai_project_helper.core.cancellation import OperationCancelled, ExecutionTimeout
+from ai_project_helper.server.feedback_record import FeedbackRecord
 from ai_project_helper.log_config import get_logger
 import grpc
+import threading
 
 logger = get_logger("server.llm_plan_exec")
 
-def execute_plan_text(agent, plan_text, context):
-    task_steps = split_plan_into_steps(plan_text)
+def to_action_feedback(fb, step_index, step_count):
+    # 移除所有类型的多余前缀
+    clean_description = fb.get("step_description", "")
+
+    # 移除英文前缀
+    if clean_description.startswith("Step [0/0] - "):
+        clean_description = clean_description.replace("Step [0/0] - ", "", 1)
+
+    # 移除中文前缀
+    if clean_description.startswith("步骤 0/0 - "):
+        clean_description = clean_description.replace("步骤 0/0 - ", "", 1)
+
+    # 转换为反馈记录（旧接口输出时再转为 ActionFeedback，增量接口直接编码）
+    return FeedbackRecord(
+        action_index=fb.get("action_index", 0),
+        action_type=fb.get("action_type", ""),
+        step_description=clean_description,
+        status=fb.get("status", ""),
+        output=fb.get("output", ""),
+        error=fb.get("error", ""),
+        command=fb.get("command", ""),
+        step_index=step_index,      # 添加正确的步骤索引
+        total_steps=step_count,     # 添加正确的总步骤数
+        exit_code=fb.get("exit_code", 0),
+        complete_plan=fb.get("complete_plan", "")
+    )
+
+def _skipped_step_feedback(step_index, step_count):
+    return to_action_feedback({
+        "action_index": -1,
+        "action_type": "checkpoint",
+        "step_description": "步骤已在上次执行中完成，跳过",
+        "status": "skipped",
+    }, step_index, step_count)
+
+def _take_step_snapshot(snapshots, step_no):
+    """步骤开始前为项目目录建立快照；未启用或建立失败时返回 None（只记录日志，不影响执行）"""
+    if snapshots is None:
+        return None
+    try:
+        return snapshots.take(f"step-{step_no}")
+    except OSError as e:
+        logger.warning(f"第{step_no}步快照失败，该步骤失败时无法回滚: {e}")
+        return None
+
+# file_edit 以退出码 2 报告警告（create 时文件已存在、str_replace 未找到匹配），不视为失败，与检查点记录的约定一致
+WARNING_EXIT_CODES = (0, 2)
+
+def _stop_on_nonzero_exit(agent):
+    return bool(agent.config.get("agent", {}).get("stop_on_nonzero_exit", False))
+
+def _step_failed(fb, stop_on_nonzero_exit=False):
+    """
+    动作反馈是否表示步骤失败。failed 状态（动作抛出的异常）总是失败；动作自行捕获的错误以 success 状态和
+    非零退出码报告（如 shell 命令失败、补丁无法应用），只有开启 agent.stop_on_nonzero_exit 时才视为失败，
+    退出码 2（警告）除外。默认与原行为一致：非零退出码之后继续执行
+    """
+    status = fb.get("status")
+    if status == "failed":
+        return True
+    return stop_on_nonzero_exit and status in ("success", "timeout") \
+        and fb.get("exit_code", 0) not in WARNING_EXIT_CODES
+
+def _abort_step(context, fb, step_no, step_count):
+    """步骤失败后停止执行：动作未以 failed 状态结束时补发一条 failed 反馈，并设置 gRPC 状态告知客户端"""
+    if fb.get("status") != "failed":
+        yield to_action_feedback({
+            "action_index": fb.get("action_index", 0),
+            "action_type": fb.get("action_type", ""),
+            "step_description": f"动作退出码 {fb.get('exit_code', 0)}，停止执行",
+            "status": "failed",
+            "error": fb.get("error", ""),
+            "exit_code": fb.get("exit_code", 1),
+        }, step_no, step_count)
+    context.set_code(grpc.StatusCode.ABORTED)
+    context.set_details(f"第{step_no}步执行失败，已停止执行")
+
+def _rollback_step(snapshots, snapshot, journal, step_no, step_text, step_count):
+    """步骤失败：项目目录回滚到步骤开始前的快照，并清除该步骤的检查点记录，续跑时整步重新执行"""
+    if snapshot is None:
+        return
+    try:
+        counts = snapshots.restore(snapshot)
+    except OSError as e:
+        logger.error(f"第{step_no}步回滚失败: {e}")
+        return
+    if journal is not None:
+        journal.reset_step(step_no, step_text)
+    yield to_action_feedback({
+        "action_index": -1,
+        "action_type": "snapshot",
+        "step_description": "步骤失败，项目目录已回滚到步骤开始前的状态",
+        "status": "rolled_back",
+        "output": f"恢复 {counts['restored']} 项，删除 {counts['removed']} 项，未变化 {counts['unchanged']} 项\n",
+    }, step_no, step_count)
+
+def execute_plan_text(agent, plan_text, context, run_context=None, journal=None, snapshots=None):
+    """snapshots 为项目目录的 WorkspaceSnapshots（未启用时为 None），顺序执行时每步开始前建立快照、失败时回滚"""
+    run_context = run_context or RunContext()
+    try:
+        # 步骤首行可用 `depends: 2,3` 声明依赖；未声明时 graph 为 None，按顺序执行
+        task_steps, graph = build_step_graph(split_plan_into_steps(plan_text))
+    except ValueError as e:
+        logger.error(f"计划依赖解析失败: {e}")
+        context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+        context.set_details(f"计划依赖解析失败: {e}")
+        return
     step_count = len(task_steps)
 
+    # 检查点：全新执行时清空；续跑时整体跳过已完成且文本未变的步骤
+    done_steps = set()
+    if journal is not None:
+        if run_context.resume:
+            done_steps = {
+                i for i, text in enumerate(task_steps) if journal.is_step_done(i + 1, text)
+            }
+            logger.info(f"断点续跑：跳过已完成的步骤 {sorted(i + 1 for i in done_steps)}")
+        else:
+            journal.reset(plan_text)
+
+    timer = _start_plan_timer(agent, run_context)
+    try:
+        if graph is not None:
+            yield from _execute_step_graph(agent, task_steps, graph, context, run_context, journal, done_steps)
+            return
+
+        # 预取后续步骤的动作翻译，与当前步骤的执行重叠
+        prefetch_depth = agent.config.get("agent", {}).get("prefetch_steps", 2)
+        prefetcher = StepPrefetcher(
+            agent, task_steps, depth=prefetch_depth, run_context=run_context, skip_steps=done_steps
+        )
+        try:
+            yield from _execute_steps(
+                agent, task_steps, prefetcher, context, run_context, journal, done_steps, snapshots
+            )
+        finally:
+            prefetcher.close()
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+def _start_plan_timer(agent, run_context):
+    """计划整体时限：到时通过取消信号终止正在执行的动作，并停止后续步骤"""
+    timeout = run_context.plan_timeout_seconds
+    if timeout is None:
+        timeout = agent.config.get("agent", {}).get("plan_timeout_seconds", 0)
+    if not timeout or timeout <= 0:
+        return None
+    timer = threading.Timer(
+        timeout, run_context.cancel_token.cancel,
+        kwargs={"reason": f"计划执行超过 {timeout} 秒", "error": ExecutionTimeout}
+    )
+    timer.daemon = True
+    timer.start()
+    return timer
+
+def _cancelled(context, e):
+    if isinstance(e, ExecutionTimeout):
+        logger.warning(f"计划执行超时: {e}")
+        context.set_code(grpc.StatusCode.DEADLINE_EXCEEDED)
+        context.set_details(f"执行超时: {e}")
+        return
+    logger.info(f"计划执行已取消: {e}")
+    context.set_code(grpc.StatusCode.CANCELLED)
+    context.set_details(f"执行已取消: {e}")
+
+def _execute_steps(agent, task_steps, prefetcher, context, run_context, journal, done_steps, snapshots=None):
+    step_count = len(task_steps)
+    stop_on_nonzero_exit = _stop_on_nonzero_exit(agent)
     for step_index, step_text in enumerate(task_steps):
+        step_no = step_index + 1
+        if step_index in done_steps:
+            yield _skipped_step_feedback(step_no, step_count)
+            continue
+
+        snapshot = None
         try:
-            for fb in agent.run_step_text(step_text, step_index + 1, step_count):
-                # 移除所有类型的多余前缀
-                clean_description = fb.get("step_description", "")
-                
-                # 移除英文前缀
-                if clean_description.startswith("Step [0/0] - "):
-                    clean_description = clean_description.replace("Step [0/0] - ", "", 1)
-                
-                # 移除中文前缀
-                if clean_description.startswith("步骤 0/0 - "):
-                    clean_description = clean_description.replace("步骤 0/0 - ", "", 1)
-                
-                # 转换为 ActionFeedback 对象
-                yield helper_pb2.ActionFeedback(
-                    action_index=fb.get("action_index", 0),
-                    action_type=fb.get("action_type", ""),
-                    step_description=clean_description,
-                    status=fb.get("status", ""),
-                    output=fb.get("output", ""),
-                    error=fb.get("error", ""),
-                    command=fb.get("command", ""),
-                    step_index=step_index + 1,  # 添加正确的步骤索引
-                    total_steps=step_count,     # 添加正确的总步骤数
-                    exit_code=fb.get("exit_code", 0),
-                    complete_plan=fb.get("complete_plan", "")
-                )
-                
-                if fb.get("status") == "failed":
+            run_context.cancel_token.raise_if_cancelled()
+            snapshot = _take_step_snapshot(snapshots, step_no)
+            actions = prefetcher.get(step_index)
+            if journal is not None:
+                actions = journal.track_step(step_no, step_text, actions)
+            for fb in agent.run_prepared_step(actions, step_no, step_count, run_context):
+                if journal is not None:
+                    journal.observe(step_no, step_text, fb)
+                yield to_action_feedback(fb, step_no, step_count)
+
+                if _step_failed(fb, stop_on_nonzero_exit):
+                    yield from _rollback_step(snapshots, snapshot, journal, step_no, step_text, step_count)
+                    yield from _abort_step(context, fb, step_no, step_count)
                     return
-                    
+            if journal is not None:
+                journal.finish_step(step_no, step_text)
+
+        except OperationCancelled as e:
+            _cancelled(context, e)
+            return
         except Exception as e:
-            logger.exception(f"执行第{step_index+1}步失败: {e}")
+            logger.exception(f"执行第{step_no}步失败: {e}")
+            yield from _rollback_step(snapshots, snapshot, journal, step_no, step_text, step_count)
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details(f"执行失败: {e}")
-            return
\ No newline at end of file
+            return
+
+def _execute_step_graph(agent, task_steps, graph, context, run_context, journal, done_steps):
+    # 并发的步骤共享项目目录，回滚一个步骤会覆盖其他步骤的修改，因此不做快照回滚
+    step_count = len(task_steps)
+    for step_index in sorted(done_steps):
+        yield _skipped_step_feedback(step_index + 1, step_count)
+
+    max_parallel = agent.config.get("agent", {}).get("max_parallel_steps", 4)
+    logger.info(f"按步骤依赖图执行计划，共{step_count}步，最大并发{max_parallel}")
+    scheduler = StepGraphScheduler(
+        agent, task_steps, graph, run_context=run_context, journal=journal,
+        done_steps=done_steps, max_parallel=max_parallel
+    )
+    try:
+        for step_no, fb in scheduler.run():
+            yield to_action_feedback(fb, step_no, step_count)
+    except OperationCancelled as e:
+        _cancelled(context, e)
+    except Exception as e:
+        logger.exception(f"按依赖图执行计划失败: {e}")
+        context.set_code(grpc.StatusCode.INTERNAL)
+        context.set_details(f"执行失败: {e}")
+
+def execute_plan_while_generating(agent, pump, recorder, context, run_context=None, journal=None, snapshots=None):
+    """
+    边生成边执行（plan_generation.execute_early）：计划各部分的事件随到随转发，
+    已完整的步骤（其后已出现分隔行，或计划已全部生成）逐个执行，不必等待整个计划生成完毕。
+    步骤按依赖就绪顺序串行执行：未声明依赖的步骤依赖前一步，声明了依赖的步骤等到所依赖的步骤都执行完毕；
+    计划生成完毕后仍有无法执行的步骤（依赖无效或循环）时按依赖解析失败处理。
+    步骤逐个执行，因此与 execute_plan_text 的顺序执行相同，每步开始前建立快照、失败时回滚。
+    """
+    run_context = run_context or RunContext()
+    stop_on_nonzero_exit = _stop_on_nonzero_exit(agent)
+    plan = GeneratedPlan()
+    executed = set()
+    completed = False
+    step = None  # 正在执行的 (step_no, step_text, step_count, snapshot)
+    if journal is not None:
+        journal.reset("")
+
+    def forward_events(block=False):
+        nonlocal completed
+        for kind, part_index, total_parts, text in pump.drain(block):
+            if kind == PLAN_PART:
+                plan.add(part_index, total_parts, text)
+            yield plan_part_feedback(kind, part_index, total_parts, text)
+        if pump.finished and not completed:
+            completed = True
+            plan_text = plan.text()
+            recorder.save_complete(plan_text)
+            if journal is not None:
+                journal.set_plan(plan_text)
+            yield complete_plan_feedback(plan_text)
+
+    timer = _start_plan_timer(agent, run_context)
+    try:
+        while True:
+            run_context.cancel_token.raise_if_cancelled()
+            yield from forward_events()
+            steps = plan.ready_steps()
+            step_index = _next_ready_step(steps, executed)
+            if step_index is None:
+                if not pump.finished:
+                    yield from forward_events(block=True)
+                    continue
+                if len(executed) < len(steps):
+                    pending = sorted(i + 1 for i in range(len(steps)) if i not in executed)
+                    logger.error(f"计划依赖解析失败: 步骤 {pending} 的依赖无法满足")
+                    context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                    context.set_details(f"计划依赖解析失败: 步骤 {pending} 的依赖无效或存在循环")
+                return
+
+            # 总步骤数在计划生成完毕前未知，以 0 表示
+            step_no = step_index + 1
+            step_count = len(steps) if pump.finished else 0
+            step_text, _ = parse_step_header(steps[step_index])
+            step = (step_no, step_text, step_count, _take_step_snapshot(snapshots, step_no))
+            actions = agent.prepare_step(step_text, step_no, step_count, run_context)
+            if journal is not None:
+                actions = journal.track_step(step_no, step_text, actions)
+            for fb in agent.run_prepared_step(actions, step_no, step_count, run_context):
+                if journal is not None:
+                    journal.observe(step_no, step_text, fb)
+                yield to_action_feedback(fb, step_no, step_count)
+                if _step_failed(fb, stop_on_nonzero_exit):
+                    yield from _rollback_step(snapshots, step[3], journal, step_no, step_text, step_count)
+                    yield from _abort_step(context, fb, step_no, step_count)
+                    return
+                yield from forward_events()
+            if journal is not None:
+                journal.finish_step(step_no, step_text)
+            executed.add(step_index)
+            step = None
+
+    except OperationCancelled as e:
+        _cancelled(context, e)
+    except Exception as e:
+        logger.exception(f"边生成边执行计划失败: {e}")
+        if step is not None:
+            step_no, step_text, step_count, snapshot = step
+            yield from _rollback_step(snapshots, snapshot, journal, step_no, step_text, step_count)
+        context.set_code(grpc.StatusCode.INTERNAL)
+        context.set_details(f"执行失败: {e}")
+    finally:
+        pump.close()
+        if timer is not None:
+            timer.cancel()
+
+def _next_ready_step(steps, executed):
+    """返回下标最小的、依赖都已执行完毕的未执行步骤"""
+    for i, step_text in enumerate(steps):
+        if i in executed:
+            continue
+        _, deps = parse_step_header(step_text)
+        if deps is None:
+            required = {i - 1} if i > 0 else set()
+        else:
+            required = {n - 1 for n in deps}
+        if required <= executed:
+            return i
+    return None
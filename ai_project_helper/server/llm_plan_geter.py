@@ -1,78 +1,295 @@
-import os
 import re
-import requests
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from ai_project_helper.log_config import get_logger
+from ai_project_helper.core.llm_transport import get_transport
+from ai_project_helper.core.llm import iter_sse_content
+from ai_project_helper.server.artifact_store import get_artifact_writer
 import html  # 添加导入
 
 logger = get_logger("server.llm_plan")
 
-def get_plan_from_llm(requirement, model, llm_url, api_key, project_id):
-    plans_dir = "llm_coding_plans"
-    os.makedirs(plans_dir, exist_ok=True)
-    
+PART_HEADER_PATTERN = re.compile(r'^\s*\[(\d+)/(\d+)\]\s*(.*)$')
+
+# iter_plan_events 产出的事件类型
+PLAN_PART = "part"    # 某部分生成完毕
+PLAN_DELTA = "delta"  # 某部分生成中的增量文本（仅 stream_tokens 开启时）
+
+_CANCELLED = object()  # 并发生成时投递到事件队列的取消通知
+
+def get_plan_from_llm(requirement, model, llm_url, api_key, project_id, plan_config=None):
+    """生成完整计划文本（各部分按顺序合并），并保存到 llm_coding_plans"""
+    recorder = PlanRecorder(project_id)
+    parts = [text for _, _, text in iter_plan_parts(
+        requirement, model, llm_url, api_key, recorder, plan_config
+    )]
+    complete_plan_text = join_plan_parts(parts)
+    recorder.save_complete(complete_plan_text)
+    return complete_plan_text
+
+def iter_plan_parts(requirement, model, llm_url, api_key, recorder, plan_config=None):
+    """按顺序产出 (part_index, total_parts, part_text)"""
+    ready = {}
+    next_part = 1
+    for kind, part_index, total_parts, text in iter_plan_events(
+        requirement, model, llm_url, api_key, recorder, plan_config
+    ):
+        if kind != PLAN_PART:
+            continue
+        ready[part_index] = (total_parts, text)
+        while next_part in ready:
+            total_parts, text = ready.pop(next_part)
+            yield next_part, total_parts, text
+            next_part += 1
+
+def iter_plan_events(requirement, model, llm_url, api_key, recorder, plan_config=None, cancel_token=None):
+    """
+    产出 (事件类型, part_index, total_parts, text)，部分生成完毕即产出 PLAN_PART（outline 模式下可能乱序）。
+    - sequential 模式（默认）：逐部分请求，每次附带已生成的全部内容，各部分前后一致；
+    - outline 模式：先请求大纲，再按大纲并发生成各部分，每个请求只附带大纲而不是全部历史，
+      各部分互相看不到对方的内容；大纲无法解析或只有一个部分时按 sequential 生成；
+    - stream_tokens 开启时以流式请求 LLM，并产出 PLAN_DELTA 增量；
+    - cancel_token（CancelToken）取消后在下一个部分开始前、流式增量之间抛出 OperationCancelled，
+      不再发起新的 LLM 请求（已发出的非流式请求无法中断，等其返回后停止）
+    """
+    plan_config = plan_config or {}
+    stream_tokens = plan_config.get("stream_tokens", False)
+    if plan_config.get("mode", "sequential") == "outline":
+        outline = _request_outline(requirement, model, llm_url, api_key, recorder, cancel_token)
+        if outline and len(outline) > 1:
+            yield from _generate_parts_parallel(
+                requirement, outline, model, llm_url, api_key, recorder,
+                plan_config.get("max_parallel_parts", 4), stream_tokens, cancel_token
+            )
+            return
+        if outline:
+            logger.info("计划大纲只有一个部分，按单部分生成")
+        else:
+            logger.warning("计划大纲解析失败，回退到逐部分顺序生成")
+    yield from _generate_parts_sequential(
+        requirement, model, llm_url, api_key, recorder, stream_tokens, cancel_token
+    )
+
+def join_plan_parts(parts):
+    """合并各部分，部分之间以空行分隔"""
     complete_plan_text = ""
-    accumulated_parts = ""
+    for plan_text in parts:
+        if complete_plan_text and not complete_plan_text.endswith('\n\n') and not plan_text.startswith('\n\n'):
+            complete_plan_text += "\n\n"
+        complete_plan_text += plan_text
+    return complete_plan_text
+
+class PlanRecorder:
+    """
+    记录每次请求、大纲、各部分与完整计划（条目名沿用旧文件名中的 request-Part-i-of-N 等），
+    由后台 ArtifactWriter 写入内容寻址存储，不阻塞生成计划的线程。
+    请求以片段列表提交：需求与各历史部分是独立片段，只存储一次。
+    """
+
+    def __init__(self, project_id, writer=None):
+        self.project_id = project_id
+        self.writer = writer or get_artifact_writer()
+        self.run_name = self.writer.new_run_name(project_id, datetime.now().strftime("%Y%m%d%H%M%S"))
+
+    def _write(self, name, segments):
+        self.writer.submit(self.run_name, self.project_id, name, segments)
+
+    def save_request(self, current, total, prompt_segments):
+        self._write(f"request-Part-{current}-of-{total}", prompt_segments)
+
+    def save_part(self, current, total, plan_text):
+        self._write(f"plan-Part-{current}-of-{total}", [plan_text])
+
+    def save_outline(self, prompt_segments, outline_text):
+        self._write("request-outline", prompt_segments)
+        self._write("outline", [outline_text])
+
+    def save_complete(self, complete_plan_text):
+        self._write("complete", [complete_plan_text])
+
+def _chat(llm_url, model, api_key, prompt):
+    data = get_transport().post_json(llm_url, _chat_payload(model, prompt), api_key)
+    return html.unescape(data["choices"][0]["message"]["content"])  # 添加反转义处理
+
+def _chat_payload(model, prompt):
+    return {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": 2048000,
+        "temperature": 0,
+    }
+
+def _check_cancelled(cancel_token):
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+
+def _iter_chat(llm_url, model, api_key, prompt, stream_tokens, cancel_token=None):
+    """stream_tokens 时以 SSE 请求并逐段产出增量文本；返回反转义后的完整回复。取消后在增量之间停止并关闭响应"""
+    _check_cancelled(cancel_token)
+    if not stream_tokens:
+        return _chat(llm_url, model, api_key, prompt)
+
+    payload = _chat_payload(model, prompt)
+    payload["stream"] = True
+    pieces = []
+    with get_transport().stream(llm_url, payload, api_key) as response:
+        for delta in iter_sse_content(response):
+            _check_cancelled(cancel_token)
+            pieces.append(delta)
+            yield delta
+    return html.unescape("".join(pieces))
+
+def _tag_deltas(chat, part_index, total_parts):
+    """把 _iter_chat 的增量包装为 PLAN_DELTA 事件，并返回完整回复"""
+    while True:
+        try:
+            delta = next(chat)
+        except StopIteration as stop:
+            return stop.value
+        yield PLAN_DELTA, part_index, total_parts, delta
+
+def _strip_part_header(plan_text):
+    """去掉回复首行的 [i/N] 标记，返回 (total_parts 或 None, 正文)"""
+    first_line, _, rest = plan_text.partition('\n')
+    match = PART_HEADER_PATTERN.match(first_line)
+    if not match:
+        return None, plan_text
+    return int(match.group(2)), rest.lstrip()
+
+def _generate_parts_sequential(requirement, model, llm_url, api_key, recorder, stream_tokens=False,
+                               cancel_token=None):
+    parts = []
     current_part, total_parts = 0, 1
-    request_timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    
+
     while current_part < total_parts:
         current_part += 1
-        prompt = _build_prompt(requirement, accumulated_parts, current_part, total_parts)
-        
-        # 保存请求内容
-        request_path = os.path.join(plans_dir, f"{project_id}-request-Part-{current_part}-of-{total_parts}-{request_timestamp}.txt")
-        with open(request_path, "w", encoding="utf-8") as f:
-            f.write(prompt)
-        
+        segments = _build_prompt(requirement, parts, current_part, total_parts)
+        recorder.save_request(current_part, total_parts, segments)
+        prompt = "".join(segments)
+
         logger.info(f"请求LLM第{current_part}/{total_parts}部分")
-        response = requests.post(
-            llm_url,
-            json={
-                "model": model,
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": 2048000,
-                "temperature": 0,
-            },
-            headers={"Authorization": f"Bearer {api_key}"}
+        plan_text = yield from _tag_deltas(
+            _iter_chat(llm_url, model, api_key, prompt, stream_tokens, cancel_token), current_part, total_parts
         )
-        response.raise_for_status()
-        plan_text = response.json()["choices"][0]["message"]["content"]
-        plan_text = html.unescape(plan_text)  # 添加反转义处理
-        
+
         # 处理多部分响应
         if current_part == 1:
-            match = re.match(r'\[(\d+)/(\d+)\]', plan_text.split('\n', 1)[0].strip())
-            if match:
-                total_parts = int(match.group(2))
-                plan_text = plan_text.split('\n', 1)[1].lstrip()
-        
-        # 保存计划部分
-        part_path = os.path.join(plans_dir, f"{project_id}-plan-Part-{current_part}-of-{total_parts}-{request_timestamp}.txt")
-        with open(part_path, "w", encoding="utf-8") as f:
-            f.write(plan_text)
-        
-        accumulated_parts += plan_text + "\n\n"
-        
-        # 合并完整计划
-        if complete_plan_text and not complete_plan_text.endswith('\n\n') and not plan_text.startswith('\n\n'):
-            complete_plan_text += "\n\n"
-        complete_plan_text += plan_text
-    
-    # 保存完整计划
-    final_path = os.path.join(plans_dir, f"{project_id}-complete-{request_timestamp}.txt")
-    with open(final_path, "w", encoding="utf-8") as f:
-        f.write(complete_plan_text)
-    
-    return complete_plan_text
+            declared_total, body = _strip_part_header(plan_text)
+            if declared_total is not None:
+                total_parts, plan_text = declared_total, body
 
-def _build_prompt(requirement, history, current, total):
+        recorder.save_part(current_part, total_parts, plan_text)
+        parts.append(plan_text)
+        yield PLAN_PART, current_part, total_parts, plan_text
+
+def _request_outline(requirement, model, llm_url, api_key, recorder, cancel_token=None):
+    """请求计划大纲，返回各部分的概要列表；无法解析时返回 None"""
+    segments = _build_outline_prompt(requirement)
+    logger.info("请求LLM计划大纲")
+    _check_cancelled(cancel_token)
+    outline_text = _chat(llm_url, model, api_key, "".join(segments))
+    recorder.save_outline(segments, outline_text)
+
+    entries = {}
+    total_parts = None
+    for line in outline_text.splitlines():
+        match = PART_HEADER_PATTERN.match(line)
+        if not match:
+            continue
+        index, total = int(match.group(1)), int(match.group(2))
+        if total_parts is None:
+            total_parts = total
+        if total != total_parts or not 1 <= index <= total:
+            return None
+        entries[index] = match.group(3).strip()
+    if not total_parts or len(entries) != total_parts:
+        return None
+    return [entries[i] for i in range(1, total_parts + 1)]
+
+def _generate_parts_parallel(requirement, outline, model, llm_url, api_key, recorder, max_parallel,
+                            stream_tokens=False, cancel_token=None):
+    total_parts = len(outline)
+    outline_text = "\n".join(f"[{i}/{total_parts}] {summary}" for i, summary in enumerate(outline, 1))
+    logger.info(f"计划大纲共{total_parts}部分，并发生成（并发上限 {max_parallel}）")
+
+    # 各部分的事件经队列汇总到调用方线程；停止后工作线程不再发起新请求、不再投递事件
+    events = queue.Queue()
+    stopped = threading.Event()
+
+    def generate(current_part):
+        if stopped.is_set() or (cancel_token is not None and cancel_token.cancelled):
+            return
+        try:
+            segments = _build_part_prompt(requirement, outline_text, current_part, total_parts)
+            recorder.save_request(current_part, total_parts, segments)
+            logger.info(f"请求LLM第{current_part}/{total_parts}部分")
+            chat = _iter_chat(llm_url, model, api_key, "".join(segments), stream_tokens, cancel_token)
+            while True:
+                try:
+                    delta = next(chat)
+                except StopIteration as stop:
+                    reply = stop.value
+                    break
+                if stopped.is_set():
+                    chat.close()
+                    return
+                events.put((PLAN_DELTA, current_part, total_parts, delta))
+            _, plan_text = _strip_part_header(reply)
+            recorder.save_part(current_part, total_parts, plan_text)
+            events.put((PLAN_PART, current_part, total_parts, plan_text))
+        except Exception as e:
+            events.put(e)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, int(max_parallel)), thread_name_prefix="plan-part")
+    futures = [executor.submit(generate, i) for i in range(1, total_parts + 1)]
+    # 取消时唤醒等待事件的调用方线程
+    cancel_handle = cancel_token.add_callback(lambda: events.put(_CANCELLED)) if cancel_token is not None else None
+    try:
+        remaining = total_parts
+        while remaining:
+            event = events.get()
+            if event is _CANCELLED:
+                cancel_token.raise_if_cancelled()
+            if isinstance(event, Exception):
+                raise event
+            if event[0] == PLAN_PART:
+                remaining -= 1
+            yield event
+    finally:
+        # 调用方提前结束或某部分失败时，不再发起尚未开始的请求
+        stopped.set()
+        if cancel_token is not None:
+            cancel_token.remove_callback(cancel_handle)
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+# 以下各函数返回提示词片段列表，拼接后即为完整提示词；需求、历史部分、大纲各为独立片段，便于记录去重
+
+def _build_prompt(requirement, parts, current, total):
     if current == 1:
-        return requirement
-    return (
-        f"{requirement}\n"
-        f"--- 已经输出过的历史记录一共{current - 1}部分，记录如下 ---\n"
-        f"{history}\n"
-        f"--- 历史记录结束 ---\n"
-        f"现在开始继续输出下一个部分（第{current}/{total}部分）"
-    )
\ No newline at end of file
+        return [requirement]
+    segments = [requirement, f"\n--- 已经输出过的历史记录一共{current - 1}部分，记录如下 ---\n"]
+    for part in parts:
+        segments += [part, "\n\n"]
+    segments.append(f"\n--- 历史记录结束 ---\n现在开始继续输出下一个部分（第{current}/{total}部分）")
+    return segments
+
+def _build_outline_prompt(requirement):
+    return [
+        requirement,
+        f"\n--- 输出要求 ---\n"
+        f"先不要输出计划正文，只输出计划的大纲：计划分为N个部分，每个部分一行，"
+        f"格式为 [i/N] 该部分包含的步骤与要点，不要输出其他内容"
+    ]
+
+def _build_part_prompt(requirement, outline_text, current, total):
+    return [
+        requirement,
+        f"\n--- 计划大纲，一共{total}部分 ---\n",
+        outline_text,
+        f"\n--- 大纲结束 ---\n"
+        f"现在只输出第{current}/{total}部分的完整内容，与大纲中该部分对应，不要输出其他部分"
+    ]
@@ -0,0 +1,136 @@
+# 计划生成的流式反馈：把各部分的生成事件转为 llm_plan_part 反馈，并在生成过程中给出已完整的步骤
+import re
+import queue
+import threading
+from ai_project_helper.proto import helper_pb2
+from ai_project_helper.server.llm_plan_geter import PLAN_DELTA, join_plan_parts
+from ai_project_helper.server.utils import split_plan_into_steps
+from ai_project_helper.log_config import get_logger
+
+logger = get_logger("server.plan_stream")
+
+STEP_DELIMITER_LINE = re.compile(r'^\s*------')
+EVENT_QUEUE_SIZE = 1024
+
+
+def plan_part_feedback(kind, part_index, total_parts, text):
+    """生成中的增量为 running，部分生成完毕为 success；output 为增量文本或该部分全文"""
+    if kind == PLAN_DELTA:
+        description = f"正在生成计划第{part_index}/{total_parts}部分"
+        status = "running"
+    else:
+        description = f"计划第{part_index}/{total_parts}部分生成完毕"
+        status = "success"
+    return helper_pb2.ActionFeedback(
+        action_index=-1,
+        action_type="llm_plan_part",
+        step_description=description,
+        status=status,
+        output=text,
+        part_index=part_index,
+        total_parts=total_parts
+    )
+
+
+def complete_plan_feedback(plan_text):
+    return helper_pb2.ActionFeedback(
+        action_index=-1,
+        action_type="llm_plan",
+        step_description="完整计划生成完毕",
+        status="success",
+        complete_plan=plan_text
+    )
+
+
+class GeneratedPlan:
+    """收集（可能乱序到达的）各部分，只有从第1部分开始连续到达的前缀才参与步骤切分"""
+
+    def __init__(self):
+        self.parts = {}
+        self.total_parts = None
+
+    def add(self, part_index, total_parts, text):
+        self.parts[part_index] = text
+        self.total_parts = total_parts
+
+    @property
+    def complete(self):
+        return self.total_parts is not None and len(self.parts) >= self.total_parts
+
+    def prefix_text(self):
+        prefix = []
+        while len(prefix) + 1 in self.parts:
+            prefix.append(self.parts[len(prefix) + 1])
+        return join_plan_parts(prefix)
+
+    def text(self):
+        return join_plan_parts(self.parts[i] for i in sorted(self.parts))
+
+    def ready_steps(self):
+        """
+        已完整的步骤：计划已全部生成时为全部步骤；
+        否则最后一段只有在其后已出现 ------ 分隔行时才算完整（后续部分可能还会续写它）
+        """
+        prefix = self.prefix_text()
+        steps = split_plan_into_steps(prefix)
+        if self.complete or not steps:
+            return steps
+        lines = prefix.rstrip().splitlines()
+        if lines and STEP_DELIMITER_LINE.match(lines[-1]):
+            return steps
+        return steps[:-1]
+
+
+class PlanEventPump:
+    """
+    在后台线程中迭代计划生成事件（iter_plan_events），调用方在执行步骤的间隙取出已到达的事件。
+    close() 后生成线程在当前请求结束时停止，不再发起新的 LLM 请求。
+    """
+
+    def __init__(self, events):
+        self._events = events
+        self._queue = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._stopped = threading.Event()
+        self.finished = False
+        self._thread = threading.Thread(target=self._run, name="plan-events", daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            for event in self._events:
+                if not self._put(("event", event)):
+                    return
+            self._put(("end", None))
+        except BaseException as e:
+            self._put(("error", e))
+        finally:
+            self._events.close()
+
+    def drain(self, block=False):
+        """取出已到达的事件；block=True 时至少等待一个事件（生成已结束时立即返回）"""
+        events = []
+        while not self.finished:
+            try:
+                kind, payload = self._queue.get(block=block and not events)
+            except queue.Empty:
+                break
+            if kind == "end":
+                self.finished = True
+            elif kind == "error":
+                self.finished = True
+                raise payload
+            else:
+                events.append(payload)
+        return events
+
+    def close(self):
+        self._stopped.set()
@@ -1,10 +1,22 @@
 import grpc
 import os
 from ai_project_helper.proto import helper_pb2, helper_pb2_grpc
-from ai_project_helper.core.agent import Agent
+from ai_project_helper.core.llm_transport import get_transport
+from ai_project_helper.core.run_context import RunContext
+from ai_project_helper.core.cancellation import OperationCancelled
 from ai_project_helper.server.utils import split_plan_into_steps
-from ai_project_helper.server.llm_plan_geter import get_plan_from_llm
-from ai_project_helper.server.llm_plan_executer import execute_plan_text
+from ai_project_helper.server.llm_plan_geter import PLAN_PART, PlanRecorder, iter_plan_events
+from ai_project_helper.server.llm_plan_executer import execute_plan_text, execute_plan_while_generating
+from ai_project_helper.server.plan_stream import (
+    GeneratedPlan, PlanEventPump, plan_part_feedback, complete_plan_feedback
+)
+from ai_project_helper.server.checkpoint import ExecutionJournal, get_journal_path
+from ai_project_helper.server.workspace_snapshot import get_workspace_snapshots
+from ai_project_helper.server.agent_pool import AgentPool
+from ai_project_helper.server.artifact_store import get_artifact_writer
+from ai_project_helper.server.delta_feedback import encode_feedback_stream
+from ai_project_helper.server.feedback_record import action_feedback_stream
+from ai_project_helper.server.feedback_batcher import batch_feedback, get_batch_settings
 from ai_project_helper.log_config import get_logger
 
 logger = get_logger("server.service")
@@ -13,45 +25,107 @@ class AIProjectHelperServicer(helper_pb2_grpc.AIProjectHelperServicer):
     def __init__(self, config):
         self.config = config
         self.base_working_dir = config['working_dir']
-        self.agent = None
+        # 服务端状态（检查点等）存放目录，位于各项目目录之外
+        self.state_dir = config.get('state_dir') or os.path.join(self.base_working_dir, ".ai_project_helper")
         self.logger = logger
+        # 所有 RPC 共享同一个 LLM 连接池
+        self.transport = get_transport(config)
+        # 计划生成记录由后台线程写入，所有 RPC 共享
+        self.artifacts = get_artifact_writer(config)
+        # 按项目复用 Agent；每个 RPC 通过 lease 独占取得，不再共享可变的 self.agent
+        self.agents = AgentPool(
+            config, self.base_working_dir,
+            max_idle=config.get("server", {}).get("max_idle_agents", 32)
+        )
 
-    def _get_project_working_dir(self, project_id):
-        project_dir = os.path.join(self.base_working_dir, project_id)
-        os.makedirs(project_dir, exist_ok=True)
-        self.logger.info(f"使用项目目录: {project_dir}")
-        return project_dir
+    def _get_journal(self, project_id):
+        return ExecutionJournal(get_journal_path(self.state_dir, project_id))
 
-    def _init_agent_with_project_dir(self, project_id):
-        project_dir = self._get_project_working_dir(project_id)
-        config = self.config.copy()
-        config['working_dir'] = project_dir
-        self.agent = Agent(config)
-        return self.agent
+    @staticmethod
+    def _bind_cancel(context, run_context):
+        """客户端断开或超过截止时间时 RPC 结束：停止后续 LLM 调用（包括计划生成）并终止正在运行的子进程"""
+        cancel = lambda: run_context.cancel_token.cancel("RPC 已结束（客户端断开或超时）")
+        if not context.add_callback(cancel):
+            cancel()
+
+    def _execute_for_project(self, project_id, request, context, execute, run_context=None):
+        """
+        在项目的运行锁内执行计划；同一项目已有运行中的计划时先通知客户端排队。
+        execute(agent, run_context, journal, snapshots) 返回反馈迭代器；
+        run_context 为 None 时按请求新建（计划生成与执行共用时由调用方传入，已绑定取消）
+        """
+        if self.agents.is_busy(project_id):
+            self.logger.info(f"项目 {project_id} 已有运行中的计划，排队等待")
+            yield helper_pb2.ActionFeedback(
+                action_index=-1,
+                action_type="queue",
+                step_description="同一项目已有计划在执行，排队等待中",
+                status="queued"
+            )
+        if run_context is None:
+            run_context = RunContext.from_request(request)
+            self._bind_cancel(context, run_context)
+        try:
+            lease = self.agents.lease(project_id, is_active=context.is_active, cancel_token=run_context.cancel_token)
+            with lease as agent:
+                journal = self._get_journal(project_id)
+                snapshots = get_workspace_snapshots(self.config, self.state_dir, project_id, agent.config["working_dir"])
+                window, max_chars = get_batch_settings(self.config, run_context)
+                yield from batch_feedback(execute(agent, run_context, journal, snapshots), window, max_chars)
+        except OperationCancelled as e:
+            # 排队等待运行锁期间被取消（执行中的取消由执行链路处理，不会到达这里）
+            self.logger.info(f"项目 {project_id} 排队期间请求已取消: {e}")
+            yield helper_pb2.ActionFeedback(
+                action_index=-1,
+                action_type="queue",
+                step_description="排队期间请求已取消，计划未执行",
+                status="cancelled"
+            )
+            context.set_code(grpc.StatusCode.CANCELLED)
+            context.set_details(str(e))
+
+    def _plan_events(self, request, recorder, cancel_token=None):
+        model = request.model or self.config['llm']['model']
+        llm_url = request.llm_url or self.config['llm']['api_url']
+        api_key = self.config['llm']['api_key']
+        return iter_plan_events(
+            request.requirement, model, llm_url, api_key, recorder,
+            self.config.get("plan_generation", {}), cancel_token
+        )
+
+    def _stream_plan(self, request, cancel_token=None):
+        """
+        生成计划，每部分（及 stream_tokens 时的增量）生成后立即反馈，最后反馈完整计划；返回完整计划文本。
+        cancel_token 取消后不再发起新的 LLM 请求，抛出 OperationCancelled
+        """
+        recorder = PlanRecorder(request.project_id)
+        plan = GeneratedPlan()
+        for kind, part_index, total_parts, text in self._plan_events(request, recorder, cancel_token):
+            if kind == PLAN_PART:
+                plan.add(part_index, total_parts, text)
+            yield plan_part_feedback(kind, part_index, total_parts, text)
+
+        plan_text = plan.text()
+        recorder.save_complete(plan_text)
+        yield complete_plan_feedback(plan_text)
+        return plan_text
+
+    def _plan_cancelled(self, context, e):
+        self.logger.info(f"计划生成已取消: {e}")
+        context.set_code(grpc.StatusCode.CANCELLED)
+        context.set_details(f"计划生成已取消: {e}")
 
     # 获取计划（不执行）
     def GetPlan(self, request, context):
         """获取项目计划"""
         try:
-            self._init_agent_with_project_dir(request.project_id)
-            model = request.model or self.config['llm']['model']
-            llm_url = request.llm_url or self.config['llm']['api_url']
-            api_key = self.config['llm']['api_key']
-            project_id = request.project_id
+            self.agents.get_project_dir(request.project_id)
+            run_context = RunContext.from_request(request)
+            self._bind_cancel(context, run_context)
+            yield from self._stream_plan(request, run_context.cancel_token)
 
-            plan_text = get_plan_from_llm(
-                request.requirement, model, llm_url, api_key, project_id
-            )
-            
-            # 返回完整计划
-            yield helper_pb2.ActionFeedback(
-                action_index=-1,
-                action_type="llm_plan",
-                step_description="完整计划生成完毕",
-                status="success",
-                complete_plan=plan_text
-            )
-            
+        except OperationCancelled as e:
+            self._plan_cancelled(context, e)
         except Exception as e:
             self.logger.exception("GetPlan 处理异常")
             context.set_code(grpc.StatusCode.INTERNAL)
@@ -60,30 +134,47 @@ class AIProjectHelperServicer(helper_pb2_grpc.AIProjectHelperServicer):
     # 获取并执行计划
     def GetPlanThenRun(self, request, context):
         """获取并执行计划"""
+        yield from action_feedback_stream(self._get_plan_then_run(request, context))
+
+    def _get_plan_then_run(self, request, context):
+        """GetPlanThenRun 的反馈流，动作反馈为 FeedbackRecord，由旧接口/增量接口各自转换"""
         try:
-            self._init_agent_with_project_dir(request.project_id)
-            model = request.model or self.config['llm']['model']
-            llm_url = request.llm_url or self.config['llm']['api_url']
-            api_key = self.config['llm']['api_key']
+            self.agents.get_project_dir(request.project_id)
             project_id = request.project_id
+            # 计划生成与执行共用一个取消信号：生成期间 RPC 结束同样停止
+            run_context = RunContext.from_request(request)
+            self._bind_cancel(context, run_context)
+
+            # 边生成边执行：已完整的步骤在后续部分生成期间即开始执行
+            if self.config.get("plan_generation", {}).get("execute_early", False):
+                recorder = PlanRecorder(project_id)
+                pump = PlanEventPump(self._plan_events(request, recorder, run_context.cancel_token))
+                try:
+                    yield from self._execute_for_project(
+                        project_id, request, context,
+                        lambda agent, run_context, journal, snapshots: execute_plan_while_generating(
+                            agent, pump, recorder, context, run_context, journal, snapshots
+                        ),
+                        run_context
+                    )
+                finally:
+                    pump.close()
+                return
+
+            # 先返回计划（逐部分及完整计划）
+            plan_text = yield from self._stream_plan(request, run_context.cancel_token)
 
-            plan_text = get_plan_from_llm(
-                request.requirement, model, llm_url, api_key, project_id
-            )
-            
-            # 先返回完整计划
-            yield helper_pb2.ActionFeedback(
-                action_index=-1,
-                action_type="llm_plan",
-                step_description="完整计划生成完毕",
-                status="success",
-                complete_plan=plan_text
-            )
-            
             # 再执行计划
-            for fb in execute_plan_text(self.agent, plan_text, context):
-                yield fb
-                
+            yield from self._execute_for_project(
+                project_id, request, context,
+                lambda agent, run_context, journal, snapshots: execute_plan_text(
+                    agent, plan_text, context, run_context, journal, snapshots
+                ),
+                run_context
+            )
+
+        except OperationCancelled as e:
+            self._plan_cancelled(context, e)
         except Exception as e:
             self.logger.exception("GetPlanThenRun 处理异常")
             context.set_code(grpc.StatusCode.INTERNAL)
@@ -92,15 +183,32 @@ class AIProjectHelperServicer(helper_pb2_grpc.AIProjectHelperServicer):
     # 执行现有计划
     def RunPlan(self, request, context):
         """执行现有计划"""
+        yield from action_feedback_stream(self._run_plan(request, context))
+
+    def _run_plan(self, request, context):
+        """RunPlan 的反馈流，动作反馈为 FeedbackRecord，由旧接口/增量接口各自转换"""
         try:
-            self._init_agent_with_project_dir(request.project_id)
             plan_text = request.plan_text
             
             # 执行计划
-            for fb in execute_plan_text(self.agent, plan_text, context):
-                yield fb
+            yield from self._execute_for_project(
+                request.project_id, request, context,
+                lambda agent, run_context, journal, snapshots: execute_plan_text(
+                    agent, plan_text, context, run_context, journal, snapshots
+                )
+            )
                 
         except Exception as e:
             self.logger.exception("RunPlan 处理异常")
             context.set_code(grpc.StatusCode.INTERNAL)
-            context.set_details(str(e))
\ No newline at end of file
+            context.set_details(str(e))
+
+    # 增量协议版本：业务逻辑与旧接口相同，只是反馈以 FeedbackEvent 发送；
+    # 动作反馈直接从执行器的 FeedbackRecord 编码，不经过 ActionFeedback
+    def RunPlanDelta(self, request, context):
+        """执行现有计划（增量反馈）"""
+        yield from encode_feedback_stream(self._run_plan(request, context))
+
+    def GetPlanThenRunDelta(self, request, context):
+        """获取并执行计划（增量反馈）"""
+        yield from encode_feedback_stream(self._get_plan_then_run(request, context))
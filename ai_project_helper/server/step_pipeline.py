@@ -0,0 +1,65 @@
+# 步骤流水线：在执行第 N 步的同时，后台预取后续 K 步的 LLM 动作翻译
+from concurrent.futures import ThreadPoolExecutor
+from ai_project_helper.log_config import get_logger
+
+logger = get_logger("server.step_pipeline")
+
+
+def translate_step(agent, step_text, step_index, step_count, run_context=None):
+    """立即翻译一个步骤：开启流式模式时边生成边产出 action，否则同步解析为列表"""
+    if agent.config.get("llm", {}).get("stream"):
+        return agent.stream_step(step_text, step_index, step_count, run_context)
+    return agent.prepare_step(step_text, step_index, step_count, run_context)
+
+
+class StepPrefetcher:
+    """
+    按顺序提供每一步已解析的 actions。
+    取第 i 步时，会把 i+1 ~ i+depth 步的翻译提交到后台线程池，
+    使 LLM 往返延迟与当前步骤的动作执行重叠；depth=0 时退化为逐步同步解析。
+    """
+
+    def __init__(self, agent, steps, depth=2, run_context=None, skip_steps=()):
+        self.agent = agent
+        self.steps = steps
+        self.run_context = run_context
+        self.skip_steps = set(skip_steps)  # 无需翻译的步骤（如检查点中已完成）
+        self.step_count = len(steps)
+        self.depth = max(0, int(depth or 0))
+        self._futures = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.depth, thread_name_prefix="step-prefetch"
+        ) if self.depth else None
+
+    def _submit(self, index):
+        if index >= self.step_count or index in self._futures or index in self.skip_steps:
+            return
+        self._futures[index] = self._executor.submit(
+            self.agent.prepare_step, self.steps[index], index + 1, self.step_count, self.run_context
+        )
+
+    def _translate_now(self, index):
+        # 未被预取的步骤直接翻译
+        return translate_step(self.agent, self.steps[index], index + 1, self.step_count, self.run_context)
+
+    def get(self, index):
+        """返回第 index 步（从0开始）的 actions（列表或流式迭代器），解析失败时抛出 RuntimeError"""
+        if self._executor is None:
+            return self._translate_now(index)
+
+        future = self._futures.pop(index, None)
+        for ahead in range(index + 1, index + 1 + self.depth):
+            self._submit(ahead)
+        if future is None:
+            return self._translate_now(index)
+        return future.result()
+
+    def close(self):
+        """取消尚未开始的预取任务（已在进行中的 LLM 请求结果将被丢弃）"""
+        if self._executor is None:
+            return
+        cancelled = sum(1 for f in self._futures.values() if f.cancel())
+        if cancelled:
+            logger.info(f"已取消 {cancelled} 个待执行的步骤预取")
+        self._futures.clear()
+        self._executor.shutdown(wait=False)
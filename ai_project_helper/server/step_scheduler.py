@@ -0,0 +1,121 @@
+# 跨步骤 DAG 调度：声明了依赖关系的计划中，相互独立的步骤并发执行
+import queue
+import threading
+from ai_project_helper.server.step_pipeline import translate_step
+from ai_project_helper.core.cancellation import OperationCancelled
+from ai_project_helper.log_config import get_logger
+
+logger = get_logger("server.step_scheduler")
+
+_STEP_DONE = "done"
+_STEP_ERROR = "error"
+_FEEDBACK = "feedback"
+
+
+class StepGraphScheduler:
+    """
+    每个就绪步骤在独立线程中执行自己的动作流，反馈经有界队列汇入调用方的单一生成器。
+    - 同时运行的步骤数不超过 max_parallel；
+    - 任一步骤失败后不再启动新步骤，已在运行的步骤执行完毕后结束；
+    - 调用方关闭生成器（如客户端断开）时通知各工作线程尽快退出。
+    """
+
+    def __init__(self, agent, steps, graph, run_context=None, journal=None,
+                 done_steps=(), max_parallel=4):
+        self.agent = agent
+        self.steps = steps
+        self.graph = graph
+        self.step_count = len(steps)
+        self.run_context = run_context
+        self.journal = journal
+        self.max_parallel = max(1, int(max_parallel))
+        self.completed = set(done_steps)
+        self._events = queue.Queue(maxsize=256)
+        self._stop = threading.Event()
+
+    def _put(self, event):
+        while not self._stop.is_set():
+            try:
+                self._events.put(event, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run_step(self, index):
+        step_no = index + 1
+        step_text = self.steps[index]
+        feedback = None
+        try:
+            actions = translate_step(self.agent, step_text, step_no, self.step_count, self.run_context)
+            if self.journal is not None:
+                actions = self.journal.track_step(step_no, step_text, actions)
+            feedback = self.agent.run_prepared_step(actions, step_no, self.step_count, self.run_context)
+            for fb in feedback:
+                if not self._put((_FEEDBACK, index, fb)):
+                    return
+            self._put((_STEP_DONE, index, None))
+        except OperationCancelled as e:
+            self._put((_STEP_ERROR, index, e))
+        except Exception as e:
+            logger.exception(f"执行第{step_no}步失败: {e}")
+            self._put((_STEP_ERROR, index, e))
+        finally:
+            if feedback is not None:
+                feedback.close()
+
+    def _ready_steps(self, started):
+        return [
+            i for i in range(self.step_count)
+            if i not in started and self.graph[i] <= self.completed
+        ]
+
+    def run(self):
+        """产出 (step_index, 反馈dict)；步骤异常时抛出 RuntimeError，请求取消时抛出 OperationCancelled"""
+        started = set(self.completed)
+        running = set()
+        failed_steps = set()
+        halted = False
+        error = None
+        try:
+            while True:
+                if not halted:
+                    for index in self._ready_steps(started)[:self.max_parallel - len(running)]:
+                        started.add(index)
+                        running.add(index)
+                        threading.Thread(
+                            target=self._run_step, args=(index,),
+                            name=f"plan-step-{index + 1}", daemon=True
+                        ).start()
+                if not running:
+                    break
+
+                kind, index, payload = self._events.get()
+                step_no = index + 1
+                if kind == _FEEDBACK:
+                    if self.journal is not None:
+                        self.journal.observe(step_no, self.steps[index], payload)
+                    yield step_no, payload
+                    if payload.get("status") == "failed":
+                        failed_steps.add(index)
+                        halted = True
+                elif kind == _STEP_DONE:
+                    running.discard(index)
+                    if index not in failed_steps:
+                        self.completed.add(index)
+                        if self.journal is not None:
+                            self.journal.finish_step(step_no, self.steps[index])
+                else:
+                    running.discard(index)
+                    halted = True
+                    error = error or payload
+
+            if isinstance(error, OperationCancelled):
+                raise error
+            if error is not None:
+                raise RuntimeError(str(error))
+            unfinished = set(range(self.step_count)) - self.completed
+            if unfinished and not halted:
+                logger.warning(f"以下步骤因依赖未满足未执行: {sorted(i + 1 for i in unfinished)}")
+        finally:
+            self._stop.set()
@@ -23,3 +23,59 @@ def split_plan_into_steps(plan_text: str):
             task_steps.append(final_segment)
 
     return task_steps
+
+
+STEP_DEPENDS_PATTERN = re.compile(r'^\s*depends\s*:\s*([\d,\s]*)$', re.IGNORECASE)
+
+def parse_step_header(step_text: str):
+    """
+    解析步骤首行的依赖声明，如 `depends: 2,3`（步骤序号从1开始，`depends:` 留空表示无依赖）。
+    返回 (去掉声明行后的步骤文本, 依赖序号集合)；未声明时依赖为 None
+    """
+    first_line, _, rest = step_text.partition("\n")
+    match = STEP_DEPENDS_PATTERN.match(first_line)
+    if not match:
+        return step_text, None
+    deps = {int(n) for n in re.split(r'[,\s]+', match.group(1)) if n}
+    return rest.strip(), deps
+
+def build_step_graph(task_steps):
+    """
+    构建步骤依赖图，返回 (步骤文本列表, 依赖列表)，依赖为从0开始的步骤下标集合。
+    没有任何步骤声明依赖时依赖列表为 None（按原有顺序执行）；
+    未声明依赖的步骤默认依赖其前一步。
+    """
+    bodies, declared = [], []
+    for step_text in task_steps:
+        body, deps = parse_step_header(step_text)
+        bodies.append(body)
+        declared.append(deps)
+    if all(deps is None for deps in declared):
+        return bodies, None
+
+    step_count = len(bodies)
+    graph = []
+    for i, deps in enumerate(declared):
+        if deps is None:
+            graph.append({i - 1} if i > 0 else set())
+            continue
+        invalid = [n for n in deps if n < 1 or n > step_count or n == i + 1]
+        if invalid:
+            raise ValueError(f"步骤 {i + 1} 的依赖声明无效: {invalid}")
+        graph.append({n - 1 for n in deps})
+
+    # 检查循环依赖
+    visiting, visited = set(), set()
+    def visit(node):
+        if node in visited:
+            return
+        if node in visiting:
+            raise ValueError(f"步骤依赖存在循环，涉及步骤 {node + 1}")
+        visiting.add(node)
+        for dep in graph[node]:
+            visit(dep)
+        visiting.discard(node)
+        visited.add(node)
+    for node in range(step_count):
+        visit(node)
+    return bodies, graph
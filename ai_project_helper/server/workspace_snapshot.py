@@ -0,0 +1,320 @@
+# 项目工作目录快照：每个步骤执行前记录目录状态，步骤失败时把目录回滚到该状态
+import os
+import re
+import json
+import stat
+import shutil
+import fnmatch
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from ai_project_helper.actions.file_ops import clone_or_copy
+from ai_project_helper.actions.sandbox import get_path_sandbox
+from ai_project_helper.log_config import get_logger
+
+logger = get_logger("server.snapshot")
+
+DEFAULT_SNAPSHOT_CONFIG = {
+    "enabled": True,                 # 顺序执行的步骤开始前建立快照，步骤失败时回滚
+    "max_snapshots": 20,             # 每个项目保留的快照数，超出后删除最旧的及其独占的内容块
+    "exclude": [".git", "node_modules", "__pycache__", ".venv", "venv"],  # 不做快照也不回滚的目录/文件名（支持通配符）
+    "max_file_bytes": 256 << 20,     # 超过该大小的文件不做快照也不回滚（0=不限制）
+}
+
+MAX_CACHED_WORKSPACES = 64  # 保留文件状态缓存的项目数
+
+
+def snapshot_settings(config):
+    cfg = dict(DEFAULT_SNAPSHOT_CONFIG)
+    cfg.update(config.get("workspace_snapshots", {}) or {})
+    return cfg
+
+
+def _stat_key(st):
+    # 内容不变的判断依据（与 git index 相同的思路）：大小、修改时间、inode、权限位
+    return [st.st_size, st.st_mtime_ns, st.st_ino, stat.S_IMODE(st.st_mode)]
+
+
+class WorkspaceSnapshots:
+    """
+    一个项目目录的快照存储，位于 store_dir 下：
+    - objects/ab/<sha256>：文件内容块，内容寻址，各快照共享，未变化的文件不重复存储；
+    - manifests/<序号>-<名称>.json：快照清单 {"files": {相对路径: [sha256, 权限, 大小, mtime_ns]},
+      "links": {相对路径: 链接目标}, "dirs": {相对路径: 权限}, "skipped": [超过大小上限、未保存内容的文件]}。
+    内容块以 reflink（写时复制文件系统）或复制保存，不用硬链接：动作会原地改写文件（update/append、shell 命令），
+    硬链接会让快照随之改变。文件状态缓存（路径 → stat 与哈希）使建快照只读取变化过的文件，
+    回滚只恢复与快照不一致的文件
+    """
+
+    def __init__(self, workdir, store_dir, settings):
+        self.workdir = os.path.realpath(workdir)
+        self._sandbox_workdir = workdir
+        self.store_dir = store_dir
+        self.objects_dir = os.path.join(store_dir, "objects")
+        self.manifests_dir = os.path.join(store_dir, "manifests")
+        self._store_real = os.path.realpath(store_dir)
+        self.max_snapshots = int(settings["max_snapshots"])
+        patterns = list(settings["exclude"] or [])
+        self._exclude_re = re.compile("|".join(fnmatch.translate(p) for p in patterns)) if patterns else None
+        self.max_file_bytes = int(settings["max_file_bytes"])
+        self._lock = threading.Lock()
+        self._known = {}  # 相对路径 -> (stat 键, sha256)
+        self._manifests = OrderedDict()  # 清单文件名 -> 清单，按创建顺序
+        self._seq = 0
+        self._reflink = None  # 存储目录所在文件系统是否支持 reflink，首次存储内容块时确定
+        self._load_manifests()
+
+    def _load_manifests(self):
+        if not os.path.isdir(self.manifests_dir):
+            return
+        for name in sorted(os.listdir(self.manifests_dir)):
+            seq = name.split("-", 1)[0]
+            if not name.endswith(".json") or not seq.isdigit():
+                continue
+            try:
+                with open(os.path.join(self.manifests_dir, name), "r", encoding="utf-8") as f:
+                    self._manifests[name] = json.load(f)
+                self._seq = max(self._seq, int(seq))
+            except (OSError, ValueError):
+                logger.warning(f"快照清单损坏，已忽略: {name}")
+
+    def _excluded(self, name):
+        return self._exclude_re is not None and self._exclude_re.match(name) is not None
+
+    def _walk(self):
+        """遍历项目目录（不跟随符号链接），产出 (相对路径, DirEntry)"""
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            try:
+                entries = list(os.scandir(os.path.join(self.workdir, rel_dir)))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if self._excluded(entry.name):
+                    continue
+                rel = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    # 工作目录已是真实路径且不跟随链接，entry.path 即真实路径
+                    if entry.path == self._store_real:
+                        continue
+                    stack.append(rel)
+                yield rel, entry
+
+    def _copy(self, src, dst):
+        """支持 reflink 时克隆（不复制数据），否则复制；不支持时之后不再尝试克隆"""
+        if self._reflink is False:
+            shutil.copyfile(src, dst)
+        else:
+            self._reflink = clone_or_copy(src, dst) == "reflink"
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _store(self, path):
+        """
+        把文件内容存为内容块并返回 sha256。哈希按写入内容块的数据计算，源文件在此期间被改写也不会不一致：
+        支持 reflink 时先克隆再读取克隆计算哈希，否则边复制边计算（源文件只读一次）
+        """
+        os.makedirs(self.objects_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix=".tmp")
+        try:
+            sha = hashlib.sha256()
+            if self._reflink is False:
+                with open(path, "rb") as src, os.fdopen(fd, "wb") as dst:
+                    for block in iter(lambda: src.read(1 << 20), b""):
+                        sha.update(block)
+                        dst.write(block)
+            else:
+                os.close(fd)
+                self._copy(path, tmp_path)
+                with open(tmp_path, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        sha.update(block)
+            digest = sha.hexdigest()
+            object_path = self._object_path(digest)
+            if os.path.exists(object_path):
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                os.chmod(tmp_path, 0o444)
+                os.replace(tmp_path, object_path)
+            return digest
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def take(self, name):
+        """为项目目录建立快照并返回清单"""
+        with self._lock:
+            manifest = {"name": name, "files": {}, "links": {}, "dirs": {}, "skipped": []}
+            stored = 0
+            known = {}
+            for rel, entry in self._walk():
+                st = entry.stat(follow_symlinks=False)
+                if entry.is_symlink():
+                    manifest["links"][rel] = os.readlink(entry.path)
+                elif entry.is_dir(follow_symlinks=False):
+                    manifest["dirs"][rel] = stat.S_IMODE(st.st_mode)
+                elif entry.is_file(follow_symlinks=False):
+                    if self.max_file_bytes and st.st_size > self.max_file_bytes:
+                        manifest["skipped"].append(rel)
+                        continue
+                    key = _stat_key(st)
+                    cached = self._known.get(rel)
+                    if cached and cached[0] == key:
+                        digest = cached[1]
+                    else:
+                        digest = self._store(entry.path)
+                        stored += 1
+                    known[rel] = (key, digest)
+                    manifest["files"][rel] = [digest, key[3], key[0], key[1]]
+            self._known = known
+            self._save(manifest)
+            logger.info(f"[快照] {self.workdir} → {name}：{len(manifest['files'])} 个文件，新存储 {stored} 个")
+            return manifest
+
+    def _save(self, manifest):
+        self._seq += 1
+        filename = f"{self._seq:08d}-{manifest['name']}.json"
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.manifests_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.manifests_dir, filename))
+        self._manifests[filename] = manifest
+        self._prune()
+
+    def _prune(self):
+        """删除超出数量的旧快照，以及只被这些快照引用的内容块"""
+        if self.max_snapshots <= 0 or len(self._manifests) <= self.max_snapshots:
+            return
+        removed = set()
+        while len(self._manifests) > self.max_snapshots:
+            filename, manifest = self._manifests.popitem(last=False)
+            removed.update(entry[0] for entry in manifest["files"].values())
+            try:
+                os.unlink(os.path.join(self.manifests_dir, filename))
+            except FileNotFoundError:
+                pass
+        for manifest in self._manifests.values():
+            removed.difference_update(entry[0] for entry in manifest["files"].values())
+        for digest in removed:
+            try:
+                os.unlink(self._object_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def restore(self, manifest):
+        """
+        把项目目录恢复为快照时的状态：删除快照后新增的文件与目录，恢复被修改或删除的文件与链接。
+        与快照一致的文件不做任何操作；被排除的路径、快照时超过大小上限未保存内容的路径（清单中的 skipped，
+        即使步骤中被缩小或改为其他类型）以及步骤中新增的超过大小上限的文件保持不变。返回统计信息
+        """
+        with self._lock:
+            files, links, dirs = manifest["files"], manifest["links"], manifest["dirs"]
+            skipped = set(manifest.get("skipped", ()))
+            counts = {"restored": 0, "removed": 0, "unchanged": 0}
+            current = {}
+            for rel, entry in self._walk():
+                current[rel] = entry
+
+            # 先删除快照中不存在（或类型不同）的路径；已随上级目录删除的路径跳过
+            removed_dirs = []
+            kept = set()  # skipped 中的路径（步骤中可能被改为目录，其下内容一并保留）
+            for rel in sorted(current):
+                entry = current[rel]
+                if removed_dirs and not os.path.lexists(entry.path):
+                    continue
+                if rel in skipped or os.path.dirname(rel) in kept:
+                    kept.add(rel)
+                    continue  # 快照中没有其内容，不能删除或改写
+                if entry.is_dir(follow_symlinks=False):
+                    if rel not in dirs:
+                        shutil.rmtree(entry.path)
+                        removed_dirs.append(rel)
+                        counts["removed"] += 1
+                    continue
+                if entry.is_symlink():
+                    if rel in links:
+                        continue
+                elif rel in files:
+                    continue
+                elif rel not in links and self.max_file_bytes and entry.is_file(follow_symlinks=False) \
+                        and entry.stat(follow_symlinks=False).st_size > self.max_file_bytes:
+                    continue  # 超过大小上限、未纳入快照的文件
+                os.unlink(entry.path)
+                counts["removed"] += 1
+
+            for rel in sorted(dirs):
+                path = os.path.join(self.workdir, rel)
+                if not os.path.isdir(path):
+                    os.makedirs(path, exist_ok=True)
+                    os.chmod(path, dirs[rel])
+
+            for rel, target in links.items():
+                path = os.path.join(self.workdir, rel)
+                if os.path.islink(path):
+                    if os.readlink(path) == target:
+                        counts["unchanged"] += 1
+                        continue
+                    os.unlink(path)
+                os.symlink(target, path)
+                counts["restored"] += 1
+
+            for rel, (digest, mode, _, mtime_ns) in files.items():
+                path = os.path.join(self.workdir, rel)
+                entry = current.get(rel)
+                # 快照中的文件不会随上面删除的目录一起删除（那些目录不在快照中），可直接使用遍历时的 stat
+                st = entry.stat(follow_symlinks=False) if entry is not None and entry.is_file(follow_symlinks=False) else None
+                cached = self._known.get(rel)
+                if st is not None and cached and cached[0] == _stat_key(st) and cached[1] == digest:
+                    counts["unchanged"] += 1
+                    continue
+                self._restore_file(path, digest, mode, mtime_ns)
+                self._known[rel] = (_stat_key(os.lstat(path)), digest)
+                counts["restored"] += 1
+
+            # 回滚可能恢复或删除了符号链接
+            get_path_sandbox(self._sandbox_workdir).invalidate()
+            logger.info(f"[回滚] {self.workdir} → {manifest['name']}：{counts}")
+            return counts
+
+    def _restore_file(self, path, digest, mode, mtime_ns):
+        """从内容块克隆到同目录的临时文件后原子替换，恢复权限与修改时间"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            self._copy(self._object_path(digest), tmp_path)
+            os.chmod(tmp_path, mode)
+            os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+_workspaces = OrderedDict()
+_workspaces_lock = threading.Lock()
+
+
+def get_workspace_snapshots(config, state_dir, project_id, workdir):
+    """
+    按项目共享 WorkspaceSnapshots（保留文件状态缓存，后续快照只读取变化的文件）；
+    未启用 workspace_snapshots 时返回 None
+    """
+    settings = snapshot_settings(config)
+    if not settings["enabled"]:
+        return None
+    store_dir = os.path.join(state_dir, "snapshots", project_id)
+    with _workspaces_lock:
+        snapshots = _workspaces.pop(store_dir, None)
+        if snapshots is None or snapshots.workdir != os.path.realpath(workdir):
+            snapshots = WorkspaceSnapshots(workdir, store_dir, settings)
+        _workspaces[store_dir] = snapshots
+        while len(_workspaces) > MAX_CACHED_WORKSPACES:
+            _workspaces.popitem(last=False)
+        return snapshots
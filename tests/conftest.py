@@ -0,0 +1,11 @@
+# 测试的运行环境与 main.py 相同：包内既有 ai_project_helper.xxx 的完整包名导入，也有 core/actions 的顶层导入；
+# 配置文件 config_ai_project_helper.yaml 在导入时从当前目录读取
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_DIR = os.path.join(ROOT, "ai_project_helper")
+for path in (ROOT, PACKAGE_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+os.chdir(PACKAGE_DIR)
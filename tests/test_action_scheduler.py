@@ -0,0 +1,97 @@
+# 步骤内动作的并发调度：同路径（或祖先/子孙路径）的动作按依赖顺序执行，依赖未成功时跳过
+import pytest
+from core.agent import Agent
+from ai_project_helper.core.action_scheduler import execute_actions_parallel, paths_conflict, unit_succeeded
+
+
+@pytest.fixture
+def agent(tmp_path):
+    workdir = tmp_path / "project"
+    return Agent({
+        "llm": {"model": "test-model", "api_url": "http://127.0.0.1:1/v1/chat/completions", "api_key": ""},
+        "working_dir": str(workdir),
+        "action_cache": {"enabled": False},
+        "agent": {"fuse_edits": False},
+        "file_edit": {"backup": "none"},
+    })
+
+
+def file_edit(command, path, **parameters):
+    return {"action_type": "file_edit", "parameters": dict(parameters, command=command, path=path)}
+
+
+def final_feedbacks(feedbacks):
+    """每个动作的结束反馈：action_index → (status, exit_code)"""
+    return {fb["action_index"]: (fb["status"], fb.get("exit_code")) for fb in feedbacks if fb["status"] != "running"}
+
+
+def test_paths_conflict():
+    assert paths_conflict("/w/a", "/w/a")
+    assert paths_conflict("/w/d", "/w/d/f.txt")
+    assert paths_conflict("/w/d/f.txt", "/w/d")
+    assert not paths_conflict("/w/a", "/w/ab")
+
+
+def test_unit_succeeded():
+    assert unit_succeeded([{"status": "running"}, {"status": "success", "exit_code": 0}])
+    assert unit_succeeded([{"status": "success", "exit_code": 2}])
+    assert unit_succeeded([{"status": "skipped", "exit_code": 0}])
+    assert not unit_succeeded([{"status": "success", "exit_code": 1}])
+    assert not unit_succeeded([{"status": "failed", "exit_code": 1}])
+    assert not unit_succeeded([{"status": "timeout"}])
+
+
+def test_dependent_action_runs_after_parent_directory(agent, tmp_path):
+    actions = [
+        {"action_type": "directory", "parameters": {"command": "create", "path": "pkg/sub"}},
+        file_edit("create", "pkg/sub/mod.py", file_text="x = 1\n"),
+        file_edit("str_replace", "pkg/sub/mod.py", old_str="x = 1", new_str="x = 2"),
+    ]
+    feedbacks = list(execute_actions_parallel(agent, actions, max_workers=4))
+
+    assert final_feedbacks(feedbacks) == {0: ("success", 0), 1: ("success", 0), 2: ("success", 0)}
+    assert (tmp_path / "project" / "pkg" / "sub" / "mod.py").read_text() == "x = 2\n"
+
+
+def test_action_is_skipped_when_dependency_did_not_succeed(agent, tmp_path):
+    actions = [
+        # 文件不存在，补丁无法应用（退出码 1）
+        {"action_type": "patch", "parameters": {"path": "a.txt", "diff": "@@ -1 +1 @@\n-old\n+new\n"}},
+        file_edit("append", "a.txt", append_text="more\n"),
+        file_edit("create", "b.txt", file_text="independent\n"),
+    ]
+    feedbacks = list(execute_actions_parallel(agent, actions, max_workers=4))
+
+    results = final_feedbacks(feedbacks)
+    assert results[0] == ("success", 1)
+    assert results[1] == ("skipped", 0)
+    assert results[2] == ("success", 0)
+    assert not (tmp_path / "project" / "a.txt").exists()
+    assert (tmp_path / "project" / "b.txt").read_text() == "independent\n"
+    # 反馈按动作顺序输出
+    indices = [fb["action_index"] for fb in feedbacks]
+    assert indices == sorted(indices)
+
+
+def test_skip_propagates_through_dependency_chain(agent):
+    actions = [
+        {"action_type": "patch", "parameters": {"path": "a.txt", "diff": "@@ -1 +1 @@\n-old\n+new\n"}},
+        file_edit("append", "a.txt", append_text="1\n"),
+        file_edit("append", "a.txt", append_text="2\n"),
+    ]
+    results = final_feedbacks(execute_actions_parallel(agent, actions, max_workers=4))
+    assert [results[i][0] for i in range(3)] == ["success", "skipped", "skipped"]
+
+
+def test_warning_exit_code_does_not_skip_dependents(agent, tmp_path):
+    (tmp_path / "project").mkdir(exist_ok=True)
+    (tmp_path / "project" / "a.txt").write_text("old\n")
+    actions = [
+        # 文件已存在：警告，退出码 2
+        file_edit("create", "a.txt", file_text="ignored\n"),
+        file_edit("str_replace", "a.txt", old_str="old", new_str="new"),
+    ]
+    results = final_feedbacks(execute_actions_parallel(agent, actions, max_workers=4))
+
+    assert results == {0: ("success", 2), 1: ("success", 0)}
+    assert (tmp_path / "project" / "a.txt").read_text() == "new\n"
@@ -0,0 +1,100 @@
+# 增量反馈协议：服务端编码（DeltaEncoder）与客户端解码（decode_feedback_events）往返后与原反馈一致
+from ai_project_helper.proto import helper_pb2
+from ai_project_helper.server.delta_feedback import DeltaEncoder, encode_feedback_stream
+from ai_project_helper.server.feedback_record import FeedbackRecord, action_feedback_stream
+from ai_project_helper.client.delta_feedback import decode_feedback_events
+
+
+def record(step_index, action_index, status, output="", error="", exit_code=0, description="desc"):
+    return FeedbackRecord(
+        action_index=action_index, action_type="shell_command", step_description=description,
+        status=status, output=output, error=error, command="make", step_index=step_index,
+        total_steps=2, exit_code=exit_code,
+    )
+
+
+def summarize(feedbacks):
+    """按动作汇总：拼接的输出/错误与结束状态；action_index < 0 的反馈按顺序原样保留"""
+    actions, others = {}, []
+    for fb in feedbacks:
+        if fb.action_index < 0:
+            others.append(fb.SerializeToString() if hasattr(fb, "SerializeToString") else fb.to_proto().SerializeToString())
+            continue
+        entry = actions.setdefault((fb.step_index, fb.action_index), {"output": "", "error": "", "final": None})
+        entry["output"] += fb.output
+        entry["error"] += fb.error
+        if fb.status != "running":
+            entry["final"] = (fb.status, fb.exit_code, fb.step_description, fb.action_type, fb.command, fb.total_steps)
+    return actions, others
+
+
+def stream():
+    return [
+        helper_pb2.ActionFeedback(action_index=-1, action_type="llm_plan", status="success", complete_plan="plan"),
+        record(1, 0, "running"),
+        record(1, 0, "running", output="building ✓\n"),
+        record(1, 0, "running", error="warning: x\n"),
+        # 依赖图执行时不同步骤的动作交错输出
+        record(2, 0, "running", output="step 2\n"),
+        record(1, 0, "running", output="done\n"),
+        record(1, 0, "success", exit_code=0, description="finished"),
+        record(2, 0, "failed", error="boom", exit_code=1, description="failed"),
+        record(2, -1, "rolled_back", output="恢复 1 项\n"),
+        record(1, 1, "skipped", output="已完成\n"),
+    ]
+
+
+def test_round_trip():
+    feedbacks = stream()
+    decoded = list(decode_feedback_events(encode_feedback_stream(iter(feedbacks))))
+    assert summarize(decoded) == summarize(feedbacks)
+
+
+def test_round_trip_of_legacy_action_feedback():
+    feedbacks = [fb.to_proto() if isinstance(fb, FeedbackRecord) else fb for fb in stream()]
+    decoded = list(decode_feedback_events(encode_feedback_stream(iter(feedbacks))))
+    assert summarize(decoded) == summarize(feedbacks)
+
+
+def test_events_carry_only_deltas():
+    encoder = DeltaEncoder()
+    first = encoder.encode(record(1, 0, "running"))
+    assert [e.WhichOneof("event") for e in first] == ["started"]
+    # 没有输出的 running 反馈不产生事件
+    assert encoder.encode(record(1, 0, "running")) == []
+    [chunk] = encoder.encode(record(1, 0, "running", output="abc"))
+    assert chunk.chunk.action_id == first[0].started.action_id
+    assert chunk.chunk.output == b"abc"
+    [finished] = encoder.encode(record(1, 0, "success"))
+    assert finished.WhichOneof("event") == "finished"
+    # 结束后同一动作再次出现视为新的动作
+    [started] = encoder.encode(record(1, 0, "running"))
+    assert started.started.action_id != first[0].started.action_id
+
+
+def test_non_action_record_is_wrapped_as_action_feedback():
+    [event] = DeltaEncoder().encode(record(2, -1, "rolled_back", output="x"))
+    assert event.feedback == record(2, -1, "rolled_back", output="x").to_proto()
+
+
+def _closable(items, closed):
+    try:
+        yield from items
+    finally:
+        closed.append(True)
+
+
+def test_streams_close_upstream_on_early_exit():
+    for convert in (encode_feedback_stream, action_feedback_stream):
+        closed = []
+        events = convert(_closable(stream(), closed))
+        next(events)
+        events.close()
+        assert closed == [True]
+
+
+def test_action_feedback_stream_converts_records():
+    out = list(action_feedback_stream(iter(stream())))
+    assert all(isinstance(fb, helper_pb2.ActionFeedback) for fb in out)
+    assert out[0].complete_plan == "plan"
+    assert out[2].output == "building ✓\n" and out[2].step_index == 1 and out[2].total_steps == 2
@@ -0,0 +1,81 @@
+# 流式替换（stream_replace）与 atomic_output：结果须与 str.replace 一致，跨块边界的匹配不能漏掉
+import io
+import os
+import random
+import stat
+import pytest
+from ai_project_helper.actions.file_ops import NEW_FILE_MODE, atomic_output, stream_replace
+from ai_project_helper.actions.file_edit import FileEditAction
+
+
+def _stream_replace(text, old, new, chunk_chars):
+    dst = io.StringIO()
+    count = stream_replace(io.StringIO(text), dst, old, new, chunk_chars)
+    return dst.getvalue(), count
+
+
+CASES = [
+    ("hello world, hello there", "hello", "bye"),
+    ("abcabcabc", "cab", "X"),
+    # 可能重叠的模式：与 str.replace 相同，从左到右取不重叠的匹配
+    ("aaaaaaa", "aa", "b"),
+    ("abababab", "aba", "-"),
+    ("ab" * 50, "b", "bb"),
+    ("新的文本，旧的文本，旧的", "旧的", "新的"),
+    ("no match here", "xyz", "!"),
+    ("line1\nline2\nline3\n", "\nline", "\n> line"),
+]
+
+
+@pytest.mark.parametrize("text, old, new", CASES)
+def test_matches_str_replace_for_every_chunk_size(text, old, new):
+    # chunk_chars 从 1 到全文长度：每种切分位置都让某些匹配跨越块边界
+    for chunk_chars in range(1, len(text) + 2):
+        assert _stream_replace(text, old, new, chunk_chars) == (text.replace(old, new), text.count(old)), chunk_chars
+
+
+def test_randomized_against_str_replace():
+    rng = random.Random(20240601)
+    for _ in range(300):
+        text = "".join(rng.choice("ab\n") for _ in range(rng.randint(0, 60)))
+        old = "".join(rng.choice("ab") for _ in range(rng.randint(1, 4)))
+        new = "".join(rng.choice("xy") for _ in range(rng.randint(0, 3)))
+        chunk_chars = rng.randint(1, 8)
+        assert _stream_replace(text, old, new, chunk_chars) == (text.replace(old, new), text.count(old))
+
+
+def test_str_replace_action_with_small_chunks(tmp_path):
+    path = tmp_path / "f.txt"
+    path.write_text("x = 1\n" * 100 + "target_value\n" + "y = 2\n" * 100)
+    action = FileEditAction("file_edit", {
+        "command": "str_replace", "path": "f.txt", "old_str": "target_value", "new_str": "done",
+        "_config": {"working_dir": str(tmp_path), "file_edit": {"chunk_chars": 7, "backup": "none"}},
+    }, "")
+    results = list(action.execute_stream())
+    assert results[-1][2] == 0
+    assert path.read_text() == "x = 1\n" * 100 + "done\n" + "y = 2\n" * 100
+
+
+def test_atomic_output_keeps_file_on_error(tmp_path):
+    path = tmp_path / "f.txt"
+    path.write_text("original")
+    with pytest.raises(RuntimeError):
+        with atomic_output(str(path)) as f:
+            f.write("partial")
+            raise RuntimeError("interrupted")
+    assert path.read_text() == "original"
+    assert os.listdir(tmp_path) == ["f.txt"]
+
+
+def test_atomic_output_file_modes(tmp_path):
+    existing = tmp_path / "script.sh"
+    existing.write_text("old")
+    os.chmod(existing, 0o755)
+    with atomic_output(str(existing)) as f:
+        f.write("new")
+    assert stat.S_IMODE(os.stat(existing).st_mode) == 0o755
+
+    created = tmp_path / "new.txt"
+    with atomic_output(str(created)) as f:
+        f.write("new")
+    assert stat.S_IMODE(os.stat(created).st_mode) == NEW_FILE_MODE
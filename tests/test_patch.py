@@ -0,0 +1,144 @@
+# 补丁解析（parse_unified_diff）、hunk 定位（locate_hunks）与 PatchAction 的应用结果
+import pytest
+from ai_project_helper.actions.patch import PatchAction, locate_hunks, parse_unified_diff
+
+
+def test_parse_file_headers_and_hunks():
+    diff = (
+        "diff --git a/f.py b/f.py\n"
+        "--- a/f.py\n"
+        "+++ b/f.py\n"
+        "@@ -1,3 +1,3 @@\n"
+        " a\n"
+        "-b\n"
+        "+B\n"
+        " c\n"
+        "@@ -10,2 +10,3 @@\n"
+        " x\n"
+        "+y\n"
+        " z\n"
+    )
+    hunks = parse_unified_diff(diff)
+    assert [h.old_start for h in hunks] == [1, 10]
+    assert hunks[0].lines == [(" ", "a"), ("-", "b"), ("+", "B"), (" ", "c")]
+    assert hunks[1].old_lines() == ["x", "z"]
+
+
+def test_parse_content_lines_that_look_like_file_headers():
+    # 声明的行数用完之前，"--- "/"+++ " 开头的是删除/新增的内容
+    diff = (
+        "--- a/f.sql\n"
+        "+++ b/f.sql\n"
+        "@@ -1,2 +1,2 @@\n"
+        "--- old comment\n"
+        "+++ new comment\n"
+        " select 1;\n"
+    )
+    hunks = parse_unified_diff(diff)
+    assert len(hunks) == 1
+    assert hunks[0].lines == [("-", "-- old comment"), ("+", "++ new comment"), (" ", "select 1;")]
+
+
+def test_parse_lenient_input():
+    # 缺少 @@ 头、上下文行缺少前导空格
+    hunks = parse_unified_diff("a\n-b\n+B\nc\n")
+    assert len(hunks) == 1
+    assert hunks[0].old_start is None
+    assert hunks[0].lines == [(" ", "a"), ("-", "b"), ("+", "B"), (" ", "c")]
+
+
+def test_parse_no_newline_marker():
+    hunks = parse_unified_diff("@@ -1 +1 @@\n-a\n+b\n\\ No newline at end of file\n")
+    assert hunks[0].no_newline is True
+
+
+def test_parse_drops_context_only_hunks():
+    assert parse_unified_diff("@@ -1,2 +1,2 @@\n a\n b\n") == []
+
+
+def _locate(diff, lines, max_fuzz=2):
+    return [(pos, lead, trail, note) for _, pos, lead, trail, note in
+            locate_hunks(parse_unified_diff(diff), lines, max_fuzz)]
+
+
+LINES = ["l%d" % i for i in range(1, 21)]
+
+
+def test_locate_exact():
+    assert _locate("@@ -5,3 +5,3 @@\n l5\n-l6\n+L6\n l7\n", LINES) == [(4, 0, 0, "")]
+
+
+def test_locate_with_offset():
+    # 头部声明第 2 行，实际在第 5 行
+    [(pos, _, _, note)] = _locate("@@ -2,3 +2,3 @@\n l5\n-l6\n+L6\n l7\n", LINES)
+    assert pos == 4
+    assert "偏移 +3 行" in note
+
+
+def test_locate_offset_carries_to_next_hunk():
+    diff = "@@ -2,2 +2,2 @@\n-l5\n+L5\n l6\n@@ -12,2 +12,2 @@\n-l15\n+L15\n l16\n"
+    assert [pos for pos, *_ in _locate(diff, LINES)] == [4, 14]
+
+
+def test_locate_ignoring_whitespace():
+    lines = ["def f():", "    return  1", "x = 2"]
+    [(pos, _, _, note)] = _locate("@@ -1,2 +1,2 @@\n def f():\n-  return 1\n+  return 2\n", lines)
+    assert pos == 0
+    assert "忽略空白差异" in note
+
+
+def test_locate_with_fuzz():
+    # 首尾上下文各有一行与文件不符，去掉后匹配
+    [(pos, lead, trail, note)] = _locate("@@ -5,3 +5,3 @@\n wrong\n-l6\n+L6\n bad\n", LINES, max_fuzz=1)
+    assert (pos, lead, trail) == (5, 1, 1)
+    assert "fuzz 1" in note
+
+
+def test_locate_fails_without_enough_fuzz():
+    assert _locate("@@ -5,3 +5,3 @@\n wrong\n-l6\n+L6\n bad\n", LINES, max_fuzz=0) == [(None, 0, 0, "未找到匹配的上下文")]
+
+
+def test_locate_pure_addition():
+    assert _locate("@@ -3,0 +4 @@\n+new\n", LINES)[0][0] == 3
+    assert _locate("+new\n", LINES)[0][0] == len(LINES)
+
+
+@pytest.fixture
+def apply_patch(tmp_path):
+    workdir = tmp_path / "project"
+    workdir.mkdir()
+    # 修改前的备份写到项目目录之外
+    config = {"working_dir": str(workdir), "file_edit": {"backup_dir": str(tmp_path / "backups")}}
+
+    def apply(name, diff, content=None):
+        path = workdir / name
+        if content is not None:
+            path.write_bytes(content.encode("utf-8"))
+        action = PatchAction("patch", {"path": name, "diff": diff, "_config": config}, "")
+        results = list(action.execute_stream())
+        return results, path
+    return apply
+
+
+def test_apply_preserves_crlf(apply_patch):
+    results, path = apply_patch("f.txt", "@@ -1,3 +1,3 @@\n a\n-b\n+B\n c\n", "a\r\nb\r\nc\r\n")
+    assert results[-1][2] == 0
+    assert path.read_bytes() == b"a\r\nB\r\nc\r\n"
+
+
+def test_apply_no_newline_at_end(apply_patch):
+    _, path = apply_patch("f.txt", "@@ -1,2 +1,2 @@\n a\n-b\n+B\n\\ No newline at end of file\n", "a\nb\n")
+    assert path.read_bytes() == b"a\nB"
+
+
+def test_apply_creates_new_file(apply_patch):
+    results, path = apply_patch("new.txt", "--- /dev/null\n+++ b/new.txt\n@@ -0,0 +1,2 @@\n+one\n+two\n")
+    assert results[-1][2] == 0
+    assert path.read_text() == "one\ntwo\n"
+
+
+def test_apply_failed_hunk_leaves_file_unchanged(apply_patch):
+    diff = "@@ -1,2 +1,2 @@\n a\n-b\n+B\n@@ -5,2 +5,2 @@\n missing\n-line\n+LINE\n"
+    results, path = apply_patch("f.txt", diff, "a\nb\nc\n")
+    assert results[-1][2] == 1
+    assert path.read_text() == "a\nb\nc\n"
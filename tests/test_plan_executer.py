@@ -0,0 +1,138 @@
+# 步骤失败判定与失败后的快照回滚
+import os
+import grpc
+import pytest
+from ai_project_helper.server.llm_plan_executer import _step_failed, execute_plan_text
+from ai_project_helper.server.workspace_snapshot import WorkspaceSnapshots, snapshot_settings
+
+
+class FakeContext:
+    def __init__(self):
+        self.code = None
+        self.details = None
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+
+class ScriptedAgent:
+    """每个步骤的动作由 steps[步骤文本] 给出：在工作目录中执行的函数与返回的结束反馈"""
+
+    def __init__(self, workdir, steps, stop_on_nonzero_exit=False):
+        self.config = {"working_dir": workdir, "agent": {"stop_on_nonzero_exit": stop_on_nonzero_exit}}
+        self.steps = steps
+        self.ran = []
+
+    def prepare_step(self, step_text, step_index, step_count, run_context=None):
+        return step_text
+
+    def run_prepared_step(self, actions, step_index, step_count, run_context=None):
+        self.ran.append(actions)
+        run, final = self.steps[actions]
+        yield {"action_index": 0, "action_type": "shell_command", "status": "running"}
+        run()
+        yield dict({"action_index": 0, "action_type": "shell_command"}, **final)
+
+
+@pytest.mark.parametrize("fb, stop_on_nonzero_exit, expected", [
+    ({"status": "failed", "exit_code": 1}, False, True),
+    ({"status": "running"}, True, False),
+    ({"status": "success", "exit_code": 0}, True, False),
+    ({"status": "success", "exit_code": 1}, False, False),
+    ({"status": "success", "exit_code": 1}, True, True),
+    ({"status": "success", "exit_code": 2}, True, False),
+    ({"status": "timeout", "exit_code": 124}, True, True),
+])
+def test_step_failed(fb, stop_on_nonzero_exit, expected):
+    assert _step_failed(fb, stop_on_nonzero_exit) is expected
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    workdir = tmp_path / "project"
+    workdir.mkdir()
+    _write(workdir / "a.txt", "original\n")
+    snapshots = WorkspaceSnapshots(str(workdir), str(tmp_path / "state"), snapshot_settings({}))
+    return str(workdir), snapshots
+
+
+def _plan_agent(workdir, final_of_step2, stop_on_nonzero_exit=False):
+    def step2():
+        _write(os.path.join(workdir, "a.txt"), "changed\n")
+        _write(os.path.join(workdir, "c.txt"), "new\n")
+
+    return ScriptedAgent(workdir, {
+        "step one": (lambda: _write(os.path.join(workdir, "b.txt"), "one\n"), {"status": "success", "exit_code": 0}),
+        "step two": (step2, final_of_step2),
+        "step three": (lambda: None, {"status": "success", "exit_code": 0}),
+    }, stop_on_nonzero_exit)
+
+
+PLAN = "step one\n------\nstep two\n------\nstep three"
+
+
+def test_failed_step_is_rolled_back_and_aborts(workspace):
+    workdir, snapshots = workspace
+    agent = _plan_agent(workdir, {"status": "failed", "error": "boom", "exit_code": 1})
+    context = FakeContext()
+
+    feedbacks = list(execute_plan_text(agent, PLAN, context, snapshots=snapshots))
+
+    assert agent.ran == ["step one", "step two"]
+    assert [fb.status for fb in feedbacks if fb.step_index == 2] == ["running", "failed", "rolled_back"]
+    assert context.code == grpc.StatusCode.ABORTED
+    # 只回滚失败的步骤：第1步的修改保留
+    assert _read(os.path.join(workdir, "a.txt")) == "original\n"
+    assert not os.path.exists(os.path.join(workdir, "c.txt"))
+    assert _read(os.path.join(workdir, "b.txt")) == "one\n"
+
+
+def test_nonzero_exit_continues_by_default(workspace):
+    workdir, snapshots = workspace
+    agent = _plan_agent(workdir, {"status": "success", "exit_code": 1})
+    context = FakeContext()
+
+    feedbacks = list(execute_plan_text(agent, PLAN, context, snapshots=snapshots))
+
+    assert agent.ran == ["step one", "step two", "step three"]
+    assert "rolled_back" not in [fb.status for fb in feedbacks]
+    assert context.code is None
+    assert _read(os.path.join(workdir, "a.txt")) == "changed\n"
+
+
+def test_nonzero_exit_stops_when_enabled(workspace):
+    workdir, snapshots = workspace
+    agent = _plan_agent(workdir, {"status": "success", "exit_code": 1}, stop_on_nonzero_exit=True)
+    context = FakeContext()
+
+    feedbacks = list(execute_plan_text(agent, PLAN, context, snapshots=snapshots))
+
+    assert agent.ran == ["step one", "step two"]
+    # 动作以 success 结束时补发一条 failed 反馈
+    assert [fb.status for fb in feedbacks if fb.step_index == 2] == ["running", "success", "rolled_back", "failed"]
+    assert context.code == grpc.StatusCode.ABORTED
+    assert _read(os.path.join(workdir, "a.txt")) == "original\n"
+
+
+def test_warning_exit_code_does_not_stop(workspace):
+    workdir, snapshots = workspace
+    agent = _plan_agent(workdir, {"status": "success", "exit_code": 2}, stop_on_nonzero_exit=True)
+    context = FakeContext()
+
+    list(execute_plan_text(agent, PLAN, context, snapshots=snapshots))
+
+    assert agent.ran == ["step one", "step two", "step three"]
+    assert context.code is None